@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiler import ProfilerBusy, profile_process, request_profiles
+from app.schemas import Result
+
+router = APIRouter()
+
+
+@router.get("/profile")
+async def profile(
+        seconds: float = Query(10, gt=0, description="采样时长 (秒)"),
+        interval_ms: float = Query(settings.PROFILER_DEFAULT_INTERVAL_MS, ge=1, description="采样间隔 (毫秒)"),
+        all_threads: bool = Query(True, description="是否采样所有线程 (否则只采样事件循环线程)"),
+):
+    """
+    对当前 worker 进程采样 N 秒，返回 collapsed stack 文本 (flamegraph.pl / speedscope 可直接读取)
+    多 worker 部署时只会分析处理该请求的那个进程
+    """
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    try:
+        profiler = await profile_process(seconds, interval_ms / 1000, all_threads=all_threads)
+    except ProfilerBusy as e:
+        return Result.error(msg=str(e))
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+
+@router.get("/profile/requests", response_model=Result[list])
+async def list_request_profiles():
+    """已保存的单请求分析 (请求 ID)"""
+    return Result.success(data=request_profiles.list())
+
+
+@router.get("/profile/requests/{request_id}")
+async def get_request_profile(request_id: str):
+    collapsed = request_profiles.get(request_id)
+    if collapsed is None:
+        return Result.error(msg=f"profile for request {request_id} not found")
+    return PlainTextResponse(collapsed)
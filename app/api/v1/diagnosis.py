@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from app.core.logging_config import payload_logger
+
 # 引入拆分后的 Request 和 Response
 from app.schemas.diagnosis import DiagnosisRequest, DiagnosisResponse
 from app.schemas.result import Result
@@ -13,9 +15,14 @@ async def analyze(request: DiagnosisRequest):
     diagnosis_data = await diagnosis_service.diagnose(
         request.kp_code,
         request.question,
-        request.student_answer
+        request.student_answer,
+        reference_answer=request.reference_answer,
+        prompt_template=request.prompt_template
+    )
+    payload_logger.info(
+        "diagnosis result",
+        extra={"kp_code": request.kp_code, "diagnosis": diagnosis_data}
     )
-    print(diagnosis_data)
 
     # 根据对错封装 Result
     if diagnosis_data.is_correct:
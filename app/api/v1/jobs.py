@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+from pydantic import ValidationError
+
+from app.schemas import Result
+from app.schemas.job import JobResponse, JobSubmitRequest
+from app.services import job_service
+from app.services.job_service import UnknownJobKind
+
+router = APIRouter()
+
+
+@router.post("", response_model=Result[JobResponse])
+async def submit_job(request: JobSubmitRequest):
+    """
+    提交异步任务，立即返回任务 ID
+    通过 GET /jobs/{id} 轮询进度，或在请求中指定 callbackUrl 等待回调
+    """
+    try:
+        job = await job_service.submit(request)
+        return Result.success(data=job, msg="任务已提交")
+    except (UnknownJobKind, ValidationError) as e:
+        return Result.error(msg=f"任务提交失败: {str(e)}")
+
+
+@router.get("/{job_id}", response_model=Result[JobResponse])
+async def get_job(job_id: str):
+    job = await job_service.get(job_id)
+    if job is None:
+        return Result.error(msg=f"任务不存在: {job_id}")
+    return Result.success(data=job)
@@ -1,8 +1,24 @@
+import os
+from typing import List
+
 from fastapi import APIRouter
+from fastapi.responses import FileResponse
 
+from app.repositories import knowledge_snapshot
 from app.schemas import Result
-from app.schemas.knowledge import KnowledgeSyncRequest, KnowledgeResponse
-from app.services import knowledge_service
+from app.schemas.job import (
+    JobResponse,
+    JobSubmitRequest,
+    KnowledgeSnapshotExportPayload,
+    KnowledgeSnapshotImportPayload,
+)
+from app.schemas.knowledge import (
+    KnowledgeSyncRequest,
+    KnowledgeResponse,
+    KnowledgeBatchSearchRequest,
+    KnowledgeBatchSearchResult,
+)
+from app.services import job_service, knowledge_service
 
 router = APIRouter()
 
@@ -16,3 +32,56 @@ async def sync_knowledge(request: KnowledgeSyncRequest):
     except Exception as e:
         # 生产环境建议隐藏具体错误信息，只打印日志
         return Result.error(msg=f"同步失败: {str(e)}")
+
+
+# 批量检索：多个问题一次向量化、一条 SQL 返回各自的 top-k
+@router.post("/search", response_model=Result[List[KnowledgeBatchSearchResult]])
+async def search_knowledge(request: KnowledgeBatchSearchRequest):
+    try:
+        data = await knowledge_service.search_related_knowledge_many(request)
+        return Result.success(data=data, msg="检索成功")
+    except Exception as e:
+        return Result.error(msg=f"检索失败: {str(e)}")
+
+
+# ==========================================
+# 知识库快照 (导出 / 导入走异步任务，通过 GET /jobs/{id} 查看进度)
+# ==========================================
+@router.post("/snapshot/export", response_model=Result[JobResponse])
+async def export_snapshot(request: KnowledgeSnapshotExportPayload):
+    if request.name:
+        try:
+            knowledge_snapshot.snapshot_path(request.name)
+        except knowledge_snapshot.SnapshotError as e:
+            return Result.error(msg=f"快照导出失败: {str(e)}")
+    job = await job_service.submit(JobSubmitRequest(
+        kind="knowledge.export_snapshot", payload=request.model_dump(exclude_none=True)
+    ))
+    return Result.success(data=job, msg="快照导出任务已提交")
+
+
+@router.post("/snapshot/import", response_model=Result[JobResponse])
+async def import_snapshot(request: KnowledgeSnapshotImportPayload):
+    try:
+        knowledge_snapshot.read_manifest(knowledge_snapshot.snapshot_path(request.name))
+    except knowledge_snapshot.SnapshotError as e:
+        return Result.error(msg=f"快照导入失败: {str(e)}")
+    job = await job_service.submit(JobSubmitRequest(kind="knowledge.import_snapshot", payload=request.model_dump()))
+    return Result.success(data=job, msg="快照导入任务已提交")
+
+
+@router.get("/snapshot", response_model=Result[list])
+async def list_snapshots():
+    return Result.success(data=knowledge_snapshot.list_snapshots())
+
+
+# 新节点从已有节点下载快照文件 (manifest.json / vectors.npy / knowledge.ndjson)，再用脚本导入
+@router.get("/snapshot/{name}/{filename}")
+async def download_snapshot_file(name: str, filename: str):
+    try:
+        path = knowledge_snapshot.snapshot_path(name)
+    except knowledge_snapshot.SnapshotError as e:
+        return Result.error(msg=str(e))
+    if filename not in knowledge_snapshot.SNAPSHOT_FILES or not os.path.isfile(os.path.join(path, filename)):
+        return Result.error(msg=f"快照文件不存在: {name}/{filename}")
+    return FileResponse(os.path.join(path, filename), filename=f"{name}-{filename}")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 
+from app.core.logging_config import payload_logger
 from app.schemas import Result
 from app.schemas.ocr import OCRResponse, OCRRequest
 from app.services import ocr_service
@@ -31,9 +32,10 @@ async def recognize_image(
             file_path=file_path,
         )
         response = await ocr_service.recognize(file=file, request=request)
-        print(response.full_text)
-        for i in response.text_list:
-            print(i)
+        payload_logger.info(
+            "ocr result",
+            extra={"lines": len(response.text_list), "full_text": response.full_text}
+        )
         return Result.success(data=response)
     except HTTPException as e:
         # 直接返回已知 HTTP 异常
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from app.core.prompt_registry import prompt_registry
+from app.schemas import Result
+
+router = APIRouter()
+
+
+@router.get("", response_model=Result[list])
+async def list_prompt_templates():
+    """当前加载的 Prompt 模板：版本、静态 token 成本、使用次数"""
+    return Result.success(data=prompt_registry.list())
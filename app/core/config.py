@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -22,9 +22,72 @@ class Settings(BaseSettings):
 
     ZHIPU_MODEL_EMBEDDING: str = "embedding-2"
     ZHIPU_MODEL_GLM: str = "glm-4-flash"
+    # 更快 / 更便宜的模型：模型级联的第一层，剩余时间预算不足时也只用它；留空表示与 ZHIPU_MODEL_GLM 相同
+    ZHIPU_MODEL_GLM_FAST: str = ""
 
     ZHIPU_EMBEDDING_DIM: int = Field(default=4096, description="Embedding vector dimension")
 
+    # 使用模型原生 JSON 模式 (response_format=json_object)，上游不支持时关闭
+    LLM_JSON_MODE: bool = True
+
+    # === 模型级联 (需配置 ZHIPU_MODEL_GLM_FAST) ===
+    # 先用快速模型，解析失败或自评置信度低于阈值时升级到 ZHIPU_MODEL_GLM
+    LLM_CASCADE_ENABLED: bool = True
+    LLM_CASCADE_MIN_CONFIDENCE: float = 0.7
+
+    # === 对冲请求 (首个请求超过近期分位耗时仍未返回时再发一个，取先返回者) ===
+    LLM_HEDGE_ENABLED: bool = False
+    # 对冲延迟取近期耗时的分位数，且不低于 MIN_DELAY 秒
+    LLM_HEDGE_QUANTILE: float = 0.9
+    LLM_HEDGE_MIN_DELAY: float = 0.5
+    # 对冲请求占比上限 (预算)
+    LLM_HEDGE_MAX_RATE: float = 0.1
+    # 估算分位数的滑动窗口大小与最少样本数 (样本不足时不对冲)
+    LLM_HEDGE_WINDOW: int = 200
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    # 对冲请求的备用端点 / 密钥 / 模型，留空表示与原请求相同
+    LLM_HEDGE_API_BASE: str = ""
+    LLM_HEDGE_API_KEY: str = ""
+    LLM_HEDGE_MODEL: str = ""
+
+    # === 上游熔断 (chat / embedding 分别统计) ===
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    # 滑动窗口 (秒) 内调用数 >= MIN_CALLS 且失败率 >= FAILURE_RATE 时熔断
+    CIRCUIT_FAILURE_RATE: float = 0.5
+    CIRCUIT_MIN_CALLS: int = 20
+    CIRCUIT_WINDOW_SECONDS: int = 30
+    # 熔断后多久 (秒) 进入半开，半开时放行的探测请求数
+    CIRCUIT_OPEN_SECONDS: float = 15.0
+    CIRCUIT_HALF_OPEN_CALLS: int = 3
+
+    # === LLM HTTP 连接池 (chat 与 embedding 共用) ===
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    # 空闲长连接保活时间 (秒)
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+    # 读超时覆盖整个生成过程，诊断类长输出需要留足余量
+    LLM_HTTP_READ_TIMEOUT: float = 60.0
+    LLM_HTTP_WRITE_TIMEOUT: float = 10.0
+    # 等待连接池空闲连接的超时
+    LLM_HTTP_POOL_TIMEOUT: float = 5.0
+    # 429 / 5xx / 网络错误的最大重试次数 (不含首次请求)
+    LLM_HTTP_MAX_RETRIES: int = 3
+    # 随机指数退避：base * 2^n 内随机，最大 max 秒
+    LLM_HTTP_BACKOFF_BASE: float = 0.5
+    LLM_HTTP_BACKOFF_MAX: float = 8.0
+
+    # === 上游准入控制 (并发 + 令牌桶限速，0 表示不限) ===
+    LLM_MAX_IN_FLIGHT: int = 16
+    LLM_RPS: float = 10.0
+    LLM_TPM: float = 0
+    # 排队等待放行的最长时间 (秒)，超时后走兜底逻辑
+    LLM_QUEUE_TIMEOUT: float = 30.0
+    EMBEDDING_MAX_IN_FLIGHT: int = 8
+    EMBEDDING_RPS: float = 20.0
+    EMBEDDING_TPM: float = 0
+    EMBEDDING_QUEUE_TIMEOUT: float = 30.0
+
     # ===============================
     # PostgreSQL / pgvector
     # ===============================
@@ -33,9 +96,25 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
+    # SQLAlchemy 驱动：psycopg2 / psycopg (v3)
+    POSTGRES_DRIVER: str = "psycopg2"
 
     SQL_ECHO: bool = False
 
+    # === 数据库连接池 (每个 worker 进程独立) ===
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    # 等待空闲连接的超时 (秒)
+    DB_POOL_TIMEOUT: float = 5.0
+    # 连接最长存活时间 (秒)，需小于 PgBouncer / 防火墙的空闲断开时间
+    DB_POOL_RECYCLE: int = 1800
+    # 取连接前先 ping，自动剔除已断开的连接
+    DB_POOL_PRE_PING: bool = True
+    # 建连超时 (秒)，0 表示使用驱动默认值
+    DB_CONNECT_TIMEOUT: int = 5
+    # 经 PgBouncer 事务模式连接时关闭服务端预编译语句
+    DB_STATEMENT_CACHE_DISABLED: bool = False
+
     # ===============================
     # 应用 / Uvicorn
     # ===============================
@@ -44,6 +123,16 @@ class Settings(BaseSettings):
     APP_PORT: int = 8000
     APP_RELOAD: bool = False
     APP_LOG_LEVEL: str = "INFO"
+    # 本进程挂载的路由组：all / llm (诊断、知识库) / ocr，用于把 OCR 与 LLM 流量拆到不同 worker 池
+    SERVER_ROUTE_GROUP: str = "all"
+    # 各路由组的 worker 数，0 表示按 CPU 核数与 OCR_NUM_THREADS 自动计算 (见 gunicorn.conf.py)
+    SERVER_WORKERS_ALL: int = 0
+    SERVER_WORKERS_LLM: int = 0
+    SERVER_WORKERS_OCR: int = 0
+    # 优雅重启 / 关闭时等待进行中请求的时间 (秒)
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    # 启动时预热 OCR 模型 (每个 worker 在 fork 之后各自加载)
+    OCR_WARMUP: bool = True
     API_PREFIX: str = "/app/v1"
     ENVIRONMENT: str = "dev"
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
@@ -55,7 +144,7 @@ class Settings(BaseSettings):
     @property
     def DATABASE_URL(self) -> str:
         return (
-            f"postgresql://{self.POSTGRES_USER}:"
+            f"postgresql+{self.POSTGRES_DRIVER}://{self.POSTGRES_USER}:"
             f"{self.POSTGRES_PASSWORD}@"
             f"{self.POSTGRES_HOST}:"
             f"{self.POSTGRES_PORT}/"
@@ -73,6 +162,122 @@ class Settings(BaseSettings):
     OCR_TEXT_SCORE_THRESH: float = 0.5
     # OCR 默认语言
     OCR_LANG: str = "ch"
+    # 下载 file_url 图片的超时上限 (秒)，请求带截止时间时取二者较小值
+    OCR_FETCH_TIMEOUT: float = 5.0
+
+    # === Logging ===
+    # 根日志级别
+    LOG_LEVEL: str = "INFO"
+    # 按模块覆盖日志级别，如 {"sqlalchemy.engine": "WARNING", "app.infra.ocr": "DEBUG"}
+    LOG_LEVELS: Dict[str, str] = {}
+    # 输出格式：json / text
+    LOG_FORMAT: str = "json"
+    # 大字段日志 (OCR 全文、诊断结果) 的采样比例，0 表示不输出
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01
+    # 异步日志队列容量，写满时丢弃新日志而不阻塞请求
+    LOG_QUEUE_SIZE: int = 10000
+
+    # === Async Jobs ===
+    # 任务队列后端：postgres (FOR UPDATE SKIP LOCKED，多进程共享) / memory (进程内，仅适合单 worker 的本地调试)
+    JOB_BACKEND: str = "postgres"
+    # 各 worker 池在本进程中的并发数，0 表示本进程不执行该池的任务 (如 OCR 部署只跑 ocr 池)
+    JOB_POOLS: Dict[str, int] = {"bulk": 2, "ocr": 1}
+    JOB_MAX_ATTEMPTS: int = 3
+    # 重试退避：base * 2^(n-1) 秒，最大 max 秒
+    JOB_RETRY_BACKOFF: float = 5.0
+    JOB_RETRY_BACKOFF_MAX: float = 300.0
+    # 队列为空时的轮询间隔 (秒)
+    JOB_POLL_INTERVAL: float = 1.0
+    # 执行中任务的租约 (秒)，超过该时间未上报进度视为 worker 已崩溃，任务会被重新领取
+    JOB_LEASE_SECONDS: float = 300.0
+    # 进度上报最小间隔 (秒)
+    JOB_PROGRESS_INTERVAL: float = 1.0
+    JOB_WEBHOOK_TIMEOUT: float = 10.0
+
+    # === Tracing ===
+    # 是否记录请求链路 Span
+    TRACING_ENABLED: bool = True
+    # Span 导出方式：none / memory (测试) / log / otel (需安装 opentelemetry)
+    TRACING_EXPORTER: str = "none"
+    # Java 端透传的请求 ID 头
+    TRACING_REQUEST_ID_HEADER: str = "X-Request-ID"
+    # 是否在响应中返回 Server-Timing 头
+    TRACING_SERVER_TIMING: bool = True
+
+    # === Deadline Propagation ===
+    # 是否按请求截止时间裁剪各阶段超时并降级
+    DEADLINE_ENABLED: bool = True
+    # Java 端传入的剩余时间预算请求头 (毫秒)
+    DEADLINE_HEADER: str = "X-Request-Timeout-Ms"
+    # 未带请求头时按路由前缀 (相对 API_PREFIX) 使用的默认预算 (秒)，未匹配的路由不设截止时间
+    DEADLINE_ROUTE_DEFAULTS: Dict[str, float] = {"/diagnosis": 15.0, "/ocr": 20.0, "/knowledge": 30.0}
+    # 预留给响应序列化与网络传输的时间 (毫秒)
+    DEADLINE_SAFETY_MARGIN_MS: float = 200.0
+    # 剩余预算低于该值 (秒) 时跳过知识检索 (RAG)，使用通用规范
+    DEADLINE_MIN_RAG_SECONDS: float = 3.0
+    # 剩余预算低于该值 (秒) 时只用 ZHIPU_MODEL_GLM_FAST (模型级联不再升级)
+    DEADLINE_FAST_MODEL_SECONDS: float = 6.0
+    # 剩余预算低于该值 (秒) 时不再调用 LLM，返回近期缓存结果或兜底结果
+    DEADLINE_MIN_LLM_SECONDS: float = 1.5
+    # 最近诊断结果缓存 (截止时间不足或上游熔断时复用)：条目数与有效期 (秒)，0 表示关闭
+    DEADLINE_RECENT_CACHE_SIZE: int = 1024
+    DEADLINE_RECENT_CACHE_TTL: float = 600.0
+    # 剩余预算低于该值 (秒) 时 OCR 跳过小图放大
+    DEADLINE_OCR_MIN_UPSCALE_SECONDS: float = 2.0
+
+    # === Profiling ===
+    # 全进程采样的最长时长 (秒)
+    PROFILER_MAX_SECONDS: float = 60.0
+    # 默认采样间隔 (毫秒)
+    PROFILER_DEFAULT_INTERVAL_MS: float = 5.0
+    # 是否允许通过请求头对单个请求采样 (默认关闭)
+    PROFILER_PER_REQUEST_ENABLED: bool = False
+    # 触发单请求采样的请求头，值为 1 / true 且内部 Token 正确时生效
+    PROFILER_REQUEST_HEADER: str = "X-Profile"
+    # 保留最近多少个单请求采样结果
+    PROFILER_KEEP: int = 32
+
+    # === Prompt Templates ===
+    # 默认诊断模板 (app/core/prompts 下的文件名，不含扩展名)
+    PROMPT_DEFAULT_TEMPLATE: str = "diagnosis_template"
+    # 按学科指定模板，如 {"数学": "diagnosis_template_lite"}，用于 A/B 对比
+    PROMPT_TEMPLATE_BY_SUBJECT: Dict[str, str] = {}
+    # 模板目录热加载检查间隔 (秒)，<=0 表示关闭热加载
+    PROMPT_RELOAD_INTERVAL: float = 5.0
+
+    # === Diagnosis Pre-check ===
+    # 是否启用规则预检 (可确定判对的作答不再调用 LLM)
+    PRECHECK_ENABLED: bool = True
+
+    # === Knowledge Vector Search (PostgreSQL HNSW) ===
+    # 带过滤条件时的迭代索引扫描：relaxed_order / strict_order / off
+    # 需要 pgvector >= 0.8，低版本扩展会自动跳过 (启动后首次检索时检测 extversion)
+    KNOWLEDGE_HNSW_ITERATIVE_SCAN: str = "relaxed_order"
+    # HNSW 检索时的 ef_search，越大召回越高、越慢
+    KNOWLEDGE_HNSW_EF_SEARCH: int = 64
+    # 迭代扫描最多访问的元组数，过滤条件命中很少时避免扫遍整个索引
+    KNOWLEDGE_HNSW_MAX_SCAN_TUPLES: int = 20000
+    # 批量检索单次请求最多的问题数
+    KNOWLEDGE_SEARCH_MAX_QUERIES: int = 32
+    # 知识库快照 (导出 / 导入) 存放目录，相对路径基于工作目录
+    KNOWLEDGE_SNAPSHOT_DIR: str = "snapshots"
+    # 快照导出时服务端游标每批拉取 / 导入时每个 COPY 数据块的行数
+    KNOWLEDGE_SNAPSHOT_BATCH_SIZE: int = 2000
+
+    # === Local Vector Replica ===
+    # 是否启用进程内向量索引副本 (读多写少的 RAG 场景)
+    VECTOR_REPLICA_ENABLED: bool = False
+    # 需要加载副本的学科编码，空列表表示全部学科
+    VECTOR_REPLICA_SUBJECTS: List[str] = []
+    # 单学科数据量超过该值时由精确检索切换为 HNSW
+    VECTOR_REPLICA_HNSW_THRESHOLD: int = 20000
+    # HNSW 检索时的 ef 参数，越大召回越高、越慢
+    VECTOR_REPLICA_HNSW_EF_SEARCH: int = 64
+    # 增量轮询 updated_at 的间隔 (秒)，<=0 表示不轮询
+    VECTOR_REPLICA_POLL_INTERVAL: float = 30.0
+    # 增量轮询的回看窗口 (秒)：updated_at 取的是事务开始时间，开始早于水位线、提交晚于上次轮询的写入
+    # 需要靠回看窗口补上；应大于最长的知识库写事务耗时
+    VECTOR_REPLICA_POLL_OVERLAP: float = 120.0
 
     # ===============================
     # Settings 行为配置
@@ -1,9 +1,94 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from sqlmodel import create_engine, Session, SQLModel
 
 from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, remaining
+from app.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUT_LATENCY, DB_POOL_CAPACITY, DB_POOL_TIMEOUTS
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录连接池取连接的等待时间与超时次数 (突发流量下请求排队在池上时可见)"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_LATENCY.observe(time.perf_counter() - start)
+
+
+def _connect_args() -> dict:
+    args = {}
+    if settings.DB_STATEMENT_CACHE_DISABLED and settings.POSTGRES_DRIVER == "psycopg":
+        # PgBouncer 事务模式下服务端预编译语句会落到别的后端连接上，psycopg3 需要关闭自动 prepare
+        # (psycopg2 从不使用服务端预编译语句，无需处理)
+        args["prepare_threshold"] = None
+    if settings.DB_CONNECT_TIMEOUT:
+        args["connect_timeout"] = settings.DB_CONNECT_TIMEOUT
+    return args
+
 
 # 统一创建 engine
-engine = create_engine(settings.DATABASE_URL, echo=settings.SQL_ECHO)
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.SQL_ECHO,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # 后进先出：低峰期多余连接自然空闲到被回收
+    pool_use_lifo=True,
+    connect_args=_connect_args(),
+)
+
+
+@event.listens_for(engine, "first_connect")
+def _on_first_connect(dbapi_connection, connection_record):
+    # 每个 worker 的连接池首次建连时登记容量 (gunicorn fork 后连接池会重建)
+    DB_POOL_CAPACITY.set(settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    # 请求带截止时间时，把剩余预算下推为本事务的语句超时 (SET LOCAL 随事务结束失效，连接归还后不残留)
+    left = remaining()
+    if left is None:
+        return
+    timeout_ms = int(left * 1000)
+    if timeout_ms <= 0:
+        raise DeadlineExceeded("deadline exceeded before database query")
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def pool_stats() -> dict:
+    """连接池当前状态 (供 /health 使用)"""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "capacity": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    }
 
 
 def get_session():
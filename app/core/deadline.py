@@ -0,0 +1,159 @@
+# app/core/deadline.py
+"""
+端到端截止时间 (deadline) 传递
+- Java 端通过 DEADLINE_HEADER 传入剩余预算 (毫秒)，没有时按路由默认值 (DEADLINE_ROUTE_DEFAULTS)
+- 截止时间放在 contextvar 中，service / repository / infra 各层用 remaining() 读取剩余时间：
+  数据库语句 (SET LOCAL statement_timeout)、排队、embedding、LLM、OCR 下载都以此为上限
+- 剩余预算不足时各阶段主动降级，而不是等到网关超时
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Coroutine, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """截止时间已过"""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """剩余秒数；当前上下文没有截止时间时返回 default"""
+    deadline = _deadline.get()
+    return deadline.remaining() if deadline is not None else default
+
+
+def bounded(timeout: Optional[float]) -> Optional[float]:
+    """把各阶段自身的超时收紧到剩余预算以内"""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def below(seconds: float) -> bool:
+    """剩余预算是否低于 seconds (没有截止时间时视为充足)"""
+    left = remaining()
+    return left is not None and left < seconds
+
+
+def check(stage: str):
+    """截止时间已过时抛出 DeadlineExceeded"""
+    deadline = _deadline.get()
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded(f"deadline exceeded before {stage}")
+
+
+async def within(aw: Awaitable[T], stage: str) -> T:
+    """
+    以剩余预算为上限等待 aw
+    因截止时间到达而超时时抛出 DeadlineExceeded，与上游自身的超时 (计入熔断失败) 区分开
+    """
+    left = remaining()
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, timeout=left)
+    except asyncio.TimeoutError:
+        if remaining(0.0) <= 0:
+            raise DeadlineExceeded(f"deadline exceeded during {stage}") from None
+        raise
+
+
+def spawn_detached(coro: Coroutine[None, None, T]) -> "asyncio.Task[T]":
+    """
+    在去掉截止时间的上下文副本中启动 Task (其余 contextvar 如 trace 照常继承)
+    用于多个请求共享的调用：不受发起者截止时间的约束，各等待者自行用 within() 限定等待时间
+    """
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    return ctx.run(asyncio.ensure_future, coro)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """在当前上下文设置截止时间 (只会收紧，不会放宽外层的截止时间)"""
+    if seconds is None:
+        yield _deadline.get()
+        return
+    outer = _deadline.get()
+    if outer is not None and outer.remaining() <= seconds:
+        yield outer
+        return
+    token = _deadline.set(Deadline(seconds))
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def _route_default(path: str) -> Optional[float]:
+    relative = path[len(settings.API_PREFIX):] if path.startswith(settings.API_PREFIX) else path
+    best = None
+    for prefix, seconds in settings.DEADLINE_ROUTE_DEFAULTS.items():
+        if relative.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+            best = (prefix, seconds)
+    return best[1] if best else None
+
+
+class DeadlineMiddleware:
+    """
+    为每个请求建立截止时间：
+    请求头 (毫秒) > 路由默认值；再减去 DEADLINE_SAFETY_MARGIN_MS 留给响应序列化与网络
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.DEADLINE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.DEADLINE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        budget = None
+        for key, value in scope["headers"]:
+            if key == self.header:
+                try:
+                    budget = float(value) / 1000
+                except ValueError:
+                    logger.warning(f"Ignoring malformed {settings.DEADLINE_HEADER} header: {value!r}")
+                break
+        if budget is None:
+            budget = _route_default(scope["path"])
+
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        budget = max(0.0, budget - settings.DEADLINE_SAFETY_MARGIN_MS / 1000)
+        with deadline_scope(budget):
+            await self.app(scope, receive, send)
@@ -0,0 +1,153 @@
+# app/core/logging_config.py
+"""
+结构化异步日志
+- 业务代码只往内存队列里放记录 (QueueHandler)，由后台线程 (QueueListener) 负责格式化与写 stdout，不阻塞事件循环
+- JSON 格式输出，自动带上当前请求 ID
+- 大字段日志 (OCR 全文、诊断结果) 走 payload logger，按比例采样
+- 各模块日志级别由 Settings.LOG_LEVELS 配置
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.tracing import request_id_var
+
+# 大字段日志专用 logger，按 LOG_PAYLOAD_SAMPLE_RATE 采样
+PAYLOAD_LOGGER_NAME = "zentrio.payload"
+payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_fork_hook_registered = False
+
+# LogRecord 自带的属性，其余的 (通过 extra= 传入) 作为结构化字段输出
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """在产生日志的协程上下文中读取请求 ID (进入队列后上下文就丢了)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按比例采样，WARNING 及以上不采样"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=_json_default)
+
+
+def _json_default(value):
+    # Pydantic 对象直接放进 extra，序列化推迟到后台线程，被采样丢弃的日志不产生开销
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def setup_logging():
+    """应用启动时调用一次；重复调用是安全的"""
+    global _listener, _fork_hook_registered
+    if _listener is not None:
+        return
+
+    if not _fork_hook_registered and hasattr(os, "register_at_fork"):
+        # gunicorn preload 时在 master 中初始化，后台线程不会随 fork 复制，子进程里重建
+        os.register_at_fork(after_in_child=_reinit_after_fork)
+        _fork_hook_registered = True
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        ))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    for existing in [f for f in payload_logger.filters if isinstance(f, SamplingFilter)]:
+        payload_logger.removeFilter(existing)
+    payload_logger.addFilter(SamplingFilter(settings.LOG_PAYLOAD_SAMPLE_RATE))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _reinit_after_fork():
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+def shutdown_logging():
+    """lifespan 关闭时调用：刷出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志而不是阻塞请求 (stdout 被堵住时保护事件循环)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 默认实现会把消息和堆栈一起格式化进 msg，这里只合并 args，堆栈单独保留给 JsonFormatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
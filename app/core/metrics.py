@@ -0,0 +1,174 @@
+# app/core/metrics.py
+"""
+Prometheus 指标
+- STAGE_LATENCY: 各流水线阶段耗时直方图 (stage 标签区分)
+- CACHE_HITS / FALLBACKS / UPSTREAM_ERRORS: 缓存命中、兜底返回、上游错误计数
+- DEADLINE_DEGRADATIONS: 截止时间不足导致的阶段跳过 / 降级次数
+- CASCADE_*: 模型级联各层级的调用结果、升级原因与耗时
+- HEDGE_REQUESTS: 对冲请求的触发与胜出情况
+- CIRCUIT_*: 上游熔断器状态、状态切换与被拒绝的调用
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.core.tracing import tracer
+
+# 覆盖毫秒级 (DB / 解析) 到数十秒级 (LLM 生成) 的分桶
+_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "zentrio_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+CACHE_HITS = Counter(
+    "zentrio_cache_hits_total",
+    "Cache hits by cache name",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "zentrio_cache_misses_total",
+    "Cache misses by cache name",
+    ["cache"],
+)
+
+FALLBACKS = Counter(
+    "zentrio_diagnosis_fallbacks_total",
+    "Diagnoses answered with the SystemError fallback response",
+    ["reason"],
+)
+
+DEADLINE_DEGRADATIONS = Counter(
+    "zentrio_deadline_degradations_total",
+    "Pipeline stages skipped or downgraded because the request deadline was near",
+    ["stage", "action"],
+)
+
+# 模型级联 (升级率 = escalations / 首层 calls)
+CASCADE_CALLS = Counter(
+    "zentrio_llm_cascade_calls_total",
+    "Model cascade attempts by tier and outcome (accepted / escalated / parse_error / error)",
+    ["router", "tier", "outcome"],
+)
+CASCADE_ESCALATIONS = Counter(
+    "zentrio_llm_cascade_escalations_total",
+    "Escalations to a stronger tier by reason (parse_error / low_confidence / no_confidence)",
+    ["router", "reason"],
+)
+CASCADE_TIER_LATENCY = Histogram(
+    "zentrio_llm_cascade_tier_duration_seconds",
+    "Latency of each cascade tier attempt (queueing + call + parse)",
+    ["router", "tier"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+# 对冲请求 (对冲比例 = fired / 该 hedger 的请求数)
+HEDGE_REQUESTS = Counter(
+    "zentrio_llm_hedge_total",
+    "Hedged request outcomes (fired / primary_won / hedge_won / budget_exhausted / saturated)",
+    ["hedger", "outcome"],
+)
+
+# 熔断器 (状态：0 closed / 1 half_open / 2 open)
+CIRCUIT_STATE = Gauge(
+    "zentrio_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"],
+    multiprocess_mode="max",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "zentrio_circuit_transitions_total",
+    "Circuit breaker state transitions by target state",
+    ["breaker", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "zentrio_circuit_rejections_total",
+    "Calls rejected without reaching the upstream because the circuit was open",
+    ["breaker"],
+)
+
+UPSTREAM_ERRORS = Counter(
+    "zentrio_upstream_errors_total",
+    "Failed upstream LLM / embedding HTTP attempts (including retried ones)",
+    ["host", "kind"],
+)
+
+
+# 数据库连接池 (多 worker 时按进程累加)
+DB_POOL_CHECKOUT_LATENCY = Histogram(
+    "zentrio_db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=_LATENCY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "zentrio_db_pool_timeouts_total",
+    "Pool checkouts that gave up after DB_POOL_TIMEOUT",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "zentrio_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "zentrio_db_pool_capacity",
+    "Configured pool_size + max_overflow",
+    multiprocess_mode="livesum",
+)
+
+
+class Stage:
+    """阶段名常量，避免各处手写字符串"""
+    DB_LOOKUP = "db_lookup"
+    SUBJECT_CONFIG = "subject_config"
+    EMBEDDING = "embedding"
+    LLM_CALL = "llm_call"
+    OUTPUT_PARSE = "output_parse"
+    IMAGE_READ = "image_read"
+    IMAGE_DECODE = "image_decode"
+    PREPROCESS = "preprocess"
+    OCR_DET = "ocr_det"
+    OCR_CLS = "ocr_cls"
+    OCR_REC = "ocr_rec"
+
+
+@contextmanager
+def track_stage(stage: str):
+    """记录一个阶段的耗时 (同步 / 异步代码中都可以用 with)，同时作为链路追踪的一个 Span"""
+    start = time.perf_counter()
+    try:
+        with tracer.start_span(stage):
+            yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def observe_stage(stage: str, seconds: float):
+    """直接记录已知耗时 (如 OCR 引擎自己返回的各阶段耗时)"""
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+    tracer.record_span(stage, seconds)
+
+
+def render_metrics() -> tuple:
+    """返回 (body, content_type)，供 /metrics 接口使用"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # 多 worker 部署 (gunicorn.conf.py 设置该目录)：汇总所有 worker 的指标
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
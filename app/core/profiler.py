@@ -0,0 +1,166 @@
+# app/core/profiler.py
+"""
+按需采样分析器 (线上排查延迟毛刺)
+- 后台线程定时读取 sys._current_frames()，累计调用栈出现次数
+- 输出 collapsed stack 格式 ("frame;frame;frame count")，可直接交给 flamegraph.pl / speedscope
+- 不采样时没有任何开销；单请求分析需显式开启 PROFILER_PER_REQUEST_ENABLED 并带上请求头
+"""
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusy(Exception):
+    """已有一个全进程分析在运行"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """
+    采样分析器
+    :param interval: 采样间隔 (秒)
+    :param thread_id: 只采样指定线程 (None 表示所有线程，根帧为线程名)
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if self.thread_id is None:
+                    stack.append(names.get(thread_id) or f"thread-{thread_id}")
+                stack.reverse()
+                self._stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+
+# ---------------------------------------------------
+# 全进程分析 (管理接口)
+# ---------------------------------------------------
+_global_lock = asyncio.Lock()
+
+
+async def profile_process(seconds: float, interval: float, all_threads: bool = True) -> SamplingProfiler:
+    """在当前进程采样 seconds 秒；同一时间只允许一个分析任务"""
+    if _global_lock.locked():
+        raise ProfilerBusy("another profiling session is running")
+    async with _global_lock:
+        thread_id = None if all_threads else threading.get_ident()
+        profiler = SamplingProfiler(interval=interval, thread_id=thread_id)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            # join 很快 (最多一个采样间隔)，但仍放到线程池避免阻塞事件循环
+            await asyncio.to_thread(profiler.stop)
+        logger.info(f"Process profile finished: {profiler.samples} samples in {seconds}s")
+        return profiler
+
+
+# ---------------------------------------------------
+# 单请求分析
+# ---------------------------------------------------
+class RequestProfileStore:
+    """最近若干个单请求分析结果，按请求 ID 查询"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._profiles: "OrderedDict[str, str]" = OrderedDict()
+
+    def put(self, request_id: str, collapsed: str):
+        self._profiles[request_id] = collapsed
+        self._profiles.move_to_end(request_id)
+        while len(self._profiles) > self.capacity:
+            self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[str]:
+        return self._profiles.get(request_id)
+
+    def list(self) -> List[str]:
+        return list(self._profiles)
+
+
+request_profiles = RequestProfileStore(settings.PROFILER_KEEP)
+
+
+class ProfilingMiddleware:
+    """
+    单请求分析：请求头带 PROFILER_REQUEST_HEADER 且内部 Token 正确时，请求期间采样事件循环线程
+    结果按请求 ID 保存，响应头返回 X-Profile-Id，再通过 /admin/profile/requests/{id} 获取
+    注意：同一事件循环上并发的其他请求也会出现在采样中，适合在低峰期 / 单请求复现时使用
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILER_REQUEST_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILER_PER_REQUEST_ENABLED or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = request_id_var.get()
+        profiler = SamplingProfiler(
+            interval=settings.PROFILER_DEFAULT_INTERVAL_MS / 1000,
+            thread_id=threading.get_ident(),
+        )
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.stop()
+            request_profiles.put(request_id, profiler.collapsed())
+
+    def _requested(self, scope) -> bool:
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        if headers.get(self.header) not in (b"1", b"true"):
+            return False
+        token = headers.get(b"x-internal-token", b"")
+        return hmac.compare_digest(token, settings.API_SECRET_KEY.encode("utf-8"))
@@ -0,0 +1,179 @@
+# app/core/prompt_registry.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import yaml
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+
+@dataclass
+class PromptEntry:
+    """单个 Prompt 模板 (一个 YAML 文件)"""
+    name: str
+    path: str
+    mtime: float
+    sha256: str
+    template: ChatPromptTemplate
+    # 模板静态部分 (不含变量取值) 的 token 数，用于比较不同模板的成本
+    token_cost: int
+    token_cost_by_role: Dict[str, int] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def version(self) -> str:
+        return self.sha256[:12]
+
+
+def _count_tokens(text: str) -> int:
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        # tiktoken 词表需要联网下载，离线环境退化为粗略估算
+        from app.infra.llm.admission import estimate_tokens
+        return estimate_tokens(text)
+
+
+def load_prompt_file(path: str) -> PromptEntry:
+    """加载并解析 YAML Prompt 模板"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    prompt_config = yaml.safe_load(raw.decode("utf-8"))
+
+    messages = []
+    cost_by_role: Dict[str, int] = {}
+    # 转换 YAML 结构为 LangChain Message Tuple
+    for msg in prompt_config.get("messages", []):
+        role, content = msg.get("role"), msg.get("content")
+        messages.append((role, content))
+        cost_by_role[role] = cost_by_role.get(role, 0) + _count_tokens(content or "")
+
+    return PromptEntry(
+        name=os.path.splitext(os.path.basename(path))[0],
+        path=path,
+        mtime=os.path.getmtime(path),
+        sha256=hashlib.sha256(raw).hexdigest(),
+        template=ChatPromptTemplate.from_messages(messages),
+        token_cost=sum(cost_by_role.values()),
+        token_cost_by_role=cost_by_role,
+    )
+
+
+class PromptRegistry:
+    """
+    Prompt 模板注册表
+    - 加载 prompts 目录下的全部 *.yaml，模板名即文件名 (不含扩展名)
+    - 热加载：按 mtime 发现变化，再用内容哈希确认，解析失败时保留旧版本
+    - 选择顺序：请求指定 -> 学科映射 (PROMPT_TEMPLATE_BY_SUBJECT) -> 默认模板
+    """
+
+    def __init__(self, directory: str = PROMPT_DIR, reload_interval: float = 5.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._entries: Dict[str, PromptEntry] = {}
+        self._usage: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+        self.scan(force=True)
+
+        if settings.PROMPT_DEFAULT_TEMPLATE not in self._entries:
+            # 这是一个严重的配置错误，应用启动时应该报错
+            raise FileNotFoundError(
+                f"Critical Error: default prompt template '{settings.PROMPT_DEFAULT_TEMPLATE}' not found in {directory}"
+            )
+
+    # ---------------------------------------------------
+    # 加载 / 热加载
+    # ---------------------------------------------------
+    def scan(self, force: bool = False):
+        now = time.monotonic()
+        if not force and (self.reload_interval <= 0 or now - self._last_scan < self.reload_interval):
+            return
+
+        with self._lock:
+            self._last_scan = now
+            seen = set()
+            for filename in sorted(os.listdir(self.directory)):
+                if not filename.endswith((".yaml", ".yml")):
+                    continue
+                path = os.path.join(self.directory, filename)
+                name = os.path.splitext(filename)[0]
+                seen.add(name)
+
+                current = self._entries.get(name)
+                try:
+                    if current is not None and os.path.getmtime(path) == current.mtime:
+                        continue
+                    entry = load_prompt_file(path)
+                except Exception as e:
+                    logger.error(f"Failed to load prompt template {path}: {e}")
+                    continue
+
+                if current is not None and entry.sha256 == current.sha256:
+                    # 只是 touch 了文件，内容未变
+                    current.mtime = entry.mtime
+                    continue
+
+                self._entries[name] = entry
+                action = "Reloaded" if current is not None else "Loaded"
+                logger.info(f"{action} prompt template '{name}' (version={entry.version}, tokens={entry.token_cost})")
+
+            for name in set(self._entries) - seen:
+                if name == settings.PROMPT_DEFAULT_TEMPLATE:
+                    # 默认模板文件被删除时保留内存中的最后版本，避免服务不可用
+                    continue
+                logger.info(f"Prompt template '{name}' removed")
+                self._entries.pop(name)
+
+    # ---------------------------------------------------
+    # 查询
+    # ---------------------------------------------------
+    def get(self, name: str) -> Optional[PromptEntry]:
+        self.scan()
+        return self._entries.get(name)
+
+    def select(self, subject_code: Optional[str] = None, requested: Optional[str] = None) -> PromptEntry:
+        self.scan()
+        candidates = [requested, settings.PROMPT_TEMPLATE_BY_SUBJECT.get(subject_code or "")]
+        entry = None
+        for name in candidates:
+            if name and name in self._entries:
+                entry = self._entries[name]
+                break
+            if name:
+                logger.warning(f"Prompt template '{name}' not found, falling back")
+        if entry is None:
+            entry = self._entries[settings.PROMPT_DEFAULT_TEMPLATE]
+
+        self._usage[entry.name] = self._usage.get(entry.name, 0) + 1
+        return entry
+
+    def list(self) -> List[Dict]:
+        self.scan()
+        return [
+            {
+                "name": entry.name,
+                "version": entry.version,
+                "token_cost": entry.token_cost,
+                "token_cost_by_role": entry.token_cost_by_role,
+                "input_variables": entry.template.input_variables,
+                "loaded_at": entry.loaded_at,
+                "usage": self._usage.get(entry.name, 0),
+                "default": entry.name == settings.PROMPT_DEFAULT_TEMPLATE,
+            }
+            for entry in self._entries.values()
+        ]
+
+
+prompt_registry = PromptRegistry(reload_interval=settings.PROMPT_RELOAD_INTERVAL)
@@ -0,0 +1,54 @@
+# app/core/singleflight.py
+import asyncio
+import unicodedata
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core import deadline
+from app.core.metrics import CACHE_HITS
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    请求合并 (single-flight)
+    同一个 key 的并发调用只执行一次 fn，其余调用等待同一个结果 (包括异常)
+    结果不做缓存：第一个调用结束后，后续到达的同 key 请求会重新执行
+    - 共享调用不继承发起者的截止时间 (只受各阶段自身超时约束)，否则发起者预算较短时
+      会让预算充足的等待者一起降级；每个调用方按自己的剩余时间等待，超时抛出 DeadlineExceeded
+    - trace 等其他 contextvar 仍继承自发起者，共享调用的 Span 记在发起者的链路中
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            # 在独立 Task 中执行，发起者被取消 (客户端断开) 时不会连带取消其它等待者
+            task = deadline.spawn_detached(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self._executed += 1
+        else:
+            self._coalesced += 1
+            CACHE_HITS.labels(cache=f"singleflight_{self.name}").inc()
+        # 只等到自己的截止时间为止，超时不会取消共享调用
+        return await deadline.within(asyncio.shield(task), f"singleflight_{self.name}")
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._calls),
+            "executed": self._executed,
+            "coalesced": self._coalesced,
+        }
+
+
+def normalize_text(text: str) -> str:
+    """合并键用的文本归一化：全角转半角、合并连续空白"""
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
@@ -0,0 +1,263 @@
+# app/core/tracing.py
+"""
+轻量级请求链路追踪
+- Span 通过 contextvars 在 service / repository / infra 各层之间自动传递父子关系
+- 导出器可选：none (默认，无开销) / memory (测试用) / log / otel (已安装 opentelemetry 时桥接到其全局 Tracer)
+- TracingMiddleware 读取 Java 端传来的请求 ID，并在响应中返回 X-Request-ID 与 Server-Timing 头
+"""
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # 可选依赖
+    otel_trace = None
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+
+class Trace:
+    """一次 HTTP 请求内完成的所有 Span，用于生成 Server-Timing"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.spans: List[Span] = []
+
+    def server_timing(self, total_ms: float) -> str:
+        # 同名 Span (如多次 embedding) 合并耗时
+        durations: Dict[str, float] = {}
+        for span in self.spans:
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration_ms
+        parts = [f"{_timing_token(name)};dur={ms:.1f}" for name, ms in durations.items()]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+def _timing_token(name: str) -> str:
+    # Server-Timing 的指标名必须是 token，空格 / 斜杠等替换掉
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+
+
+# ---------------------------------------------------
+# 导出器
+# ---------------------------------------------------
+class SpanExporter:
+    """默认导出器：丢弃所有 Span"""
+
+    def export(self, span: Span):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """保存最近的 Span，供测试 / 调试接口读取"""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def get_finished_spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+
+class LoggingSpanExporter(SpanExporter):
+    def export(self, span: Span):
+        logger.info(
+            f"span name={span.name} trace={span.trace_id} parent={span.parent_id or '-'} "
+            f"dur={span.duration_ms:.1f}ms error={span.error or '-'}"
+        )
+
+
+def build_exporter(kind: str) -> SpanExporter:
+    if kind == "memory":
+        return InMemorySpanExporter()
+    if kind == "log":
+        return LoggingSpanExporter()
+    return SpanExporter()
+
+
+# ---------------------------------------------------
+# Tracer
+# ---------------------------------------------------
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# 当前请求 ID，日志等其他模块也可以读取
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[SpanExporter] = None, enabled: bool = True, use_otel: bool = False):
+        self.exporter = exporter or SpanExporter()
+        self.enabled = enabled
+        self._otel = otel_trace.get_tracer("zentrio") if (use_otel and otel_trace is not None) else None
+        if use_otel and otel_trace is None:
+            logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed, spans are not exported")
+
+    @contextmanager
+    def start_span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        trace = _current_trace.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else (trace.request_id if trace else uuid.uuid4().hex),
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=time.perf_counter(),
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            if self._otel is not None:
+                with self._otel.start_as_current_span(name, attributes=attributes):
+                    yield span
+            else:
+                yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            self._finish(span, trace)
+
+    def record_span(self, name: str, seconds: float, **attributes):
+        """补记一个已知耗时的子 Span (如 OCR 引擎内部的检测 / 识别耗时)"""
+        if not self.enabled:
+            return
+        parent = _current_span.get()
+        end = time.perf_counter()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else request_id_var.get(),
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=end - seconds,
+            end=end,
+            attributes=attributes,
+        )
+        self._finish(span, _current_trace.get())
+
+    def _finish(self, span: Span, trace: Optional[Trace]):
+        if trace is not None:
+            trace.spans.append(span)
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Span export failed: {e}")
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """函数装饰器，同步 / 异步函数都适用"""
+
+        def decorator(fn: Callable) -> Callable:
+            span_name = name or fn.__qualname__
+
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.start_span(span_name):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.start_span(span_name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+tracer = Tracer(
+    exporter=build_exporter(settings.TRACING_EXPORTER),
+    enabled=settings.TRACING_ENABLED,
+    use_otel=settings.TRACING_EXPORTER == "otel",
+)
+traced = tracer.traced
+
+
+# ---------------------------------------------------
+# ASGI 中间件
+# ---------------------------------------------------
+class TracingMiddleware:
+    """
+    每个 HTTP 请求一个 Trace：
+    - 请求 ID 取自 TRACING_REQUEST_ID_HEADER (Java 端透传)，没有则生成
+    - 响应头返回 X-Request-ID 与 Server-Timing (各 Span 耗时)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.TRACING_REQUEST_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == self.header:
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        trace = Trace(request_id)
+        trace_token = _current_trace.set(trace)
+        rid_token = request_id_var.set(request_id)
+        start = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                if tracer.enabled and settings.TRACING_SERVER_TIMING:
+                    headers.append("Server-Timing", trace.server_timing((time.perf_counter() - start) * 1000))
+            await send(message)
+
+        try:
+            with tracer.start_span(f"{scope['method']} {scope['path']}"):
+                await self.app(scope, receive, send_with_headers)
+        finally:
+            request_id_var.reset(rid_token)
+            _current_trace.reset(trace_token)
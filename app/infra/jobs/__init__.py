@@ -0,0 +1,5 @@
+from .base import JobLeaseLost, JobQueue
+from .memory import MemoryJobQueue
+from .postgres import PostgresJobQueue
+
+__all__ = ["JobLeaseLost", "JobQueue", "MemoryJobQueue", "PostgresJobQueue"]
@@ -0,0 +1,40 @@
+# app/infra/jobs/base.py
+from typing import Any, Optional
+
+from app.models.job import Job
+
+
+class JobLeaseLost(Exception):
+    """任务租约已过期并被其他 worker 重新领取，当前 worker 不能再更新该任务"""
+
+
+class JobQueue:
+    """
+    任务队列后端接口
+    - claim: 领取 pool 中一个到期任务并标记为 running (attempts + 1)，没有任务时等待片刻后返回 None
+    - heartbeat / progress: 更新进度并续约，防止长任务被当作僵死任务重新领取
+    - fail(retry_in=None) 表示最终失败，否则 retry_in 秒后重新入队
+    - progress / complete / fail 只有当前持有者 (worker_id) 才能更新：
+      租约已被他人接手时 progress 抛出 JobLeaseLost，complete / fail 返回 None
+    """
+
+    async def enqueue(self, job: Job) -> Job:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def claim(self, pool: str, worker_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def progress(self, job_id: str, worker_id: str, progress: float, message: Optional[str] = None):
+        raise NotImplementedError
+
+    async def complete(self, job_id: str, worker_id: str, result: Any) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
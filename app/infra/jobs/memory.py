@@ -0,0 +1,112 @@
+# app/infra/jobs/memory.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from app.models.job import Job, JobStatus
+from .base import JobLeaseLost, JobQueue
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class MemoryJobQueue(JobQueue):
+    """
+    进程内队列 (asyncio)
+    任务只存在于当前进程：多 worker 部署时提交与查询可能落到不同进程，生产环境请使用 postgres 后端
+    """
+
+    def __init__(self, poll_interval: float = 1.0, max_finished: int = 10000):
+        self.poll_interval = poll_interval
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+
+    def _queue(self, pool: str) -> asyncio.Queue:
+        if pool not in self._queues:
+            self._queues[pool] = asyncio.Queue()
+        return self._queues[pool]
+
+    async def enqueue(self, job: Job) -> Job:
+        now = _now()
+        job.status = JobStatus.QUEUED
+        job.created_at = job.created_at or now
+        job.updated_at = now
+        job.run_after = now
+        self._jobs[job.id] = job
+        self._queue(job.pool).put_nowait(job.id)
+        self._evict_finished()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def claim(self, pool: str, worker_id: str) -> Optional[Job]:
+        try:
+            job_id = await asyncio.wait_for(self._queue(pool).get(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            return None
+        job = self._jobs.get(job_id)
+        if job is None or job.status != JobStatus.QUEUED:
+            return None
+        now = _now()
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.updated_at = now
+        return job
+
+    async def progress(self, job_id: str, worker_id: str, progress: float, message: Optional[str] = None):
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            raise JobLeaseLost(f"job {job_id} is no longer owned by {worker_id}")
+        job.progress = progress
+        job.message = message if message is not None else job.message
+        job.locked_at = job.updated_at = _now()
+
+    async def complete(self, job_id: str, worker_id: str, result: Any) -> Optional[Job]:
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return None
+        now = _now()
+        job.status = JobStatus.SUCCEEDED
+        job.result = result
+        job.error = None
+        job.progress = 1.0
+        job.locked_by = None
+        job.updated_at = job.finished_at = now
+        return job
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> Optional[Job]:
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return None
+        now = _now()
+        job.error = error
+        job.locked_by = None
+        job.updated_at = now
+        if retry_in is None:
+            job.status = JobStatus.FAILED
+            job.finished_at = now
+            return job
+
+        job.status = JobStatus.QUEUED
+        job.run_after = now + timedelta(seconds=retry_in)
+        asyncio.get_running_loop().call_later(retry_in, self._queue(job.pool).put_nowait, job.id)
+        return job
+
+    def _owned(self, job_id: str, worker_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status != JobStatus.RUNNING or job.locked_by != worker_id:
+            return None
+        return job
+
+    def _evict_finished(self):
+        # 只保留最近的已完成任务，避免内存无限增长
+        finished = [j for j in self._jobs.values() if j.status in JobStatus.FINISHED]
+        overflow = len(finished) - self.max_finished
+        if overflow > 0:
+            for job in sorted(finished, key=lambda j: j.finished_at)[:overflow]:
+                self._jobs.pop(job.id, None)
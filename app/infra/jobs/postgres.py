@@ -0,0 +1,146 @@
+# app/infra/jobs/postgres.py
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Optional
+
+from sqlalchemy import func, text, update
+from sqlmodel import Session
+
+from app.core.database import engine as global_engine
+from app.models.job import Job, JobStatus
+from .base import JobLeaseLost, JobQueue
+
+logger = logging.getLogger(__name__)
+
+# 租约过期且已用完重试次数的任务 (worker 反复崩溃) 直接标记为失败，不再重新领取
+_EXPIRE_SQL = text("""
+    UPDATE edu_job
+    SET status = 'failed',
+        error = 'lease expired after ' || attempts || ' attempts (worker lost)',
+        locked_by = NULL,
+        updated_at = now(),
+        finished_at = now()
+    WHERE pool = :pool
+      AND status = 'running'
+      AND locked_at < now() - make_interval(secs => :lease)
+      AND attempts >= max_attempts
+    RETURNING id
+""")
+
+# 领取一个到期任务；租约过期的 running 任务 (worker 崩溃) 在重试次数内也会被重新领取
+# SKIP LOCKED 让多个 worker / 进程并发领取时互不阻塞
+_CLAIM_SQL = text("""
+    UPDATE edu_job
+    SET status = 'running',
+        attempts = attempts + 1,
+        locked_by = :worker_id,
+        locked_at = now(),
+        updated_at = now()
+    WHERE id = (
+        SELECT id FROM edu_job
+        WHERE pool = :pool
+          AND (
+              (status = 'queued' AND run_after <= now())
+              OR (status = 'running' AND locked_at < now() - make_interval(secs => :lease)
+                  AND attempts < max_attempts)
+          )
+        ORDER BY run_after
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+""")
+
+
+class PostgresJobQueue(JobQueue):
+    """
+    基于 PostgreSQL 的任务队列 (不需要额外的消息中间件)
+    仓储层使用同步 Session，这里统一放到线程池执行，避免阻塞事件循环
+    """
+
+    def __init__(self, db_engine=None, poll_interval: float = 1.0, lease_seconds: float = 300.0):
+        self.engine = db_engine or global_engine
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+    async def enqueue(self, job: Job) -> Job:
+        return await asyncio.to_thread(self._enqueue, job)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def claim(self, pool: str, worker_id: str) -> Optional[Job]:
+        job = await asyncio.to_thread(self._claim, pool, worker_id)
+        if job is None:
+            await asyncio.sleep(self.poll_interval)
+        return job
+
+    async def progress(self, job_id: str, worker_id: str, progress: float, message: Optional[str] = None):
+        values = {"progress": progress, "locked_at": func.now(), "updated_at": func.now()}
+        if message is not None:
+            values["message"] = message
+        if await asyncio.to_thread(self._update, job_id, worker_id, values) is None:
+            raise JobLeaseLost(f"job {job_id} is no longer owned by {worker_id}")
+
+    async def complete(self, job_id: str, worker_id: str, result: Any) -> Optional[Job]:
+        return await asyncio.to_thread(self._update, job_id, worker_id, {
+            "status": JobStatus.SUCCEEDED,
+            "result": result,
+            "error": None,
+            "progress": 1.0,
+            "locked_by": None,
+            "updated_at": func.now(),
+            "finished_at": func.now(),
+        })
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> Optional[Job]:
+        values = {"error": error, "locked_by": None, "updated_at": func.now()}
+        if retry_in is None:
+            values.update(status=JobStatus.FAILED, finished_at=func.now())
+        else:
+            values.update(
+                status=JobStatus.QUEUED,
+                run_after=func.now() + timedelta(seconds=retry_in),
+            )
+        return await asyncio.to_thread(self._update, job_id, worker_id, values)
+
+    # ---------------------------------------------------
+    # 同步实现 (线程池中执行)
+    # ---------------------------------------------------
+    def _enqueue(self, job: Job) -> Job:
+        with Session(self.engine) as session:
+            job.status = JobStatus.QUEUED
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        with Session(self.engine) as session:
+            return session.get(Job, job_id)
+
+    def _claim(self, pool: str, worker_id: str) -> Optional[Job]:
+        with Session(self.engine) as session:
+            expired = session.execute(_EXPIRE_SQL, {"pool": pool, "lease": self.lease_seconds}).scalars().all()
+            if expired:
+                logger.error(f"[Job] Lease expired with no attempts left, marked failed: {expired}")
+            row = session.execute(
+                _CLAIM_SQL, {"pool": pool, "worker_id": worker_id, "lease": self.lease_seconds}
+            ).mappings().first()
+            session.commit()
+            return Job(**row) if row else None
+
+    def _update(self, job_id: str, worker_id: str, values: dict) -> Optional[Job]:
+        """只有当前持有者能更新；租约已被其他 worker 接手时不覆盖，返回 None"""
+        with Session(self.engine) as session:
+            updated = session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+                .values(**values)
+            ).rowcount
+            session.commit()
+            if not updated:
+                logger.warning(f"[Job] {job_id}: lease lost by {worker_id}, update discarded")
+                return None
+            return session.get(Job, job_id)
@@ -1,7 +1,29 @@
-from .chat import llm
-from .embeddings import get_embedding_vector
+from .admission import Lane, AdmissionTimeout, chat_admission, embedding_admission, estimate_tokens, usage_tokens
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, chat_breaker, embedding_breaker
+from .cascade import CascadeRouter, Tier, diagnosis_cascade
+from .chat import llm, llm_fast
+from .embeddings import get_embedding_vector, get_embedding_vectors
+from .http_client import http_client, startup_http_client, shutdown_http_client
 
 __all__ = [
+    "Lane",
+    "AdmissionTimeout",
+    "chat_admission",
+    "embedding_admission",
+    "estimate_tokens",
+    "usage_tokens",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "chat_breaker",
+    "embedding_breaker",
+    "CascadeRouter",
+    "Tier",
+    "diagnosis_cascade",
     "llm",
+    "llm_fast",
     "get_embedding_vector",
+    "get_embedding_vectors",
+    "http_client",
+    "startup_http_client",
+    "shutdown_http_client",
 ]
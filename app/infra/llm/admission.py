@@ -0,0 +1,252 @@
+# =======================================================
+# 上游 LLM 准入控制 (并发上限 + 令牌桶限速 + 优先级队列)
+# =======================================================
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Lane(IntEnum):
+    """优先级通道：数值越小越先放行"""
+    INTERACTIVE = 0  # 在线诊断 / 检索，学生在等结果
+    BULK = 1  # 知识同步等批量任务
+
+
+class AdmissionTimeout(Exception):
+    """排队超过截止时间仍未获得放行"""
+
+
+class TokenBucket:
+    """
+    令牌桶：rate 为每秒补充的令牌数，capacity 为桶容量 (允许的突发量)
+    rate <= 0 表示不限速
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """还需要等待多久才能拿到 amount 个令牌 (0 表示立即可用)"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # 单次请求超过桶容量时按桶容量计算，避免永远无法放行
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if not self.unlimited:
+            self.tokens -= amount
+
+
+class AdmissionController:
+    """
+    异步准入控制器
+    - max_in_flight: 同时在途的上游请求上限
+    - rps / tpm: 每秒请求数与每分钟 token 数令牌桶
+    - 等待中的请求按 (lane, 到达顺序) 排队，超过截止时间抛出 AdmissionTimeout
+    """
+
+    def __init__(self, name: str, max_in_flight: int, rps: float = 0.0, tpm: float = 0.0, timeout: float = 30.0):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.rps_bucket = TokenBucket(rate=rps, capacity=max(rps, 1.0))
+        self.tpm_bucket = TokenBucket(rate=tpm / 60.0, capacity=tpm)
+
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # 统计
+        self._admitted = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---------------------------------------------------
+    # 对外接口
+    # ---------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, lane: Lane = Lane.INTERACTIVE, tokens: int = 0, timeout: Optional[float] = None):
+        """
+        用法:
+            async with chat_admission.slot(Lane.INTERACTIVE, tokens=est):
+                await llm.ainvoke(...)
+        """
+        await self.acquire(lane, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, lane: Lane = Lane.INTERACTIVE, tokens: int = 0, timeout: Optional[float] = None):
+        start = time.monotonic()
+        timeout = self.timeout if timeout is None else timeout
+
+        # 快速路径：无人排队且资源充足时直接放行
+        if not self._waiters and self._try_admit(tokens):
+            self._record_wait(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(lane), next(self._seq), float(tokens), future))
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            logger.warning(
+                f"[{self.name}] admission timeout after {timeout:.1f}s "
+                f"(lane={Lane(lane).name}, queue={len(self._waiters)}, in_flight={self._in_flight})"
+            )
+            raise AdmissionTimeout(f"{self.name}: queued longer than {timeout:.1f}s")
+        except asyncio.CancelledError:
+            # 已被放行但调用方在此刻被取消 (如客户端断开)，归还名额
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        self._record_wait(time.monotonic() - start)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """不排队：有空闲名额且没有人在等时立即占用，否则返回 False (用于对冲等可放弃的额外请求)"""
+        if not self._waiters and self._try_admit(tokens):
+            self._record_wait(0.0)
+            return True
+        return False
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """调用结束后用真实 token 用量修正 TPM 令牌桶 (多退少补)"""
+        if actual_tokens:
+            self.tpm_bucket.consume(actual_tokens - estimated_tokens)
+
+    def stats(self) -> Dict:
+        by_lane = {lane.name.lower(): 0 for lane in Lane}
+        for lane, _, _, future in self._waiters:
+            if not future.done():
+                by_lane[Lane(lane).name.lower()] += 1
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": sum(by_lane.values()),
+            "queue_depth_by_lane": by_lane,
+            "admitted": self._admitted,
+            "timeouts": self._timeouts,
+            "wait_avg_ms": round(self._wait_total / self._admitted * 1000, 2) if self._admitted else 0.0,
+            "wait_max_ms": round(self._wait_max * 1000, 2),
+        }
+
+    # ---------------------------------------------------
+    # 内部实现
+    # ---------------------------------------------------
+    def _try_admit(self, tokens: float) -> bool:
+        if self._in_flight >= self.max_in_flight:
+            return False
+        if self.rps_bucket.wait_time(1) > 0 or self.tpm_bucket.wait_time(tokens) > 0:
+            return False
+        self.rps_bucket.consume(1)
+        self.tpm_bucket.consume(tokens)
+        self._in_flight += 1
+        return True
+
+    def _dispatch(self):
+        """按优先级放行队首请求；被令牌桶挡住时挂一个定时器稍后再试"""
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                # 已超时 / 被取消的请求直接丢弃
+                heapq.heappop(self._waiters)
+                continue
+
+            delay = max(self.rps_bucket.wait_time(1), self.tpm_bucket.wait_time(tokens))
+            if delay > 0:
+                self._schedule(delay)
+                return
+
+            heapq.heappop(self._waiters)
+            self.rps_bucket.consume(1)
+            self.tpm_bucket.consume(tokens)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None and not self._timer.cancelled():
+            return
+
+        def _fire():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = asyncio.get_running_loop().call_later(delay, _fire)
+
+    def _record_wait(self, waited: float):
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """粗略估算 token 数 (中文约 1 字 1 token，英文约 4 字符 1 token)，只用于限速预扣"""
+    total = 0
+    for text in texts:
+        if not text:
+            continue
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        total += (len(text) - ascii_chars) + ascii_chars // 4
+    return total
+
+
+def usage_tokens(message) -> int:
+    """从 LangChain 返回的 AIMessage 中取上游实际 token 用量 (取不到时返回 0，settle 不做修正)"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens") or 0
+
+
+chat_admission = AdmissionController(
+    name="chat",
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    rps=settings.LLM_RPS,
+    tpm=settings.LLM_TPM,
+    timeout=settings.LLM_QUEUE_TIMEOUT,
+)
+
+embedding_admission = AdmissionController(
+    name="embedding",
+    max_in_flight=settings.EMBEDDING_MAX_IN_FLIGHT,
+    rps=settings.EMBEDDING_RPS,
+    tpm=settings.EMBEDDING_TPM,
+    timeout=settings.EMBEDDING_QUEUE_TIMEOUT,
+)
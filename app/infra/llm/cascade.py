@@ -0,0 +1,148 @@
+# app/infra/llm/cascade.py
+"""
+模型级联 (先快后强)
+- 先用便宜的快速模型，解析成功且自评置信度 >= 阈值时直接采用
+- 解析失败 / 置信度低 / 未给出置信度时升级到更强的模型
+- 请求剩余时间不足时不再升级 (只用快速模型)，见 app.core.deadline
+"""
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import CASCADE_CALLS, CASCADE_ESCALATIONS, CASCADE_TIER_LATENCY, DEADLINE_DEGRADATIONS, Stage
+from .chat import llm, llm_fast, llm_fast_hedge, llm_hedge
+from .hedging import Hedger, build_hedger
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Tier:
+    name: str
+    model: BaseChatModel
+    # 对冲请求的目标模型 (未配置备用端点 / 模型时与 model 相同)
+    hedge_model: BaseChatModel
+    # 各层级耗时分布不同，对冲延迟分别统计
+    hedger: Hedger
+
+
+class CascadeRouter:
+    """
+    按层级依次尝试，由调用方提供每一层的执行函数 attempt(tier) -> 已解析的结果
+    结果通过 confidence 属性 (0~1，可为 None) 自报把握程度
+    :param tiers: 从便宜到昂贵排列；只有一层时相当于不级联
+    :param min_confidence: 低于该置信度时升级
+    """
+
+    def __init__(self, name: str, tiers: List[Tier], min_confidence: float, enabled: bool = True):
+        self.name = name
+        self.tiers = tiers
+        self.min_confidence = min_confidence
+        self.enabled = enabled and len(tiers) > 1
+
+        # 统计
+        self._calls: Counter = Counter()
+        self._escalations: Counter = Counter()
+
+    def plan(self) -> List[Tier]:
+        """本次请求要尝试的层级"""
+        if deadline.below(settings.DEADLINE_FAST_MODEL_SECONDS):
+            # 时间不够：只用最快的一层，不升级
+            if len(self.tiers) > 1:
+                DEADLINE_DEGRADATIONS.labels(stage=Stage.LLM_CALL, action="fast_model").inc()
+            return self.tiers[:1]
+        if not self.enabled:
+            # 未启用级联：直接用最强的一层
+            return self.tiers[-1:]
+        return self.tiers
+
+    async def run(self, attempt: Callable[[Tier], Awaitable[T]]) -> T:
+        tiers = self.plan()
+        for index, tier in enumerate(tiers):
+            last = index == len(tiers) - 1
+            start = time.perf_counter()
+            try:
+                result = await attempt(tier)
+            except OutputParserException:
+                self._record(tier, "parse_error")
+                if last or not self._can_escalate():
+                    raise
+                self._escalate(tier, "parse_error")
+                continue
+            except Exception:
+                self._record(tier, "error")
+                raise
+            finally:
+                CASCADE_TIER_LATENCY.labels(router=self.name, tier=tier.name).observe(time.perf_counter() - start)
+
+            reason = self._escalation_reason(result)
+            if last or reason is None or not self._can_escalate():
+                self._record(tier, "accepted")
+                return result
+            self._record(tier, "escalated")
+            self._escalate(tier, reason)
+
+        raise RuntimeError(f"cascade {self.name} has no tiers")
+
+    def _escalation_reason(self, result) -> Optional[str]:
+        confidence = getattr(result, "confidence", None)
+        if confidence is None:
+            return "no_confidence"
+        if confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    @staticmethod
+    def _can_escalate() -> bool:
+        # 升级前重新检查剩余时间 (第一层可能已用掉大半预算)
+        return not deadline.below(settings.DEADLINE_FAST_MODEL_SECONDS)
+
+    def _record(self, tier: Tier, outcome: str):
+        self._calls[(tier.name, outcome)] += 1
+        CASCADE_CALLS.labels(router=self.name, tier=tier.name, outcome=outcome).inc()
+
+    def _escalate(self, tier: Tier, reason: str):
+        self._escalations[reason] += 1
+        CASCADE_ESCALATIONS.labels(router=self.name, reason=reason).inc()
+        logger.debug(f"[{self.name}] escalating from {tier.name}: {reason}")
+
+    def stats(self) -> Dict:
+        first = self.tiers[0].name
+        first_calls = sum(n for (tier, _), n in self._calls.items() if tier == first)
+        escalated = sum(self._escalations.values())
+        return {
+            "enabled": self.enabled,
+            "tiers": [tier.name for tier in self.tiers],
+            "calls": {f"{tier}.{outcome}": n for (tier, outcome), n in self._calls.items()},
+            "escalations": dict(self._escalations),
+            "escalation_rate": round(escalated / first_calls, 4) if first_calls else 0.0,
+            "hedging": {tier.name: tier.hedger.stats() for tier in self.tiers},
+        }
+
+
+def _build_tiers() -> List[Tier]:
+    if llm_fast is llm:
+        # 未配置 ZHIPU_MODEL_GLM_FAST：只有一层
+        return [Tier("strong", llm, llm_hedge, build_hedger("chat_strong"))]
+    return [
+        Tier("fast", llm_fast, llm_fast_hedge, build_hedger("chat_fast")),
+        Tier("strong", llm, llm_hedge, build_hedger("chat_strong")),
+    ]
+
+
+# 诊断用模型级联
+diagnosis_cascade = CascadeRouter(
+    "diagnosis",
+    tiers=_build_tiers(),
+    min_confidence=settings.LLM_CASCADE_MIN_CONFIDENCE,
+    enabled=settings.LLM_CASCADE_ENABLED,
+)
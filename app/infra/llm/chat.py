@@ -1,13 +1,43 @@
 # =======================================================
 # 1. LLM 客户端 (用于对话/诊断)
 # =======================================================
+from typing import Optional
+
 from langchain_openai import ChatOpenAI
 
 from app.core.config import settings
+from .http_client import http_client, build_timeout
+
+
+def _build_chat(model: str, api_base: Optional[str] = None, api_key: Optional[str] = None) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,  # 例如 "glm-4"
+        openai_api_key=api_key or settings.ZHIPU_API_KEY,
+        openai_api_base=api_base or settings.ZHIPU_API_BASE,
+        temperature=settings.TEMPERATURE,
+        # 共用连接池；重试统一由 RetryTransport 负责，关闭 SDK 自带重试避免叠加
+        http_async_client=http_client,
+        timeout=build_timeout(),
+        max_retries=0,
+    )
+
+
+def _build_hedge(primary: ChatOpenAI) -> ChatOpenAI:
+    """对冲请求使用的客户端：未配置备用端点 / 模型时直接复用原客户端"""
+    if not (settings.LLM_HEDGE_API_BASE or settings.LLM_HEDGE_MODEL):
+        return primary
+    return _build_chat(
+        settings.LLM_HEDGE_MODEL or primary.model_name,
+        api_base=settings.LLM_HEDGE_API_BASE,
+        api_key=settings.LLM_HEDGE_API_KEY,
+    )
+
+
+llm = _build_chat(settings.ZHIPU_MODEL_GLM)
+
+# 截止时间不足时使用的快速模型 (未配置 ZHIPU_MODEL_GLM_FAST 时与 llm 相同)
+llm_fast = _build_chat(settings.ZHIPU_MODEL_GLM_FAST) if settings.ZHIPU_MODEL_GLM_FAST else llm
 
-llm = ChatOpenAI(
-    model=settings.ZHIPU_MODEL_GLM,  # 例如 "glm-4"
-    openai_api_key=settings.ZHIPU_API_KEY,
-    openai_api_base=settings.ZHIPU_API_BASE,
-    temperature=settings.TEMPERATURE,
-)
+# 对冲请求的目标 (可指向备用端点 / 模型)
+llm_hedge = _build_hedge(llm)
+llm_fast_hedge = _build_hedge(llm_fast) if llm_fast is not llm else llm_hedge
@@ -0,0 +1,221 @@
+# app/infra/llm/circuit_breaker.py
+"""
+上游熔断 (chat / embedding 分别统计)
+- closed: 正常放行，按滑动时间窗统计失败率；调用数 >= min_calls 且失败率 >= 阈值时打开
+- open: 直接拒绝 (CircuitOpenError)，调用方立即走兜底 / 纯关键词检索，而不是等满一个超时
+- half_open: open_seconds 后放行少量探测请求，全部成功则关闭，任一失败重新打开
+"""
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Dict, Tuple, Type
+
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+from .admission import AdmissionTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+# 指标中的状态值
+_STATE_VALUE = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被直接拒绝"""
+
+
+class CircuitBreaker:
+    """
+    :param failure_rate: 触发熔断的失败率
+    :param min_calls: 时间窗内至少有这么多次调用才判断失败率 (避免低流量时一两次失败就熔断)
+    :param window_seconds: 失败率统计窗口 (按秒分桶)
+    :param open_seconds: 打开后多久进入半开
+    :param half_open_calls: 半开状态放行的探测请求数
+    :param ignored: 不计入成败的异常 (如排队超时、请求自身截止时间已到，与上游健康无关)
+    """
+
+    def __init__(
+            self,
+            name: str,
+            failure_rate: float,
+            min_calls: int,
+            window_seconds: int,
+            open_seconds: float,
+            half_open_calls: int,
+            ignored: Tuple[Type[BaseException], ...] = (),
+            enabled: bool = True,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.ignored = ignored
+        self.enabled = enabled
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        # [秒, 成功数, 失败数]
+        self._buckets: deque = deque()
+        self._probes = 0
+        self._probe_successes = 0
+
+        # 统计
+        self._rejected = 0
+        self._opened = 0
+        CIRCUIT_STATE.labels(breaker=name).set(_STATE_VALUE[self._state])
+
+    # ---------------------------------------------------
+    # 对外接口
+    # ---------------------------------------------------
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次调用 (半开状态会占用一个探测名额，放行后必须调用 record_* 之一)"""
+        if not self.enabled:
+            return True
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        self._rejected += 1
+        CIRCUIT_REJECTIONS.labels(breaker=self.name).inc()
+        return False
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        用法:
+            async with chat_breaker.guard():
+                await llm.ainvoke(...)
+        熔断打开时抛出 CircuitOpenError；块内异常计为失败 (ignored 中的异常与取消不计入)
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            yield
+        except self.ignored:
+            self.record_ignored()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # 取消 (客户端断开 / 对冲落败) 不代表上游状态
+            self.record_ignored()
+            raise
+        else:
+            self.record_success()
+
+    def record_success(self):
+        if not self.enabled:
+            return
+        if self._state is CircuitState.HALF_OPEN:
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+        self._bucket()[1] += 1
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        if self._state is CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        self._bucket()[2] += 1
+        if self._state is CircuitState.CLOSED:
+            calls, failures = self._window_counts()
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                logger.error(
+                    f"[{self.name}] circuit opened: {failures}/{calls} failed in last {self.window_seconds}s"
+                )
+                self._transition(CircuitState.OPEN)
+
+    def record_ignored(self):
+        # 归还半开探测名额
+        if self._state is CircuitState.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> Dict:
+        state = self.state
+        calls, failures = self._window_counts()
+        return {
+            "state": state.value,
+            "window_calls": calls,
+            "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+            "opened": self._opened,
+            "rejected": self._rejected,
+            "retry_in_s": (
+                round(max(0.0, self._opened_at + self.open_seconds - time.monotonic()), 1)
+                if state is CircuitState.OPEN else 0.0
+            ),
+        }
+
+    # ---------------------------------------------------
+    # 内部实现
+    # ---------------------------------------------------
+    def _transition(self, state: CircuitState):
+        previous, self._state = self._state, state
+        self._probes = 0
+        self._probe_successes = 0
+        if state is CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+            self._opened += 1
+        elif state is CircuitState.CLOSED:
+            self._buckets.clear()
+        CIRCUIT_STATE.labels(breaker=self.name).set(_STATE_VALUE[state])
+        CIRCUIT_TRANSITIONS.labels(breaker=self.name, state=state.value).inc()
+        logger.warning(f"[{self.name}] circuit {previous.value} -> {state.value}")
+
+    def _bucket(self) -> list:
+        now = int(time.monotonic())
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        self._evict(now)
+        return self._buckets[-1]
+
+    def _evict(self, now: int):
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def _window_counts(self) -> Tuple[int, int]:
+        self._evict(int(time.monotonic()))
+        ok = sum(b[1] for b in self._buckets)
+        failed = sum(b[2] for b in self._buckets)
+        return ok + failed, failed
+
+
+def _build_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate=settings.CIRCUIT_FAILURE_RATE,
+        min_calls=settings.CIRCUIT_MIN_CALLS,
+        window_seconds=settings.CIRCUIT_WINDOW_SECONDS,
+        open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+        half_open_calls=settings.CIRCUIT_HALF_OPEN_CALLS,
+        # 调用方预算过紧导致的超时不代表上游故障，否则少量短预算请求就能把熔断器打开
+        ignored=(AdmissionTimeout, DeadlineExceeded),
+        enabled=settings.CIRCUIT_BREAKER_ENABLED,
+    )
+
+
+chat_breaker = _build_breaker("chat")
+embedding_breaker = _build_breaker("embedding")
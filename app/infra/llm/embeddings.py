@@ -1,9 +1,17 @@
+import asyncio
 import logging
-from typing import List
+from typing import List, Tuple
 
 from langchain_openai import OpenAIEmbeddings
 
+from app.core import deadline
 from app.core.config import settings
+from app.core.metrics import Stage, track_stage
+from app.core.singleflight import SingleFlight
+from app.core.tracing import traced
+from .admission import Lane, embedding_admission, estimate_tokens
+from .circuit_breaker import CircuitOpenError, embedding_breaker
+from .http_client import http_client, build_timeout
 
 logger = logging.getLogger(__name__)
 # =======================================================
@@ -16,13 +24,22 @@ embedding_client = OpenAIEmbeddings(
     openai_api_key=settings.ZHIPU_API_KEY,
     openai_api_base=settings.ZHIPU_API_BASE,
     # 禁用自动检查 token 长度，防止一些不必要的警告
-    check_embedding_ctx_length=False
+    check_embedding_ctx_length=False,
+    # 与 chat 共用连接池和重试策略
+    http_async_client=http_client,
+    request_timeout=build_timeout(),
+    max_retries=0,
 )
 
+# 相同文本的并发向量化请求合并为一次上游调用
+embedding_flight = SingleFlight("embedding")
 
-async def get_embedding_vector(text: str) -> List[float]:
+
+@traced("embedding.get_vector")
+async def get_embedding_vector(text: str, lane: Lane = Lane.INTERACTIVE) -> List[float]:
     """
     调用智谱 AI 生成文本向量 (1024维)
+    :param lane: 准入优先级，在线检索用 INTERACTIVE，批量同步用 BULK
     """
     if not text or not text.strip():
         logger.warning("Attempted to embed empty text")
@@ -34,8 +51,8 @@ async def get_embedding_vector(text: str) -> List[float]:
         cleaned_text = text.replace("\n", " ")
 
         # 2. 异步调用 Embedding
-        # aembed_query 是 LangChain 提供的异步方法，专门用于单个查询文本
-        vector = await embedding_client.aembed_query(cleaned_text)
+        # 相同文本的并发请求共享同一次调用 (single-flight)
+        vector = await embedding_flight.do(cleaned_text, lambda: _embed(cleaned_text, lane))
 
         # 3. 维度安全检查 (可选，但在初期调试很有用)
         if len(vector) != 1024:
@@ -45,8 +62,83 @@ async def get_embedding_vector(text: str) -> List[float]:
 
         return vector
 
+    except CircuitOpenError:
+        # 上游熔断：立即返回，调用方走降级路径 (如纯关键词检索)，不逐条打印堆栈
+        logger.debug("Embedding skipped: circuit open")
+        return []
+
+    except (asyncio.TimeoutError, deadline.DeadlineExceeded):
+        # 请求截止时间已到，不打印堆栈
+        logger.warning("Embedding skipped: request deadline exceeded")
+        return []
+
     except Exception as e:
         # 记录详细的错误堆栈，方便排查是网络问题还是 401 鉴权问题
         logger.error(f"Failed to generate embedding: {str(e)}", exc_info=True)
         # 发生错误时返回空列表，上层业务(knowledge_service)检测到空列表应抛出异常
         return []
+
+
+@traced("embedding.get_vectors")
+async def get_embedding_vectors(texts: List[str], lane: Lane = Lane.INTERACTIVE) -> List[List[float]]:
+    """
+    一次上游调用批量生成多条文本的向量 (顺序与 texts 一致)
+    任意环节失败时返回空列表，调用方走降级路径；texts 中不应包含空文本
+    """
+    if not texts:
+        return []
+
+    cleaned = [text.replace("\n", " ") for text in texts]
+    try:
+        deadline.check("embedding")
+        timeout = deadline.bounded(embedding_admission.timeout)
+        tokens = estimate_tokens(*cleaned)
+        async with embedding_breaker.guard(), embedding_admission.slot(lane, tokens=tokens, timeout=timeout):
+            with track_stage(Stage.EMBEDDING):
+                vectors, used = await deadline.within(_create_embeddings(cleaned), "embedding")
+        embedding_admission.settle(tokens, used)
+
+        if len(vectors) != len(cleaned):
+            logger.error(f"Embedding count mismatch! Expected {len(cleaned)}, got {len(vectors)}")
+            return []
+        return vectors
+
+    except CircuitOpenError:
+        logger.debug("Batch embedding skipped: circuit open")
+        return []
+
+    except (asyncio.TimeoutError, deadline.DeadlineExceeded):
+        logger.warning("Batch embedding skipped: request deadline exceeded")
+        return []
+
+    except Exception as e:
+        logger.error(f"Failed to generate batch embedding ({len(cleaned)} texts): {str(e)}", exc_info=True)
+        return []
+
+
+async def _embed(cleaned_text: str, lane: Lane) -> List[float]:
+    # 请求已超过截止时间时不再调用上游
+    deadline.check("embedding")
+    # 上游熔断时直接拒绝；经过准入控制：超过并发 / 限速时排队等待，而不是直接把 429 打到上游
+    # 排队与调用都以请求剩余时间为上限
+    timeout = deadline.bounded(embedding_admission.timeout)
+    tokens = estimate_tokens(cleaned_text)
+    async with embedding_breaker.guard(), embedding_admission.slot(lane, tokens=tokens, timeout=timeout):
+        with track_stage(Stage.EMBEDDING):
+            vectors, used = await deadline.within(_create_embeddings([cleaned_text]), "embedding")
+    # 按上游返回的实际用量修正 TPM 令牌桶
+    embedding_admission.settle(tokens, used)
+    return vectors[0]
+
+
+async def _create_embeddings(texts: List[str]) -> Tuple[List[List[float]], int]:
+    """
+    直接调用 OpenAIEmbeddings 内部的 OpenAI 客户端 (同一连接池与超时配置)
+    LangChain 的 aembed_* 会丢弃响应中的 usage，这里一并返回实际 token 用量，供准入控制修正
+    """
+    response = await embedding_client.async_client.create(input=texts, model=embedding_client.model)
+    if not isinstance(response, dict):
+        response = response.model_dump()
+    vectors = [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+    usage = response.get("usage") or {}
+    return vectors, usage.get("total_tokens") or usage.get("prompt_tokens") or 0
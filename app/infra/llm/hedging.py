@@ -0,0 +1,193 @@
+# app/infra/llm/hedging.py
+"""
+对冲请求 (hedged requests)，压低上游偶发慢响应造成的长尾延迟
+- 首个请求超过近期 p90 (LLM_HEDGE_QUANTILE) 仍未返回时，再发一个相同请求 (可指向备用端点 / 模型)
+- 先返回的结果胜出，另一个立即取消
+- 对冲预算：每个请求积累 LLM_HEDGE_MAX_RATE 个令牌，每次对冲消耗 1 个，长期对冲比例不超过该值
+- 上游准入已满时不对冲 (高峰期额外请求只会加剧排队)
+- 请求剩余时间不足一个对冲延迟时不对冲 (新请求大概率来不及返回)
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import HEDGE_REQUESTS
+from .admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """最近 size 次调用耗时，用于估算分位数"""
+
+    def __init__(self, size: int, min_samples: int):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """按请求数积累的对冲令牌 (上限 burst)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+
+    def earn(self):
+        self._tokens = min(self.burst, self._tokens + self.rate)
+
+    def spend(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class Hedger:
+    """
+    :param name: 指标与日志中的名称 (如 chat_strong)
+    :param quantile: 对冲延迟取近期耗时的该分位数
+    :param min_delay: 对冲延迟下限 (秒)，避免耗时样本偏小时过早对冲
+    :param max_rate: 对冲请求占比上限
+    """
+
+    def __init__(
+            self,
+            name: str,
+            quantile: float,
+            min_delay: float,
+            max_rate: float,
+            window: int,
+            min_samples: int,
+            enabled: bool = True,
+    ):
+        self.name = name
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.enabled = enabled and max_rate > 0
+        self.latency = LatencyWindow(window, min_samples)
+        # 允许短时间内集中对冲 (上游尖刺往往成簇出现)，长期比例仍受 max_rate 约束
+        self.budget = HedgeBudget(rate=max_rate, burst=max(1.0, max_rate * 100))
+
+        # 统计
+        self._requests = 0
+        self._outcomes: Counter = Counter()
+
+    def delay(self) -> Optional[float]:
+        """当前对冲延迟；样本不足时返回 None (不对冲)"""
+        observed = self.latency.quantile(self.quantile)
+        return None if observed is None else max(self.min_delay, observed)
+
+    async def run(
+            self,
+            primary: Callable[[], Awaitable[T]],
+            hedge: Callable[[], Awaitable[T]],
+            admission: Optional[AdmissionController] = None,
+            tokens: int = 0,
+    ) -> T:
+        """
+        执行 primary，必要时并发执行 hedge，返回先成功的结果
+        :param admission: 对冲请求额外占用的准入名额 (不排队，拿不到就不对冲)
+        """
+        if not self.enabled:
+            return await primary()
+
+        self._requests += 1
+        self.budget.earn()
+        primary_task = asyncio.ensure_future(self._timed(primary))
+        hedge_task: Optional[asyncio.Future] = None
+        try:
+            delay = self.delay()
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done:
+                return primary_task.result()
+
+            if deadline.below(delay):
+                self._record("deadline")
+                return await primary_task
+            if not self.budget.spend():
+                self._record("budget_exhausted")
+                return await primary_task
+            if admission is not None and not admission.try_acquire(tokens):
+                self._record("saturated")
+                return await primary_task
+
+            self._record("fired")
+            hedge_task = asyncio.ensure_future(hedge())
+            if admission is not None:
+                # 用回调归还名额：任务在开始执行前就被取消时 finally 不会运行
+                hedge_task.add_done_callback(lambda _: admission.release())
+            pending = {primary_task, hedge_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record("hedge_won" if task is hedge_task else "primary_won")
+                        return task.result()
+                    if task is hedge_task:
+                        logger.warning(f"[{self.name}] hedge request failed: {task.exception()}")
+            # 两个请求都失败：以首个请求的错误为准
+            return primary_task.result()
+        finally:
+            for task in (primary_task, hedge_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # 标记落败请求的异常已读取，避免 "Task exception was never retrieved" 告警
+                    task.exception()
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await fn()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # 被对冲取消的首个请求也记录已耗时 (真实耗时的下界)，避免分位数被胜出的对冲请求拉低
+            if not failed:
+                self.latency.add(time.perf_counter() - start)
+
+    def _record(self, outcome: str):
+        self._outcomes[outcome] += 1
+        HEDGE_REQUESTS.labels(hedger=self.name, outcome=outcome).inc()
+
+    def stats(self) -> Dict:
+        delay = self.delay()
+        return {
+            "enabled": self.enabled,
+            "requests": self._requests,
+            "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+            "hedge_rate": round(self._outcomes["fired"] / self._requests, 4) if self._requests else 0.0,
+            **dict(self._outcomes),
+        }
+
+
+def build_hedger(name: str) -> Hedger:
+    return Hedger(
+        name,
+        quantile=settings.LLM_HEDGE_QUANTILE,
+        min_delay=settings.LLM_HEDGE_MIN_DELAY,
+        max_rate=settings.LLM_HEDGE_MAX_RATE,
+        window=settings.LLM_HEDGE_WINDOW,
+        min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        enabled=settings.LLM_HEDGE_ENABLED,
+    )
@@ -0,0 +1,126 @@
+# =======================================================
+# 共享 HTTP 连接池 (chat / embedding 共用)
+# =======================================================
+import logging
+from typing import Optional
+
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# 需要重试的上游状态码：限流 + 网关/服务端错误
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class _RetryableResponse(Exception):
+    """内部使用：把可重试的响应包装成异常交给 tenacity"""
+
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"upstream returned {response.status_code}")
+        self.response = response
+
+
+async def _discard_response(retry_state):
+    # 进入下一次重试前释放上一次响应占用的连接
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, _RetryableResponse):
+        await exc.response.aclose()
+    logger.warning(
+        f"LLM upstream call failed ({exc}), retry #{retry_state.attempt_number} "
+        f"after {retry_state.next_action.sleep:.2f}s"
+    )
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    带重试的传输层
+    - 真正的连接池 (AsyncHTTPTransport) 在 lifespan 中创建 / 关闭
+    - 未经 lifespan 启动时 (如脚本) 首次请求时惰性创建
+    - 429 / 5xx / 网络错误按随机指数退避重试，重试耗尽后把最后一次响应原样交给 SDK
+    """
+
+    def __init__(self):
+        self._pool: Optional[httpx.AsyncHTTPTransport] = None
+
+    def open(self) -> httpx.AsyncHTTPTransport:
+        if self._pool is None:
+            self._pool = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._pool
+
+    async def aclose(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.aclose()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self.open()
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(settings.LLM_HTTP_MAX_RETRIES + 1),
+            wait=wait_random_exponential(
+                multiplier=settings.LLM_HTTP_BACKOFF_BASE,
+                max=settings.LLM_HTTP_BACKOFF_MAX,
+            ),
+            retry=retry_if_exception_type((httpx.TransportError, _RetryableResponse)),
+            before_sleep=_discard_response,
+            reraise=True,
+        )
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    try:
+                        response = await pool.handle_async_request(request)
+                    except httpx.TransportError as e:
+                        UPSTREAM_ERRORS.labels(host=request.url.host, kind=type(e).__name__).inc()
+                        raise
+                    if response.status_code >= 400:
+                        UPSTREAM_ERRORS.labels(host=request.url.host, kind=str(response.status_code)).inc()
+                    if response.status_code in RETRY_STATUS_CODES:
+                        raise _RetryableResponse(response)
+                    return response
+        except _RetryableResponse as e:
+            return e.response
+
+
+def build_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings.LLM_HTTP_CONNECT_TIMEOUT,
+        read=settings.LLM_HTTP_READ_TIMEOUT,
+        write=settings.LLM_HTTP_WRITE_TIMEOUT,
+        pool=settings.LLM_HTTP_POOL_TIMEOUT,
+    )
+
+
+retry_transport = RetryTransport()
+
+# 全局共享的异步客户端，ChatOpenAI / OpenAIEmbeddings 都挂在这个客户端上
+# 注意：不要直接调用 http_client.aclose()，连接池的生命周期由下面两个函数管理
+http_client = httpx.AsyncClient(transport=retry_transport, timeout=build_timeout())
+
+
+async def startup_http_client():
+    """lifespan 启动时调用：创建连接池"""
+    retry_transport.open()
+    logger.info(
+        f"LLM HTTP pool ready (max_connections={settings.LLM_HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={settings.LLM_HTTP_MAX_KEEPALIVE}, retries={settings.LLM_HTTP_MAX_RETRIES})"
+    )
+
+
+async def shutdown_http_client():
+    """lifespan 关闭时调用：释放所有长连接"""
+    await retry_transport.aclose()
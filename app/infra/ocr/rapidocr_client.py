@@ -6,6 +6,7 @@ import numpy as np
 from rapidocr_onnxruntime import RapidOCR
 
 from app.core.config import settings
+from app.core.metrics import Stage, observe_stage
 # 假设 utils.py 在同级目录下，稍后我们会去实现它
 from .utils import extract_text_from_ocr_results
 
@@ -65,7 +66,11 @@ class OCRClient:
         try:
             # RapidOCR 调用返回元组: (result, elapse_time)
             # result 结构: [[box, text, score], ...]
-            ocr_result, _ = self.engine(image)
+            # elapse_time 结构: [检测耗时, 方向分类耗时, 识别耗时] (秒)，无文字时为 None
+            ocr_result, elapse = self.engine(image)
+            if elapse:
+                for stage, seconds in zip((Stage.OCR_DET, Stage.OCR_CLS, Stage.OCR_REC), elapse):
+                    observe_stage(stage, seconds)
 
             if not ocr_result:
                 return []
@@ -77,6 +82,3 @@ class OCRClient:
             logger.error(f"OCR inference failed: {e}")
             raise e
 
-
-# 导出全局单例，方便其他模块直接 import ocr_client 使用
-ocr_client = OCRClient()
@@ -6,32 +6,43 @@ from pathlib import Path
 from typing import List, Union, Optional
 
 import cv2
+import httpx
 import numpy as np
-import requests
 from PIL import Image, ImageOps
 from fastapi import UploadFile, HTTPException
 
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import Stage, track_stage
+
 logger = logging.getLogger(__name__)
 
 
-def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray:
+def preprocess_image_bytes(image_bytes: bytes, upscale: bool = True) -> np.ndarray:
     """
     内存图片预处理（工程优化版）：
     1. RGB -> BGR (OpenCV 默认格式)
     2. 智能放大 (解决小图/远图识别不清的问题)
     3. 增加白边 (解决文字贴边检测不到的问题)
     4. ❌ 已移除二值化 (二值化会导致细节丢失，降低 RapidOCR 准确率)
+    :param upscale: 是否放大小图 (截止时间不足时关闭，放大后的检测 / 识别耗时明显增加)
     """
     # 1. 读取图片并转为 OpenCV BGR 格式
-    pil_img = Image.open(BytesIO(image_bytes)).convert("RGB")
-    try:
-        pil_img = ImageOps.exif_transpose(pil_img)
-    except Exception as e:
-        logger.warning(f"Image auto-rotation failed: {e}")
+    with track_stage(Stage.IMAGE_DECODE):
+        pil_img = Image.open(BytesIO(image_bytes)).convert("RGB")
+        try:
+            pil_img = ImageOps.exif_transpose(pil_img)
+        except Exception as e:
+            logger.warning(f"Image auto-rotation failed: {e}")
+
+        img = np.array(pil_img)
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+    with track_stage(Stage.PREPROCESS):
+        return _resize_and_pad(img, upscale)
 
-    img = np.array(pil_img)
-    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
 
+def _resize_and_pad(img: np.ndarray, upscale: bool = True) -> np.ndarray:
     # 2. 智能放大
     # RapidOCR 对短边小于 960px 的图片识别效果一般
     # 如果图片较小，按比例放大短边到 960px
@@ -39,7 +50,7 @@ def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray:
     short_side = min(h, w)
     target_short = 960
 
-    if short_side < target_short:
+    if upscale and short_side < target_short:
         scale = target_short / short_side
         # 限制最大放大倍数，防止图片过大撑爆内存 (Max 3x)
         if scale > 3.0: scale = 3.0
@@ -162,10 +173,15 @@ async def read_file_bytes(
             raise HTTPException(status_code=400, detail="Base64 解码失败")
 
     if file_url:
+        # 异步下载，不阻塞事件循环；超时取配置值与请求剩余时间的较小值
+        timeout = deadline.bounded(settings.OCR_FETCH_TIMEOUT)
         try:
-            resp = requests.get(file_url, timeout=5)
+            async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+                resp = await client.get(file_url)
             resp.raise_for_status()
             return resp.content
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="下载 file_url 图片超时")
         except Exception:
             raise HTTPException(status_code=400, detail="无法下载 file_url 图片")
 
@@ -0,0 +1,10 @@
+"""
+进程内向量索引模块
+为只读为主的 RAG 检索提供本地 ANN 副本
+"""
+
+from .local_index import LocalVectorIndex
+
+__all__ = [
+    "LocalVectorIndex",
+]
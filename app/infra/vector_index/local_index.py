@@ -0,0 +1,214 @@
+# app/infra/vector_index/local_index.py
+import logging
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib 为可选依赖，缺失时全部走精确检索
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorIndex:
+    """
+    进程内向量索引 (单个学科一份)
+    - 数据量小于阈值：NumPy 矩阵精确检索 (暴力 L2)
+    - 数据量超过阈值：HNSW 图近似检索 (需安装 hnswlib)
+    距离统一为 L2 欧氏距离，与 pgvector 的 `<->` 保持一致
+    """
+
+    def __init__(
+            self,
+            dim: int,
+            hnsw_threshold: int = 20000,
+            ef_search: int = 64,
+            ef_construction: int = 200,
+            m: int = 16,
+    ):
+        self.dim = dim
+        self.hnsw_threshold = hnsw_threshold
+        self.ef_search = ef_search
+        self.ef_construction = ef_construction
+        self.m = m
+
+        self._lock = threading.RLock()
+
+        # 精确检索存储：行号 <-> kp_code
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._row_keys: List[str] = []
+        self._key_rows: Dict[str, int] = {}
+
+        # HNSW 存储：label(int) <-> kp_code
+        self._hnsw = None
+        self._key_labels: Dict[str, int] = {}
+        self._label_keys: Dict[int, str] = {}
+        self._next_label = 0
+
+    # ---------------------------------------------------
+    # 基础属性
+    # ---------------------------------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._key_labels) if self._hnsw is not None else self._size
+
+    @property
+    def kind(self) -> str:
+        return "hnsw" if self._hnsw is not None else "exact"
+
+    # ---------------------------------------------------
+    # 写入
+    # ---------------------------------------------------
+    def upsert(self, key: str, vector: Sequence[float]):
+        self.upsert_many([key], [vector])
+
+    def upsert_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not keys:
+            return
+        data = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+
+        with self._lock:
+            if self._hnsw is not None:
+                self._hnsw_upsert(keys, data)
+                return
+
+            for key, vec in zip(keys, data):
+                row = self._key_rows.get(key)
+                if row is None:
+                    row = self._size
+                    self._ensure_capacity(row + 1)
+                    self._row_keys.append(key)
+                    self._key_rows[key] = row
+                    self._size += 1
+                self._matrix[row] = vec
+
+            # 数据量超过阈值后，整体迁移到 HNSW
+            if self._size >= self.hnsw_threshold and hnswlib is not None:
+                self._promote_to_hnsw()
+
+    def remove(self, key: str):
+        with self._lock:
+            if self._hnsw is not None:
+                label = self._key_labels.pop(key, None)
+                if label is not None:
+                    self._label_keys.pop(label, None)
+                    self._hnsw.mark_deleted(label)
+                return
+
+            row = self._key_rows.pop(key, None)
+            if row is None:
+                return
+            # 与最后一行交换后删除，保持矩阵紧凑
+            last = self._size - 1
+            if row != last:
+                last_key = self._row_keys[last]
+                self._matrix[row] = self._matrix[last]
+                self._row_keys[row] = last_key
+                self._key_rows[last_key] = row
+            self._row_keys.pop()
+            self._size -= 1
+
+    # ---------------------------------------------------
+    # 检索
+    # ---------------------------------------------------
+    def search(self, query: Sequence[float], k: int = 3) -> List[Tuple[str, float]]:
+        """
+        :return: [(kp_code, L2 距离)]，按距离升序
+        """
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim or k <= 0:
+            return []
+
+        with self._lock:
+            if self._hnsw is not None:
+                return self._hnsw_search(q, k)
+
+            if self._size == 0:
+                return []
+
+            matrix = self._matrix[:self._size]
+            # ||a - b||^2 = ||a||^2 - 2ab + ||b||^2，避免构造 (n, dim) 差值矩阵
+            diff = matrix @ q
+            dist2 = np.einsum("ij,ij->i", matrix, matrix) - 2.0 * diff + float(q @ q)
+            np.maximum(dist2, 0.0, out=dist2)
+
+            k = min(k, self._size)
+            if k < self._size:
+                top = np.argpartition(dist2, k - 1)[:k]
+            else:
+                top = np.arange(self._size)
+            top = top[np.argsort(dist2[top])]
+            return [(self._row_keys[i], float(np.sqrt(dist2[i]))) for i in top]
+
+    # ---------------------------------------------------
+    # 内部实现
+    # ---------------------------------------------------
+    def _ensure_capacity(self, size: int):
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        grown = np.empty((new_capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _promote_to_hnsw(self):
+        logger.info(f"Promoting local vector index to HNSW (size={self._size}, dim={self.dim})")
+        index = hnswlib.Index(space="l2", dim=self.dim)
+        index.init_index(
+            max_elements=max(self._size * 2, 1024),
+            ef_construction=self.ef_construction,
+            M=self.m,
+            allow_replace_deleted=True,
+        )
+        index.set_ef(self.ef_search)
+
+        labels = np.arange(self._size)
+        index.add_items(self._matrix[:self._size], labels)
+
+        self._hnsw = index
+        self._key_labels = {key: i for i, key in enumerate(self._row_keys)}
+        self._label_keys = {i: key for i, key in enumerate(self._row_keys)}
+        self._next_label = self._size
+
+        # 释放精确检索存储
+        self._matrix = np.empty((0, self.dim), dtype=np.float32)
+        self._row_keys = []
+        self._key_rows = {}
+        self._size = 0
+
+    def _hnsw_upsert(self, keys: Sequence[str], data: np.ndarray):
+        labels = []
+        for key in keys:
+            label = self._key_labels.get(key)
+            if label is None:
+                label = self._next_label
+                self._next_label += 1
+                self._key_labels[key] = label
+                self._label_keys[label] = key
+            labels.append(label)
+
+        needed = self._hnsw.get_current_count() + len(labels)
+        if needed > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(needed * 2)
+
+        # hnswlib 对已存在的 label 会原地更新向量，新 label 优先复用已删除的槽位
+        self._hnsw.add_items(data, np.asarray(labels), replace_deleted=True)
+
+    def _hnsw_search(self, q: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        k = min(k, len(self._key_labels))
+        if k == 0:
+            return []
+        # ef 必须不小于 k
+        self._hnsw.set_ef(max(self.ef_search, k))
+        labels, dist2 = self._hnsw.knn_query(q, k=k)
+        # hnswlib 的 l2 空间返回的是平方距离
+        return [
+            (self._label_keys[int(label)], float(np.sqrt(max(d, 0.0))))
+            for label, d in zip(labels[0], dist2[0])
+            if int(label) in self._label_keys
+        ]
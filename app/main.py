@@ -1,24 +1,41 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Request, Security
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-from app.api.v1 import diagnosis, knowledge, ocr
+from app.api.v1 import admin, diagnosis, jobs, knowledge, ocr, prompts
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, pool_stats
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.core.logging_config import setup_logging, shutdown_logging
+from app.core.metrics import render_metrics
+from app.core.profiler import ProfilingMiddleware
 from app.core.security import verify_internal_token
-
-# 初始化日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+from app.core.tracing import TracingMiddleware
+from app.infra.llm import (
+    startup_http_client, shutdown_http_client, chat_admission, embedding_admission, diagnosis_cascade,
+    chat_breaker, embedding_breaker,
 )
+from app.infra.llm.embeddings import embedding_flight
+from app.infra.ocr import get_ocr_client
+from app.repositories import knowledge_replica
+from app.services import diagnosis_service, job_service
+from app.services.prechecks import precheck_stage
+
+# 初始化日志 (JSON + 异步队列)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def _serves(group: str) -> bool:
+    """当前进程是否挂载该路由组 (SERVER_ROUTE_GROUP=all 时挂载全部)"""
+    return settings.SERVER_ROUTE_GROUP in ("all", group)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -39,10 +56,32 @@ async def lifespan(app: FastAPI):
         # 这里可以选择是否抛出异常终止启动，或者仅记录错误
         # raise e
 
+    # [LLM HTTP 连接池] chat / embedding 共用
+    await startup_http_client()
+
+    if settings.OCR_ENABLED and settings.OCR_WARMUP and _serves("ocr"):
+        # [OCR 预热] 模型在 worker 内加载 (不能在 master 中预加载后 fork)，避免首个请求承担加载耗时
+        await asyncio.to_thread(get_ocr_client)
+
+    try:
+        # [本地向量副本] 未启用时为空操作；纯 OCR worker 不需要
+        if _serves("llm"):
+            await knowledge_replica.start()
+    except Exception as e:
+        # 副本加载失败不影响启动，检索自动回退到 PostgreSQL
+        logger.error(f"❌ Knowledge replica load failed: {e}")
+
+    # [异步任务] 按 JOB_POOLS 启动各 worker 池
+    await job_service.start()
+
     yield
 
     logger.info("🛑 Zentrio AI Service is shutting down...")
     # 在这里添加清理逻辑，例如关闭 HTTP Client session 等
+    await job_service.stop()
+    await knowledge_replica.stop()
+    await shutdown_http_client()
+    shutdown_logging()
 
 
 # 1. 创建 FastAPI 实例
@@ -66,28 +105,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求截止时间：读取 Java 端传入的剩余预算 (或按路由默认值)，向下传递给各阶段
+app.add_middleware(DeadlineMiddleware)
+# 单请求采样分析 (需开启 PROFILER_PER_REQUEST_ENABLED)，放在链路追踪内层以拿到请求 ID
+app.add_middleware(ProfilingMiddleware)
+# 请求链路追踪：透传 Java 端的请求 ID，返回 Server-Timing
+app.add_middleware(TracingMiddleware)
+
 # 3. 注册路由 (Routers)
 # 建议：直接拼接 API_PREFIX，保持代码整洁
+# 按 SERVER_ROUTE_GROUP 挂载：LLM 类 (诊断 / 知识库 / 模板) 与 OCR 可以部署到不同的 worker 池
+if _serves("llm"):
+    app.include_router(
+        knowledge.router,
+        prefix=f"{settings.API_PREFIX}/knowledge",
+        tags=["Knowledge Base"],
+        dependencies=[Security(verify_internal_token)]
+    )
+    app.include_router(
+        diagnosis.router,
+        prefix=f"{settings.API_PREFIX}/diagnosis",
+        tags=["AI Diagnosis"],
+        dependencies=[Security(verify_internal_token)]
+    )
+    app.include_router(
+        prompts.router,
+        prefix=f"{settings.API_PREFIX}/prompts",
+        tags=["Prompt Templates"],
+        dependencies=[Security(verify_internal_token)]
+    )
+if _serves("ocr"):
+    app.include_router(
+        ocr.router,
+        prefix=f"{settings.API_PREFIX}/ocr",
+        tags=["OCR"],
+        dependencies=[Security(verify_internal_token)]
+    )
 app.include_router(
-    knowledge.router,
-    prefix=f"{settings.API_PREFIX}/knowledge",
-    tags=["Knowledge Base"],
-    dependencies=[Security(verify_internal_token)]
-)
-app.include_router(
-    diagnosis.router,
-    prefix=f"{settings.API_PREFIX}/diagnosis",
-    tags=["AI Diagnosis"],
+    jobs.router,
+    prefix=f"{settings.API_PREFIX}/jobs",
+    tags=["Async Jobs"],
     dependencies=[Security(verify_internal_token)]
 )
 app.include_router(
-    ocr.router,
-    prefix=f"{settings.API_PREFIX}/ocr",
-    tags=["OCR"],
+    admin.router,
+    prefix=f"{settings.API_PREFIX}/admin",
+    tags=["Admin"],
     dependencies=[Security(verify_internal_token)]
 )
 
 
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exception_handler(request: Request, exc: DeadlineExceeded):
+    # 无法降级的阶段 (如知识库写入) 超过截止时间，调用方此时通常已放弃等待
+    logger.warning(f"Deadline exceeded on {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=504,
+        content={"code": 50400, "msg": "请求处理超时", "data": None}
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global Error: {exc}", exc_info=True)
@@ -107,10 +184,40 @@ async def health_check():
     return {
         "status": "ok",
         "app": settings.APP_NAME,
-        "env": settings.ENVIRONMENT
+        "env": settings.ENVIRONMENT,
+        # 上游准入队列：排队深度与等待时间
+        "admission": {
+            "chat": chat_admission.stats(),
+            "embedding": embedding_admission.stats(),
+        },
+        # 并发相同请求合并情况
+        "coalescing": {
+            "diagnosis": diagnosis_service.flight.stats(),
+            "embedding": embedding_flight.stats(),
+        },
+        # 上游熔断器状态
+        "circuit_breakers": {
+            "chat": chat_breaker.stats(),
+            "embedding": embedding_breaker.stats(),
+        },
+        # 模型级联：各层级调用结果与升级率
+        "cascade": {
+            "diagnosis": diagnosis_cascade.stats(),
+        },
+        # 规则预检短路比例
+        "precheck": precheck_stage.stats(),
+        # 数据库连接池占用
+        "db_pool": pool_stats(),
     }
 
 
+# 5. Prometheus 指标 (供抓取，不走内部 Token 鉴权)
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     # 使用 settings 中的配置启动
     uvicorn.run(
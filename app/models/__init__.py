@@ -1,4 +1,6 @@
+from .job import Job, JobStatus
+from .knowledge_state import GENERATION_KEY, KnowledgeState
 from .knowledge_vector import KnowledgeVector
 from .subject_config import SubjectConfig
 
-__all__ = ["SubjectConfig", "KnowledgeVector"]
+__all__ = ["SubjectConfig", "KnowledgeVector", "KnowledgeState", "GENERATION_KEY", "Job", "JobStatus"]
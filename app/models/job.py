@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import DateTime, Index, func
+from sqlmodel import SQLModel, Field, Column, JSON
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    FINISHED = (SUCCEEDED, FAILED)
+
+
+class Job(SQLModel, table=True):
+    """异步任务：对应 edu_job 表 (Postgres 队列后端)，内存后端也用同一结构"""
+    __tablename__ = "edu_job"
+    __table_args__ = (
+        # 领取任务：按 pool 找到期的 queued 任务
+        Index("ix_edu_job_claim", "pool", "status", "run_after"),
+    )
+
+    id: str = Field(primary_key=True, max_length=32)
+    kind: str = Field(max_length=64)
+    # 执行该任务的 worker 池，批量同步与 OCR 分开，互不抢占
+    pool: str = Field(max_length=32)
+    status: str = Field(default=JobStatus.QUEUED, max_length=16)
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    result: Optional[Any] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    # 已执行次数 (含正在执行的这一次)
+    attempts: int = 0
+    max_attempts: int = 3
+    progress: float = 0.0
+    message: Optional[str] = None
+    # 完成 / 最终失败后回调的地址 (可选)
+    callback_url: Optional[str] = None
+    # 最早可执行时间，重试退避时推后
+    run_after: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+    # 执行中任务的租约：worker 崩溃后超过 JOB_LEASE_SECONDS 未续约的任务会被重新领取
+    locked_by: Optional[str] = Field(default=None, max_length=64)
+    locked_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    created_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+    updated_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, func
+from sqlmodel import SQLModel, Field, Column
+
+# 知识库数据代次：整体导入 (快照) 时写入新值，各进程的本地向量副本发现变化后全量重载
+GENERATION_KEY = "generation"
+
+
+class KnowledgeState(SQLModel, table=True):
+    """知识库全局状态 (键值)：对应 edu_knowledge_state 表"""
+    __tablename__ = "edu_knowledge_state"
+
+    key: str = Field(primary_key=True, max_length=64)
+    value: str
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
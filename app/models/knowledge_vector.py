@@ -1,17 +1,44 @@
+from datetime import datetime
 from typing import Optional, List, Dict
 
 from pgvector.sqlalchemy import Vector  # 导入 pgvector 扩展
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import SQLModel, Field, Column
 
 
 class KnowledgeVector(SQLModel, table=True):
-    """知识点向量模型：对应 edu_knowledge_vector 表"""
+    """知识点向量模型：对应 edu_knowledge_vector 表 (按 subject_code 分区)"""
     __tablename__ = "edu_knowledge_vector"
+    __table_args__ = (
+        # 元数据包含查询 (metadata @> '{"grade": "7"}') 走 GIN 索引
+        Index(
+            "ix_edu_knowledge_vector_metadata", "metadata",
+            postgresql_using="gin", postgresql_ops={"metadata": "jsonb_path_ops"},
+        ),
+        # 向量近似检索 (L2 距离)，带过滤条件时配合 hnsw.iterative_scan 使用
+        Index(
+            "ix_edu_knowledge_vector_embedding_hnsw", "embedding",
+            postgresql_using="hnsw", postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
+        # 分区由 KnowledgeRepo.ensure_partitions 在学科首次写入时创建，父表上的索引会自动建到每个分区
+        {"postgresql_partition_by": "LIST (subject_code)"},
+    )
 
     kp_code: str = Field(primary_key=True, max_length=64)
     name: str = Field(max_length=128)
+    # 学科编码，同时是分区键：表按学科 LIST 分区，带学科的检索只扫描对应分区 (本地索引副本也按学科分片)
+    # 分区表的主键必须包含分区键，因此主键为 (kp_code, subject_code)
+    subject_code: str = Field(primary_key=True, max_length=64)
     content: str
     # 使用 Column 显式定义 pgvector 维度为 1024
     embedding: Optional[List[float]] = Field(sa_column=Column(Vector(1024)))
-    # 使用 JSON 类型存储元数据
-    metadata_: Dict = Field(default_factory=dict, sa_column=Column("metadata", JSON))
+    # 向量化文本的 sha256，内容未变化时跳过重新向量化
+    content_hash: Optional[str] = Field(default=None, max_length=64)
+    # 使用 JSONB 存储元数据 (年级 / 教材版本 / 章节等)，检索时可按任意键过滤
+    metadata_: Dict = Field(default_factory=dict, sa_column=Column("metadata", JSONB))
+    # 最后更新时间，本地向量副本按此字段做增量轮询
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    )
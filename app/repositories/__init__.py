@@ -1,4 +1,9 @@
+from .knowledge_replica import KnowledgeReplica, knowledge_replica
 from .knowledge_repo import KnowledgeRepo, knowledge_repo
 from .subject_repo import SubjectRepo, subject_repo
 
-__all__ = ["SubjectRepo", "subject_repo", "KnowledgeRepo", "knowledge_repo"]
+__all__ = [
+    "SubjectRepo", "subject_repo",
+    "KnowledgeRepo", "knowledge_repo",
+    "KnowledgeReplica", "knowledge_replica",
+]
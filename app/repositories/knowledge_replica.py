@@ -0,0 +1,217 @@
+# app/repositories/knowledge_replica.py
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine as global_engine
+from app.infra.vector_index import LocalVectorIndex
+from app.models.knowledge_state import GENERATION_KEY, KnowledgeState
+from app.models.knowledge_vector import KnowledgeVector
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarRow(NamedTuple):
+    """与 SQL 查询返回的 Row 保持相同的访问方式：row.KnowledgeVector / row.score"""
+    KnowledgeVector: KnowledgeVector
+    score: float
+
+
+class KnowledgeReplica:
+    """
+    edu_knowledge_vector 的进程内只读副本
+    - 启动时按 subject_code 全量加载
+    - upsert 时同步写入，定时按 updated_at 增量拉取其它进程的写入 (带回看窗口，容忍长事务晚提交)
+    - 数据代次 (快照导入时更新) 变化时全量重载：删除 / 整体替换无法通过 updated_at 增量感知
+    - 未就绪或学科不在副本范围内时，由 KnowledgeRepo 回退到 PostgreSQL
+    """
+
+    def __init__(self, db_engine=None):
+        self.engine = db_engine or global_engine
+        self.enabled = settings.VECTOR_REPLICA_ENABLED
+        self.subjects = set(settings.VECTOR_REPLICA_SUBJECTS)
+
+        self._lock = threading.RLock()
+        self._indexes: Dict[str, LocalVectorIndex] = {}
+        # kp_code -> 分离 (detached) 的 KnowledgeVector，检索结果直接复用
+        self._records: Dict[str, KnowledgeVector] = {}
+        self._watermark: Optional[datetime] = None
+        self._generation: Optional[str] = None
+        self._ready = False
+        self._poll_task: Optional[asyncio.Task] = None
+
+    # ---------------------------------------------------
+    # 状态
+    # ---------------------------------------------------
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self._ready
+
+    def covers(self, subject_code: Optional[str]) -> bool:
+        """
+        副本中已有该学科的索引时才由副本回答
+        其它进程刚新增、尚未轮询到的学科没有索引，回退到 PostgreSQL 而不是返回空结果
+        """
+        if not self.ready or not subject_code:
+            return False
+        if self.subjects and subject_code not in self.subjects:
+            return False
+        return subject_code in self._indexes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ready": self._ready,
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "generation": self._generation,
+                "subjects": {code: {"size": len(idx), "kind": idx.kind} for code, idx in self._indexes.items()},
+            }
+
+    # ---------------------------------------------------
+    # 加载与增量刷新
+    # ---------------------------------------------------
+    def load(self):
+        """全量加载 (同步，启动时在线程池中执行)"""
+        if not self.enabled:
+            return
+        # 先读代次再读数据：两者之间发生的导入会在下一次 refresh 时再次触发重载
+        generation = self._fetch_generation()
+        rows = self._fetch(since=None)
+        with self._lock:
+            self._indexes.clear()
+            self._records.clear()
+            self._watermark = None
+            self._apply_rows(rows)
+            self._generation = generation
+            self._ready = True
+        logger.info(f"Knowledge replica loaded: {len(rows)} rows, subjects={list(self._indexes)}")
+
+    def refresh(self) -> int:
+        """拉取 updated_at >= watermark - 回看窗口 的增量，返回本次应用的行数"""
+        if not self.ready:
+            return 0
+        generation = self._fetch_generation()
+        if generation != self._generation:
+            logger.info(f"Knowledge generation changed ({self._generation} -> {generation}), reloading replica")
+            self.load()
+            return len(self._records)
+        since = self._watermark
+        if since is not None:
+            # updated_at 是写事务的开始时间 (now())：事务开始早于水位线、提交晚于上次轮询时，
+            # 只用 >= watermark 会永远漏掉这些行，因此每次都回看一段时间，重复应用是幂等的
+            since -= timedelta(seconds=settings.VECTOR_REPLICA_POLL_OVERLAP)
+        rows = self._fetch(since=since)
+        if rows:
+            with self._lock:
+                self._apply_rows(rows)
+        return len(rows)
+
+    def apply_upsert(self, record: KnowledgeVector):
+        """本进程写库成功后立即同步副本，避免等待下一次轮询"""
+        if not self.ready:
+            return
+        with self._lock:
+            self._apply_rows([record], advance_watermark=False)
+
+    def _fetch_generation(self) -> Optional[str]:
+        with Session(self.engine) as session:
+            state = session.get(KnowledgeState, GENERATION_KEY)
+            return state.value if state is not None else None
+
+    def _fetch(self, since: Optional[datetime]) -> List[KnowledgeVector]:
+        with Session(self.engine) as session:
+            statement = select(KnowledgeVector).where(KnowledgeVector.embedding.is_not(None))
+            if self.subjects:
+                statement = statement.where(KnowledgeVector.subject_code.in_(self.subjects))
+            if since is not None:
+                # 使用 >= 防止同一时间戳的并发写入被漏掉，重复应用是幂等的
+                statement = statement.where(KnowledgeVector.updated_at >= since)
+            statement = statement.order_by(KnowledgeVector.updated_at)
+            rows = session.exec(statement).all()
+            # 脱离 Session，后续只读使用
+            for row in rows:
+                session.expunge(row)
+            return list(rows)
+
+    def _apply_rows(self, rows: List[KnowledgeVector], advance_watermark: bool = True):
+        grouped: Dict[str, List[KnowledgeVector]] = {}
+        for row in rows:
+            if row.embedding is None or not row.subject_code:
+                continue
+            if self.subjects and row.subject_code not in self.subjects:
+                continue
+
+            # 学科发生变更时，从旧学科索引中移除
+            previous = self._records.get(row.kp_code)
+            if previous is not None and previous.subject_code != row.subject_code:
+                old_index = self._indexes.get(previous.subject_code)
+                if old_index is not None:
+                    old_index.remove(row.kp_code)
+
+            self._records[row.kp_code] = row
+            grouped.setdefault(row.subject_code, []).append(row)
+
+            if advance_watermark and row.updated_at is not None:
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+
+        for subject_code, items in grouped.items():
+            index = self._indexes.get(subject_code)
+            if index is None:
+                index = LocalVectorIndex(
+                    dim=len(items[0].embedding),
+                    hnsw_threshold=settings.VECTOR_REPLICA_HNSW_THRESHOLD,
+                    ef_search=settings.VECTOR_REPLICA_HNSW_EF_SEARCH,
+                )
+                self._indexes[subject_code] = index
+            index.upsert_many([kv.kp_code for kv in items], [kv.embedding for kv in items])
+
+    # ---------------------------------------------------
+    # 检索
+    # ---------------------------------------------------
+    def search(self, embedding: List[float], subject_code: str, limit: int = 3) -> List[SimilarRow]:
+        index = self._indexes.get(subject_code)
+        if index is None:
+            return []
+        hits = index.search(embedding, limit)
+        records = self._records
+        return [SimilarRow(records[kp_code], score) for kp_code, score in hits if kp_code in records]
+
+    # ---------------------------------------------------
+    # 生命周期 (由 main.lifespan 调用)
+    # ---------------------------------------------------
+    async def start(self):
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.load)
+        if settings.VECTOR_REPLICA_POLL_INTERVAL > 0:
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(settings.VECTOR_REPLICA_POLL_INTERVAL)
+            try:
+                applied = await asyncio.to_thread(self.refresh)
+                if applied:
+                    logger.info(f"Knowledge replica refreshed: {applied} rows")
+            except Exception as e:
+                # 轮询失败不影响服务，副本保持旧数据，下次继续
+                logger.warning(f"Knowledge replica refresh failed: {e}")
+
+
+knowledge_replica = KnowledgeReplica()
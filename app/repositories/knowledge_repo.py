@@ -1,42 +1,187 @@
-from typing import Optional, Tuple, Dict, List, Sequence
+import hashlib
+import logging
+import operator
+import re
+from functools import reduce
+from typing import Any, Iterable, Optional, Tuple, Dict, List, Sequence
 
-from sqlalchemy.dialects.postgresql import insert
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import and_, case, cast, delete, false, func, literal, or_, text, true
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
 
+from app.core.config import settings
 from app.core.database import engine as global_engine
+from app.core.singleflight import normalize_text
+from app.core.tracing import traced
 from app.models.knowledge_vector import KnowledgeVector
+from app.repositories.knowledge_replica import knowledge_replica
+
+logger = logging.getLogger(__name__)
+
+# 未指定学科的知识点归入该学科分区 (与诊断流程的默认学科一致)
+DEFAULT_SUBJECT_CODE = "default"
+
+# 关键词检索最多使用的检索词数
+_MAX_LEXICAL_TERMS = 16
+_TOKEN_PATTERN = re.compile(r"[0-9a-z]+|[\u4e00-\u9fff]+")
+
+
+def _lexical_terms(text: str) -> List[str]:
+    """检索词：英文 / 数字按词 (至少 2 个字符)，中文按相邻二字切分 (单字片段保留单字)"""
+    terms: List[str] = []
+    for token in _TOKEN_PATTERN.findall(normalize_text(text).lower()):
+        if token.isascii():
+            candidates = [token] if len(token) >= 2 else []
+        elif len(token) == 1:
+            candidates = [token]
+        else:
+            candidates = [token[i:i + 2] for i in range(len(token) - 1)]
+        for term in candidates:
+            if term not in terms:
+                terms.append(term)
+    return terms[:_MAX_LEXICAL_TERMS]
+
+
+def partition_name(subject_code: str) -> str:
+    """
+    学科分区表名：edu_knowledge_vector_<规范化学科编码>_<md5 前 8 位>
+    需与迁移脚本 V5__knowledge_partition_by_subject.sql 中的命名规则保持一致
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", subject_code.lower())[:32]
+    digest = hashlib.md5(subject_code.encode("utf-8")).hexdigest()[:8]
+    return f"{KnowledgeVector.__tablename__}_{slug}_{digest}"
+
+
+def _partition_ddl(subject_code: str) -> str:
+    # DDL 不支持绑定参数，学科编码按 SQL 字符串字面量转义
+    value = "'" + subject_code.replace("'", "''") + "'"
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(subject_code)}" '
+        f"PARTITION OF {KnowledgeVector.__tablename__} FOR VALUES IN ({value})"
+    )
+
+
+def _metadata_clause(metadata_filter: Dict[str, Any]):
+    """
+    元数据过滤条件 -> JSONB 包含查询 (@>)，可走 GIN(jsonb_path_ops) 索引
+    - {"grade": "7", "textbook": "rj"}: 同时满足
+    - {"chapter": ["3", "4"]}: 列表表示任一取值 (多个 @> 以 OR 连接)
+    - {"tags": {"exam": true}}: 嵌套对象按包含语义匹配
+    """
+    exact = {k: v for k, v in metadata_filter.items() if not isinstance(v, (list, tuple, set))}
+    clauses = [KnowledgeVector.metadata_.contains(exact)] if exact else []
+    for key, values in metadata_filter.items():
+        if key in exact:
+            continue
+        clauses.append(or_(false(), *(KnowledgeVector.metadata_.contains({key: v}) for v in values)))
+    return and_(*clauses)
+
+
+# hnsw.iterative_scan 需要 pgvector >= 0.8，更早的版本 SET 该参数会报 unrecognized configuration parameter
+_ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+# 每个进程首次检索时查询一次扩展版本
+_iterative_scan_supported: Optional[bool] = None
+
+
+def _supports_iterative_scan(session: Session) -> bool:
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        version = session.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        parts = tuple(int(p) for p in re.findall(r"\d+", version or "")[:2])
+        _iterative_scan_supported = parts >= _ITERATIVE_SCAN_MIN_VERSION
+        if not _iterative_scan_supported:
+            logger.warning(
+                f"pgvector {version} does not support hnsw.iterative_scan (requires >= 0.8), "
+                f"filtered vector searches may return fewer than k results"
+            )
+    return _iterative_scan_supported
+
+
+def _tune_hnsw(session: Session):
+    """
+    当前事务内的 HNSW 检索参数
+    带过滤条件时开启迭代扫描：索引先取 ef_search 个候选，被过滤掉后继续向下扫，直到凑满 k 条
+    (否则过滤后结果常常不足 k 条)；pgvector < 0.8 时跳过迭代扫描参数
+    """
+    params = {"ef_search": str(settings.KNOWLEDGE_HNSW_EF_SEARCH)}
+    sql = "SELECT set_config('hnsw.ef_search', :ef_search, true)"
+    if settings.KNOWLEDGE_HNSW_ITERATIVE_SCAN != "off" and _supports_iterative_scan(session):
+        params["iterative_scan"] = settings.KNOWLEDGE_HNSW_ITERATIVE_SCAN
+        params["max_scan_tuples"] = str(settings.KNOWLEDGE_HNSW_MAX_SCAN_TUPLES)
+        sql += (
+            ", set_config('hnsw.iterative_scan', :iterative_scan, true)"
+            ", set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)"
+        )
+    session.execute(text(sql), params)
 
 
 class KnowledgeRepo:
     """知识库向量仓储层"""
 
-    def __init__(self, db_engine=None):
+    def __init__(self, db_engine=None, replica=None):
         # 如果初始化没传 engine，就用全局默认的
         self.engine = db_engine or global_engine
+        # 进程内向量副本 (可选)，未启用或未覆盖的学科回退到 PostgreSQL
+        self.replica = replica or knowledge_replica
+        # 本进程已确认存在的学科分区
+        self._partitions: set = set()
+
+    def ensure_partitions(self, subject_codes: Iterable[str]):
+        """
+        确保学科分区存在 (新学科首次写入前自动创建)
+        父表上的主键 / HNSW / GIN 索引会自动建到新分区；已确认的学科缓存在进程内，不重复执行 DDL
+        """
+        missing = sorted({code for code in subject_codes if code} - self._partitions)
+        if not missing:
+            return
+        with self.engine.begin() as conn:
+            for subject_code in missing:
+                # 多个 worker 同时首次同步同一学科时串行建分区 (事务级锁，提交后释放)
+                conn.execute(
+                    text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                    {"key": f"{KnowledgeVector.__tablename__}:{subject_code}"},
+                )
+                conn.exec_driver_sql(_partition_ddl(subject_code))
+        logger.info(f"Knowledge partitions ready: {missing}")
+        self._partitions.update(missing)
 
+    @traced("knowledge_repo.get_content_with_metadata")
     def get_content_with_metadata(self, kp_code: str) -> Optional[Tuple[str, Dict]]:
         with Session(self.engine) as session:
             statement = select(KnowledgeVector).where(KnowledgeVector.kp_code == kp_code)
             kv = session.exec(statement).first()
             return (kv.content, kv.metadata_) if kv else None
 
+    @traced("knowledge_repo.search_similar")
     def search_similar(
             self,
             embedding: List[float],
             subject_code: Optional[str] = None,
-            limit: int = 3
+            limit: int = 3,
+            metadata_filter: Optional[Dict[str, Any]] = None,
     ) -> Sequence[Tuple[KnowledgeVector, float]]:
         """
         向量相似度搜索
         :param embedding: 查询向量
         :param subject_code: (可选) 学科编码，用于缩小搜索范围
         :param limit: 返回条数
+        :param metadata_filter: (可选) 元数据过滤条件，如 {"grade": "7", "textbookVersion": "rj"}，见 _metadata_clause
         :return: List[(KnowledgeVector对象, 距离分数)]
         """
         if not embedding:
             return []
 
+        # 0. 优先走进程内副本 (按学科分片，未覆盖时回退到 PG；副本不支持元数据过滤)
+        if not metadata_filter and self.replica.covers(subject_code):
+            return self.replica.search(embedding, subject_code, limit)
+
         with Session(self.engine) as session:
+            # 学科条件由分区裁剪处理 (每个分区有自己的 HNSW 索引)，只有元数据过滤需要迭代扫描
+            if metadata_filter:
+                _tune_hnsw(session)
+
             # 1. 定义距离表达式 (L2 欧氏距离)
             # 越小越相似 (0代表完全一样)
             distance_expr = KnowledgeVector.embedding.l2_distance(embedding)
@@ -46,8 +191,11 @@ class KnowledgeRepo:
 
             # 3. 动态添加过滤条件 (关键优化)
             # 如果业务传了学科，就只在对应学科下搜，大幅提高准确率
+            # 学科是分区键：规划器只扫描该学科的分区及其向量索引
             if subject_code:
                 statement = statement.where(KnowledgeVector.subject_code == subject_code)
+            if metadata_filter:
+                statement = statement.where(_metadata_clause(metadata_filter))
 
             # 4. 排序与限制
             statement = statement.order_by(distance_expr).limit(limit)
@@ -56,14 +204,120 @@ class KnowledgeRepo:
             # 返回的是 Row 对象列表，但在 Python 中行为表现与 Tuple[(KV, float)] 一致
             results = session.exec(statement).all()
 
+            # relaxed_order 迭代扫描的结果可能略微乱序，按距离重新排序
+            if metadata_filter and settings.KNOWLEDGE_HNSW_ITERATIVE_SCAN == "relaxed_order":
+                results = sorted(results, key=lambda row: row.score)
+
+            return results
+
+    @traced("knowledge_repo.search_similar_many")
+    def search_similar_many(
+            self,
+            embeddings: List[List[float]],
+            k: int = 3,
+            subject_code: Optional[str] = None,
+            metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Sequence[Tuple[KnowledgeVector, float]]]:
+        """
+        多个查询向量一次检索 (一条 SQL、一次往返)
+        unnest(向量数组) WITH ORDINALITY 展开查询，LATERAL 子查询对每个向量各取 top-k
+        :return: 与 embeddings 一一对应的结果列表 (空向量对应空结果)
+        """
+        results: List[Sequence[Tuple[KnowledgeVector, float]]] = [[] for _ in embeddings]
+        positions = [i for i, embedding in enumerate(embeddings) if embedding]
+        if not positions:
+            return results
+
+        # 进程内副本覆盖时逐个查内存索引，本身没有往返开销
+        if not metadata_filter and self.replica.covers(subject_code):
+            for i in positions:
+                results[i] = self.replica.search(embeddings[i], subject_code, k)
             return results
 
+        with Session(self.engine) as session:
+            if metadata_filter:
+                _tune_hnsw(session)
+
+            # 1. 查询向量数组展开为 (embedding, ord) 行
+            vector_array = ARRAY(Vector(len(embeddings[positions[0]])))
+            queries = func.unnest(
+                cast(literal([embeddings[i] for i in positions], vector_array), vector_array)
+            ).table_valued("embedding", with_ordinality="ord").render_derived(name="q")
+
+            # 2. 每个查询向量的 top-k (与 search_similar 相同的过滤条件，学科条件同样触发分区裁剪)
+            distance_expr = KnowledgeVector.embedding.l2_distance(queries.c.embedding)
+            inner = select(KnowledgeVector, distance_expr.label("score"))
+            if subject_code:
+                inner = inner.where(KnowledgeVector.subject_code == subject_code)
+            if metadata_filter:
+                inner = inner.where(_metadata_clause(metadata_filter))
+            hits = inner.order_by(distance_expr).limit(k).lateral("hits")
+            hit = aliased(KnowledgeVector, hits, name="KnowledgeVector")
+
+            # 3. 按查询顺序、距离排序返回 (同时修正 relaxed_order 迭代扫描可能的乱序)
+            statement = (
+                select(hit, hits.c.score, queries.c.ord)
+                .select_from(queries)
+                .join(hits, true())
+                .order_by(queries.c.ord, hits.c.score)
+            )
+            for row in session.exec(statement).all():
+                results[positions[row.ord - 1]].append(row)
+
+        return results
+
+    @traced("knowledge_repo.search_lexical")
+    def search_lexical(
+            self,
+            query: str,
+            subject_code: Optional[str] = None,
+            limit: int = 3,
+            metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> Sequence[Tuple[KnowledgeVector, float]]:
+        """
+        纯关键词检索 (向量服务熔断 / 不可用时的降级路径)
+        按检索词在名称或内容中的命中比例打分，score = 1 - 命中比例，与向量距离一样越小越相关
+        """
+        terms = _lexical_terms(query)
+        if not terms:
+            return []
+
+        with Session(self.engine) as session:
+            hits = [
+                case(
+                    (KnowledgeVector.name.icontains(term, autoescape=True)
+                     | KnowledgeVector.content.icontains(term, autoescape=True), 1.0),
+                    else_=0.0,
+                )
+                for term in terms
+            ]
+            score_expr = literal(1.0) - reduce(operator.add, hits) / float(len(terms))
+
+            statement = select(KnowledgeVector, score_expr.label("score")).where(score_expr < 1.0)
+            if subject_code:
+                statement = statement.where(KnowledgeVector.subject_code == subject_code)
+            if metadata_filter:
+                statement = statement.where(_metadata_clause(metadata_filter))
+            statement = statement.order_by(score_expr).limit(limit)
+
+            return session.exec(statement).all()
+
+    @traced("knowledge_repo.upsert")
     def upsert(self, kp_code: str, name: str, subject_code: str, content: str, embedding: List[float], metadata: Dict):
         """
         使用 PostgreSQL 原生 ON CONFLICT 实现原子级 Upsert
         注意：这里去掉了 async，因为内部 Session 是同步的
         """
+        subject_code = subject_code or DEFAULT_SUBJECT_CODE
+        self.ensure_partitions([subject_code])
+
         with Session(self.engine) as session:
+            # 0. 知识点换了学科：主键含学科，需先删掉旧学科分区中的记录
+            session.execute(delete(KnowledgeVector).where(
+                KnowledgeVector.kp_code == kp_code,
+                KnowledgeVector.subject_code != subject_code,
+            ))
+
             # 1. 构建 Insert 语句
             insert_stmt = insert(KnowledgeVector).values(
                 kp_code=kp_code,
@@ -77,20 +331,32 @@ class KnowledgeRepo:
             # 2. 定义冲突更新逻辑 (ON CONFLICT DO UPDATE)
             # excluded 代表“试图插入但冲突的那一行新数据”
             do_update_stmt = insert_stmt.on_conflict_do_update(
-                index_elements=['kp_code'],  # 冲突索引
+                index_elements=['kp_code', 'subject_code'],  # 冲突索引 (主键)
                 set_={
                     "name": insert_stmt.excluded.name,
-                    "subject_code": insert_stmt.excluded.subject_code,
                     "content": insert_stmt.excluded.content,
                     "embedding": insert_stmt.excluded.embedding,
-                    "metadata_": insert_stmt.excluded.metadata_,
+                    # excluded 按数据库列名访问 (metadata_ 对应的列名是 metadata)
+                    "metadata_": insert_stmt.excluded["metadata"],
+                    "updated_at": func.now(),
                 }
-            )
+            ).returning(KnowledgeVector.updated_at)
 
             # 3. 执行
-            session.exec(do_update_stmt)
+            updated_at = session.exec(do_update_stmt).scalar_one()
             session.commit()
 
+            # 同步本地向量副本
+            self.replica.apply_upsert(KnowledgeVector(
+                kp_code=kp_code,
+                name=name,
+                subject_code=subject_code,
+                content=content,
+                embedding=embedding,
+                metadata_=metadata,
+                updated_at=updated_at,
+            ))
+
             # 4. 如果需要返回对象，可以再查一次 (通常 upsert 不需要返回完整对象，除非为了拿到自增ID)
             # 为了配合 Service 层逻辑，这里可以简单返回个 True 或重新查询
             # return self.get_content_with_metadata(kp_code)
@@ -0,0 +1,352 @@
+# app/repositories/knowledge_snapshot.py
+"""
+知识库快照导出 / 导入 (新环境冷启动直接加载向量，不再逐条调用付费的 embedding 接口)
+
+快照目录结构:
+    manifest.json     版本 / 行数 / 向量维度 / 各学科行数
+    vectors.npy       float32 (rows, dim)，第 i 行对应 knowledge.ndjson 的第 i 行
+    knowledge.ndjson  每行一个知识点 (不含向量)
+
+- 导出：REPEATABLE READ 事务内先 count 再用服务端游标分批读取，内存占用与总行数无关
+- 导入：先按学科建好分区，再用 COPY ... FROM STDIN (FORMAT BINARY) 流式写入
+  merge: COPY 到临时表后 upsert，库中其他数据保留
+  replace: 清空表后直接 COPY，导入完成后再建 HNSW 索引 (比逐行维护索引快得多)
+  导入在同一事务中写入新的数据代次 (edu_knowledge_state)，各进程的本地向量副本发现变化后全量重载：
+  replace 的删除无法通过 updated_at 增量轮询感知，merge 的长事务也可能超出轮询的回看窗口
+"""
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.schema import CreateIndex
+
+from app.core.config import settings
+from app.core.database import engine as global_engine
+from app.models.knowledge_state import GENERATION_KEY, KnowledgeState
+from app.models.knowledge_vector import KnowledgeVector
+from app.repositories.knowledge_repo import knowledge_repo
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "knowledge.ndjson"
+SNAPSHOT_FILES = (MANIFEST_FILE, VECTORS_FILE, ROWS_FILE)
+
+# 快照名只允许单层目录名，防止路径穿越
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,127}$")
+
+_TABLE = KnowledgeVector.__table__
+_COLUMNS = ("kp_code", "name", "subject_code", "content", "embedding", "content_hash", "metadata", "updated_at")
+_HNSW_INDEX = "ix_edu_knowledge_vector_embedding_hnsw"
+_STAGE_TABLE = "edu_knowledge_vector_import"
+_STATE_TABLE = KnowledgeState.__tablename__
+
+# PostgreSQL COPY BINARY 格式
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_NULL_FIELD = struct.pack("!i", -1)
+_PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+ProgressFn = Callable[[int, int], None]
+
+
+class SnapshotError(Exception):
+    """快照不存在 / 格式不兼容 / 名称非法"""
+
+
+# ---------------------------------------------------
+# 快照目录
+# ---------------------------------------------------
+def snapshot_root() -> str:
+    return os.path.abspath(settings.KNOWLEDGE_SNAPSHOT_DIR)
+
+
+def snapshot_path(name: str) -> str:
+    """快照名 -> KNOWLEDGE_SNAPSHOT_DIR 下的目录"""
+    if not _NAME_PATTERN.match(name or ""):
+        raise SnapshotError(f"invalid snapshot name: {name!r}")
+    return os.path.join(snapshot_root(), name)
+
+
+def read_manifest(path: str) -> Dict:
+    manifest_file = os.path.join(path, MANIFEST_FILE)
+    if not os.path.isfile(manifest_file):
+        raise SnapshotError(f"snapshot not found: {path}")
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_snapshots() -> List[Dict]:
+    root = snapshot_root()
+    if not os.path.isdir(root):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            snapshots.append({"name": name, **read_manifest(path)})
+    return snapshots
+
+
+# ---------------------------------------------------
+# 导出
+# ---------------------------------------------------
+def export_snapshot(
+        path: str,
+        subject_codes: Optional[List[str]] = None,
+        engine=None,
+        batch_size: Optional[int] = None,
+        progress: Optional[ProgressFn] = None,
+) -> Dict:
+    """
+    导出知识库到快照目录 (先写到 <path>.partial，完成后整体改名，不会留下半个快照)
+    :param subject_codes: 只导出这些学科，为空表示全部
+    :return: manifest
+    """
+    if os.path.exists(path):
+        raise SnapshotError(f"snapshot already exists: {path}")
+    engine = engine or global_engine
+    batch_size = batch_size or settings.KNOWLEDGE_SNAPSHOT_BATCH_SIZE
+    dim = _TABLE.c.embedding.type.dim
+
+    partial = f"{path}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    condition = _TABLE.c.subject_code.in_(subject_codes) if subject_codes else None
+    try:
+        # REPEATABLE READ：count 与游标读取看到同一份数据，vectors.npy 的行数可以预先确定
+        with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+            count_stmt = select(func.count()).select_from(_TABLE)
+            rows_stmt = select(*(_TABLE.c[c] for c in _COLUMNS)).order_by(_TABLE.c.subject_code, _TABLE.c.kp_code)
+            if condition is not None:
+                count_stmt = count_stmt.where(condition)
+                rows_stmt = rows_stmt.where(condition)
+            total = conn.execute(count_stmt).scalar_one()
+
+            vectors = np.lib.format.open_memmap(
+                os.path.join(partial, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(total, dim)
+            )
+            subjects: Counter = Counter()
+            written = 0
+            # 服务端游标分批拉取
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(rows_stmt)
+            with open(os.path.join(partial, ROWS_FILE), "w", encoding="utf-8") as f:
+                for rows in result.partitions():
+                    for row in rows:
+                        if row.embedding is not None:
+                            vectors[written] = row.embedding
+                        f.write(json.dumps({
+                            "kp_code": row.kp_code,
+                            "name": row.name,
+                            "subject_code": row.subject_code,
+                            "content": row.content,
+                            "content_hash": row.content_hash,
+                            "metadata": row.metadata,
+                            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+                            "has_embedding": row.embedding is not None,
+                        }, ensure_ascii=False) + "\n")
+                        subjects[row.subject_code] += 1
+                        written += 1
+                    if progress:
+                        progress(written, total)
+            vectors.flush()
+            del vectors
+
+        if written != total:
+            raise SnapshotError(f"row count changed during export: expected {total}, got {written}")
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "table": _TABLE.name,
+            "rows": total,
+            "dim": dim,
+            "subjects": dict(sorted(subjects.items())),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(partial, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(partial, path)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    logger.info(f"Knowledge snapshot exported: {path} ({total} rows, {len(subjects)} subjects)")
+    return manifest
+
+
+# ---------------------------------------------------
+# 导入
+# ---------------------------------------------------
+def import_snapshot(
+        path: str,
+        mode: str = "merge",
+        engine=None,
+        batch_size: Optional[int] = None,
+        progress: Optional[ProgressFn] = None,
+) -> Dict:
+    """
+    从快照目录导入知识库 (单个事务，失败时整体回滚)
+    :param mode: merge (按主键 upsert) / replace (清空后导入)
+    """
+    if mode not in ("merge", "replace"):
+        raise SnapshotError(f"unknown import mode: {mode}")
+    manifest = read_manifest(path)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version: {manifest.get('version')}")
+    dim = _TABLE.c.embedding.type.dim
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+    if vectors.shape != (manifest["rows"], dim):
+        raise SnapshotError(f"vectors shape {vectors.shape} does not match manifest ({manifest['rows']}, {dim})")
+
+    engine = engine or global_engine
+    batch_size = batch_size or settings.KNOWLEDGE_SNAPSHOT_BATCH_SIZE
+    # 分区须在 COPY 之前存在 (DDL 在独立事务中执行)
+    knowledge_repo.ensure_partitions(manifest["subjects"])
+
+    loaded_at = datetime.now(timezone.utc)
+    columns = ", ".join(_COLUMNS)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if mode == "replace":
+            cursor.execute(f"TRUNCATE {_TABLE.name}")
+            # 先删索引、导入后重建：批量构建 HNSW 远快于逐行插入时维护
+            cursor.execute(f"DROP INDEX IF EXISTS {_HNSW_INDEX}")
+            target = _TABLE.name
+        else:
+            cursor.execute(f"CREATE TEMP TABLE {_STAGE_TABLE} (LIKE {_TABLE.name} INCLUDING DEFAULTS) ON COMMIT DROP")
+            target = _STAGE_TABLE
+
+        chunks = _iter_copy_data(path, vectors, loaded_at, batch_size, progress)
+        _copy(cursor, f"COPY {target} ({columns}) FROM STDIN (FORMAT BINARY)", chunks)
+
+        if mode == "replace":
+            hnsw = next(index for index in _TABLE.indexes if index.name == _HNSW_INDEX)
+            cursor.execute(str(CreateIndex(hnsw).compile(dialect=engine.dialect)))
+        else:
+            # 知识点换了学科：删掉旧学科分区中的记录 (主键为 (kp_code, subject_code))
+            cursor.execute(
+                f"DELETE FROM {_TABLE.name} AS kv USING {_STAGE_TABLE} AS s "
+                f"WHERE kv.kp_code = s.kp_code AND kv.subject_code <> s.subject_code"
+            )
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _COLUMNS if c not in ("kp_code", "subject_code"))
+            cursor.execute(
+                f"INSERT INTO {_TABLE.name} ({columns}) SELECT {columns} FROM {_STAGE_TABLE} "
+                f"ON CONFLICT (kp_code, subject_code) DO UPDATE SET {updates}"
+            )
+        generation = f"{os.path.basename(os.path.normpath(path))}@{loaded_at.isoformat()}"
+        cursor.execute(
+            f"INSERT INTO {_STATE_TABLE} (key, value, updated_at) VALUES (%s, %s, now()) "
+            f"ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at",
+            (GENERATION_KEY, generation),
+        )
+        raw.commit()
+    except BaseException:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    logger.info(f"Knowledge snapshot imported: {path} ({manifest['rows']} rows, mode={mode})")
+    return {"rows": manifest["rows"], "subjects": manifest["subjects"], "mode": mode, "generation": generation}
+
+
+def _iter_copy_data(
+        path: str,
+        vectors: np.ndarray,
+        loaded_at: datetime,
+        batch_size: int,
+        progress: Optional[ProgressFn],
+) -> Iterator[bytes]:
+    """快照 -> COPY BINARY 数据流 (每 batch_size 行一个数据块)"""
+    total, dim = vectors.shape
+    field_count = struct.pack("!h", len(_COLUMNS))
+    vector_header = struct.pack("!HH", dim, 0)
+    updated_at = _field(struct.pack("!q", (loaded_at - _PG_EPOCH) // timedelta(microseconds=1)))
+
+    yield _COPY_HEADER
+    chunk: List[bytes] = []
+    done = 0
+    with open(os.path.join(path, ROWS_FILE), "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            row = json.loads(line)
+            # pgvector 二进制格式：int16 维度 + int16 保留位 + 大端 float4 数组
+            embedding = vector_header + vectors[i].astype(">f4").tobytes() if row["has_embedding"] else None
+            metadata = None if row["metadata"] is None else b"\x01" + _text(json.dumps(row["metadata"], ensure_ascii=False))
+            chunk.append(b"".join((
+                field_count,
+                _field(_text(row["kp_code"])),
+                _field(_text(row["name"])),
+                _field(_text(row["subject_code"])),
+                _field(_text(row["content"])),
+                _field(embedding),
+                _field(_text(row["content_hash"])),
+                _field(metadata),
+                updated_at,
+            )))
+            done = i + 1
+            if len(chunk) >= batch_size:
+                yield b"".join(chunk)
+                chunk.clear()
+                if progress:
+                    progress(done, total)
+    if done != total:
+        raise SnapshotError(f"{ROWS_FILE} has {done} rows, expected {total}")
+    yield b"".join(chunk) + _COPY_TRAILER
+    if progress:
+        progress(done, total)
+
+
+def _text(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else value.encode("utf-8")
+
+
+def _field(data: Optional[bytes]) -> bytes:
+    if data is None:
+        return _NULL_FIELD
+    return struct.pack("!i", len(data)) + data
+
+
+def _copy(cursor, sql: str, chunks: Iterable[bytes]):
+    if hasattr(cursor, "copy_expert"):
+        # psycopg2：从类文件对象读取
+        cursor.copy_expert(sql, _ChunkReader(chunks), size=1 << 20)
+    else:
+        # psycopg (v3)
+        with cursor.copy(sql) as copy:
+            for chunk in chunks:
+                copy.write(chunk)
+
+
+class _ChunkReader(io.RawIOBase):
+    """把数据块迭代器包装成只读文件对象 (供 psycopg2 copy_expert 使用)"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
@@ -1,8 +1,13 @@
+import logging
+
 from sqlmodel import Session, select
 
 from app.core.database import engine as global_engine
+from app.core.tracing import traced
 from app.models.subject_config import SubjectConfig
 
+logger = logging.getLogger(__name__)
+
 
 class SubjectRepo:
     """学科配置仓储层"""
@@ -11,6 +16,7 @@ class SubjectRepo:
         # 如果初始化没传 engine，就用全局默认的
         self.engine = db_engine or global_engine
 
+    @traced("subject_repo.get_config")
     def get_config(self, subject_name: str) -> SubjectConfig:
         """
         获取学科配置，失败时逐级降级：
@@ -38,8 +44,7 @@ class SubjectRepo:
 
                 return res_default if res_default else hard_fallback
         except Exception as e:
-            # 记录日志建议在这里做，print仅作演示
-            print(f"Error fetching subject config: {e}")
+            logger.error(f"Error fetching subject config: {e}")
             return hard_fallback
 
 
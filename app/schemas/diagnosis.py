@@ -21,6 +21,12 @@ class DiagnosisRequest(BaseSchema):
     # 可选：如果有教材版本上下文
     textbook_version: Optional[str] = Field(None, description="教材版本，用于AI上下文")
 
+    # 可选：参考答案 (如 "x = 6" 或 "6")，用于规则预检快速判对
+    reference_answer: Optional[str] = Field(None, description="参考答案，用于规则预检")
+
+    # 可选：指定 Prompt 模板 (app/core/prompts 下的文件名)，用于 A/B 对比
+    prompt_template: Optional[str] = Field(None, description="Prompt 模板名，不传则按学科/默认模板")
+
 
 # ==========================================
 # 2. Response Schema (出参: Python -> Java)
@@ -42,3 +48,17 @@ class DiagnosisResponse(BaseSchema):
 
     # 4. 改进建议
     suggested_actions: List[str] = Field(default_factory=list, description="改进建议")
+
+
+# ==========================================
+# 3. LLM Output Schema (内部使用，不返回给 Java)
+# ==========================================
+class DiagnosisLLMOutput(DiagnosisResponse):
+    """
+    LLM 输出格式：在 DiagnosisResponse 基础上要求模型自评置信度
+    模型级联据此决定是否升级到更强的模型，返回 Java 前转换为 DiagnosisResponse
+    """
+    confidence: Optional[float] = Field(None, ge=0, le=1, description="对判定结果的把握 (0~1)，拿不准时给低分")
+
+    def to_response(self) -> DiagnosisResponse:
+        return DiagnosisResponse.model_validate(self.model_dump(exclude={"confidence"}))
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import Field
+
+from app.schemas import BaseSchema
+from app.schemas.knowledge import KnowledgeSyncRequest
+from app.schemas.ocr import OCRRequest
+
+
+class JobSubmitRequest(BaseSchema):
+    """提交异步任务"""
+    kind: str = Field(..., description="任务类型，如 knowledge.sync_batch / ocr.recognize_pages")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="任务参数，结构由任务类型决定")
+    callback_url: Optional[str] = Field(None, description="完成 / 最终失败后回调的地址 (POST JobResponse)")
+    max_attempts: Optional[int] = Field(None, ge=1, le=10, description="最大执行次数，默认 JOB_MAX_ATTEMPTS")
+
+
+class JobResponse(BaseSchema):
+    id: str
+    kind: str
+    pool: str
+    status: str = Field(..., description="queued / running / succeeded / failed")
+    progress: float = Field(0.0, description="进度 0~1")
+    message: Optional[str] = Field(None, description="进度说明")
+    attempts: int = 0
+    max_attempts: int = 3
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# ==========================================
+# 各任务类型的 payload
+# ==========================================
+class KnowledgeSyncBatchPayload(BaseSchema):
+    items: List[KnowledgeSyncRequest] = Field(..., min_length=1)
+
+
+class OCRPagesPayload(BaseSchema):
+    pages: List[OCRRequest] = Field(..., min_length=1)
+
+
+class KnowledgeSnapshotExportPayload(BaseSchema):
+    name: Optional[str] = Field(None, description="快照名 (KNOWLEDGE_SNAPSHOT_DIR 下的目录名)，默认按时间生成")
+    subject_codes: Optional[List[str]] = Field(None, description="只导出这些学科，不传表示全部")
+
+
+class KnowledgeSnapshotImportPayload(BaseSchema):
+    name: str = Field(..., description="快照名 (KNOWLEDGE_SNAPSHOT_DIR 下的目录名)")
+    mode: Literal["merge", "replace"] = Field("merge", description="merge: 按主键 upsert / replace: 清空后导入")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import Field
 
@@ -18,6 +18,8 @@ class KnowledgeBase(BaseSchema):
 class KnowledgeSyncRequest(KnowledgeBase):
     # 允许 Java 端同步时带个备注，后续可能用于日志记录
     sync_remark: Optional[str] = None
+    # 检索时可过滤的元数据，如 {"grade": "7", "textbookVersion": "rj", "chapter": "3"}
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="知识点元数据 (年级 / 教材版本 / 章节等)")
 
 
 # 3. 更新类 (Update)
@@ -42,3 +44,16 @@ class KnowledgeSearchResult(BaseSchema):
     kp_code: str
     content: str
     score: float = Field(..., description="向量相似度得分")
+
+
+# 6. 批量检索 (多个问题一次向量化、一次 SQL)
+class KnowledgeBatchSearchRequest(BaseSchema):
+    queries: List[str] = Field(..., min_length=1, description="检索问题列表 (如多步作答的每一步)")
+    subject_code: Optional[str] = Field(None, description="学科编码，用于缩小搜索范围")
+    top_k: int = Field(default=3, ge=1, le=20, description="每个问题返回的条数")
+    metadata_filter: Optional[Dict[str, Any]] = Field(None, description="元数据过滤，如 {\"grade\": \"7\"}")
+
+
+class KnowledgeBatchSearchResult(BaseSchema):
+    query: str
+    results: List[KnowledgeSearchResult]
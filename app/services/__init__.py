@@ -1,5 +1,7 @@
 from .diagnosis_service import diagnosis_service
+from .job_service import job_service
 from .knowledge_service import knowledge_service
 from .ocr_service import ocr_service
+from . import job_handlers  # noqa: F401  注册异步任务处理函数
 
-__all__ = ['diagnosis_service', 'knowledge_service', 'ocr_service']
+__all__ = ['diagnosis_service', 'job_service', 'knowledge_service', 'ocr_service']
@@ -1,86 +1,143 @@
 # app/services/diagnosis_service.py
+import asyncio
 import logging
-import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
-import yaml
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 
-from app.infra.llm import llm
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, DEADLINE_DEGRADATIONS, FALLBACKS, Stage, track_stage
+from app.core.prompt_registry import PromptEntry, prompt_registry
+from app.core.singleflight import SingleFlight, normalize_text
+from app.core.tracing import traced
+from app.infra.llm import (
+    Lane, AdmissionTimeout, CircuitOpenError, Tier, chat_admission, chat_breaker, diagnosis_cascade, estimate_tokens,
+    usage_tokens
+)
 # 导入内部依赖
+from app.models.subject_config import SubjectConfig
 from app.repositories import subject_repo, knowledge_repo
-from app.schemas.diagnosis import DiagnosisResponse
+from app.schemas.diagnosis import DiagnosisLLMOutput, DiagnosisResponse
+from app.services.prechecks import PreCheckContext, precheck_stage
 
 logger = logging.getLogger(__name__)
 
+# 按 (模板版本, 学科配置, 模型) 缓存的已编译链上限
+_CHAIN_CACHE_SIZE = 64
+
+# 截止时间不足时不再检索知识点，使用的通用背景
+_GENERIC_CONTENT = "通用逻辑与学术规范"
+
+
+def build_format_instructions() -> str:
+    """
+    根据 DiagnosisLLMOutput (DiagnosisResponse + 自评置信度) 生成精简的输出格式说明
+    替代 PydanticOutputParser.get_format_instructions() 输出的完整 JSON Schema，显著减少 prompt token
+    """
+    schema = DiagnosisLLMOutput.model_json_schema(by_alias=False)
+    lines = ["只输出一个 JSON 对象，字段如下："]
+    for name, prop in schema.get("properties", {}).items():
+        types = [p.get("type") for p in prop.get("anyOf", [prop])]
+        type_desc = "|".join(
+            "string[]" if t == "array" else ("null" if t == "null" else t)
+            for t in types if t
+        )
+        lines.append(f"- {name} ({type_desc}): {prop.get('description', '')}")
+    return "\n".join(lines)
+
 
 class DiagnosisService:
     def __init__(self):
         """
         初始化 DiagnosisService
-        1. 注入依赖 (Repo, LLM)
-        2. 计算 Prompt 路径 (消除硬编码)
-        3. 预加载 Prompt 模板 (优化性能)
+        1. 注入依赖 (Repo, 模型级联, Prompt 注册表)
+        2. 预生成格式说明、绑定 JSON 模式 (优化性能)
         """
         # 依赖注入
         self.knowledge_repo = knowledge_repo
         self.subject_repo = subject_repo
-        self.llm = llm
-
-        # 初始化解析器
-        self.parser = PydanticOutputParser(pydantic_object=DiagnosisResponse)
+        self.cascade = diagnosis_cascade
+        self.precheck = precheck_stage
 
-        # 1. 定义 Prompt 文件路径
-        # 获取当前文件所在目录 (app/services) 的上级目录 (app)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        app_dir = os.path.dirname(current_dir)
+        # 相同 (知识点, 题目, 作答) 的并发诊断只调用一次 LLM
+        self.flight = SingleFlight("diagnosis")
 
-        # 拼接目标路径: app/core/prompts/diagnosis_template.yaml
-        self.prompt_yaml_path = os.path.join(app_dir, "core", "prompts", "diagnosis_template.yaml")
+        # 初始化解析器
+        self.parser = PydanticOutputParser(pydantic_object=DiagnosisLLMOutput)
+        # 格式说明只生成一次 (原先每次请求都序列化一遍 Pydantic JSON Schema)
+        self.format_instructions = build_format_instructions()
+        # 各级联层级的模型与对冲模型 (已绑定 JSON 模式)，键为 (层级, 是否对冲)
+        self.llm_json = {}
+        for tier in self.cascade.tiers:
+            self.llm_json[(tier.name, False)] = self._bind_json(tier.model)
+            self.llm_json[(tier.name, True)] = (
+                self._bind_json(tier.hedge_model) if tier.hedge_model is not tier.model
+                else self.llm_json[(tier.name, False)]
+            )
+        # (模板版本, 学科配置, 层级, 是否对冲) -> 已编译的 Template -> LLM 链 (解析单独计时)
+        self._chains: "OrderedDict[Tuple, Runnable]" = OrderedDict()
+        # 最近的诊断结果 (请求键 -> (写入时间, 结果))，截止时间不足以调用 LLM 时复用
+        self._recent: "OrderedDict[Tuple, Tuple[float, DiagnosisResponse]]" = OrderedDict()
 
-        # 2. 加载模板 (启动时只执行一次)
-        self.prompt_template = self._load_prompt_template()
+        # Prompt 模板注册表 (支持热加载 / 按学科或按请求选择模板)
+        self.prompts = prompt_registry
 
-    def _load_prompt_template(self) -> ChatPromptTemplate:
+    @traced("diagnosis.diagnose")
+    async def diagnose(
+            self,
+            kp_code: str,
+            question: str,
+            student_answer: str,
+            reference_answer: Optional[str] = None,
+            prompt_template: Optional[str] = None
+    ) -> DiagnosisResponse:
         """
-        加载并解析 YAML Prompt 模板
-        使用 self.prompt_yaml_path，依赖实例状态，避免 'static method' 警告
+        执行 AI 诊断逻辑 (RAG + 规则预检 + LLM)
+        全班在同一时间提交相同答案时，并发的相同请求合并为一次诊断
+        :param prompt_template: (可选) 指定 Prompt 模板名，不传则按学科映射 / 默认模板
         """
+        key = (
+            kp_code.strip(),
+            normalize_text(question),
+            normalize_text(student_answer),
+            normalize_text(reference_answer or ""),
+            prompt_template or "",
+        )
         try:
-            if not os.path.exists(self.prompt_yaml_path):
-                # 这是一个严重的配置错误，应用启动时应该报错
-                raise FileNotFoundError(f"Critical Error: Prompt template not found at {self.prompt_yaml_path}")
-
-            logger.info(f"Loading diagnosis prompt template from: {self.prompt_yaml_path}")
-
-            with open(self.prompt_yaml_path, 'r', encoding='utf-8') as f:
-                prompt_config = yaml.safe_load(f)
-
-            messages = []
-            # 转换 YAML 结构为 LangChain Message Tuple
-            for msg in prompt_config.get("messages", []):
-                messages.append((msg.get("role"), msg.get("content")))
-
-            return ChatPromptTemplate.from_messages(messages)
-
-        except Exception as e:
-            logger.error(f"Failed to load diagnosis prompt: {e}")
-            raise e
+            return await self.flight.do(
+                key, lambda: self._diagnose(key, kp_code, question, student_answer, reference_answer, prompt_template)
+            )
+        except deadline.DeadlineExceeded:
+            # 共享诊断不受本请求截止时间约束，本请求先行降级；诊断完成后结果仍会写入近期缓存
+            DEADLINE_DEGRADATIONS.labels(stage=Stage.LLM_CALL, action="timeout").inc()
+            logger.warning(f"RAG Diagnosis ran out of deadline waiting for shared call, KP={kp_code}")
+            return self._recall_or_fallback(key, kp_code, "deadline")
 
-    async def diagnose(self, kp_code: str, question: str, student_answer: str) -> DiagnosisResponse:
-        """
-        执行 AI 诊断逻辑 (RAG + LLM)
-        """
+    async def _diagnose(
+            self,
+            key: Tuple,
+            kp_code: str,
+            question: str,
+            student_answer: str,
+            reference_answer: Optional[str] = None,
+            prompt_template: Optional[str] = None
+    ) -> DiagnosisResponse:
         try:
             # --- 步骤 1: 检索知识背景 (RAG) ---
-            # 直接使用 self.knowledge_repo
-            knowledge_data = self.knowledge_repo.get_content_with_metadata(kp_code)
+            # 剩余时间不足时跳过检索，用通用背景换取 LLM 的时间
+            knowledge_data = self._lookup_knowledge(kp_code)
 
             subject_code = "default"
 
             if not knowledge_data:
-                logger.warning(f"Knowledge point {kp_code} not found, using generic logic.")
-                content = "通用逻辑与学术规范"
+                content = _GENERIC_CONTENT
             else:
                 # 解包 Tuple: (content, metadata_dict)
                 content_text, metadata = knowledge_data
@@ -89,37 +146,184 @@ class DiagnosisService:
                 meta_dict = metadata if isinstance(metadata, dict) else {}
                 subject_code = meta_dict.get("subject_code", "default")
 
+            # --- 步骤 1.5: 规则预检 (能确定判对的直接返回，省掉一次 LLM 调用) ---
+            prechecked = self.precheck.run(PreCheckContext(
+                kp_code=kp_code,
+                question=question,
+                student_answer=student_answer,
+                subject_code=subject_code,
+                reference_answer=reference_answer,
+            ))
+            if prechecked is not None:
+                return prechecked
+
             # --- 步骤 2: 获取学科配置 (用于调整 AI 语气) ---
-            config = self.subject_repo.get_config(subject_code)
+            with track_stage(Stage.SUBJECT_CONFIG):
+                config = self.subject_repo.get_config(subject_code)
 
-            # --- 步骤 3: 构造并执行 LangChain 链 ---
-            # Chain: Template -> LLM -> Parser
-            chain = self.prompt_template | self.llm | self.parser
+            # 剩余时间已不够一次 LLM 调用：返回近期相同请求的结果，没有则兜底
+            if deadline.below(settings.DEADLINE_MIN_LLM_SECONDS):
+                DEADLINE_DEGRADATIONS.labels(stage=Stage.LLM_CALL, action="skip").inc()
+                return self._recall_or_fallback(key, kp_code, "deadline")
 
-            # 异步调用 LLM
-            result = await chain.ainvoke({
-                "role_name": config.role_name,
-                "style_desc": config.style_desc,
-                "focus_points": config.focus_points,
+            # --- 步骤 3: 选择模板，经模型级联调用 LLM ---
+            # 先用快速模型，解析失败或自评置信度低时才升级到强模型
+            entry = self.prompts.select(subject_code=subject_code, requested=prompt_template)
+            inputs = {
                 "content": content,
                 "question": question,
                 "student_answer": student_answer,
-                "format_instructions": self.parser.get_format_instructions()
-            })
+            }
+            prompt_tokens = estimate_tokens(content, question, student_answer)
+
+            async def attempt(tier: Tier) -> DiagnosisLLMOutput:
+                # Chain: Template(system 已预渲染) -> LLM(JSON 模式)，输出解析单独一步以便分别计时
+                chain = self._get_chain(entry, config, tier)
+                hedge_chain = self._get_chain(entry, config, tier, hedge=True)
+                # 上游熔断时直接拒绝，不排队也不等超时
+                # 异步调用 LLM (经过准入控制，高峰期排队而不是直接触发上游 429)
+                # 排队与调用都以请求剩余时间为上限；首个请求过慢时发出对冲请求 (另占一个准入名额)
+                async with chat_breaker.guard(), chat_admission.slot(
+                        Lane.INTERACTIVE, tokens=prompt_tokens, timeout=deadline.bounded(chat_admission.timeout)
+                ):
+                    with track_stage(Stage.LLM_CALL):
+                        # 截止时间到达时抛出 DeadlineExceeded (不计入熔断失败)
+                        message = await deadline.within(tier.hedger.run(
+                            lambda: chain.ainvoke(inputs),
+                            lambda: hedge_chain.ainvoke(inputs),
+                            admission=chat_admission,
+                            tokens=prompt_tokens,
+                        ), "llm_call")
+                # 预扣的只是 prompt 估算值，按上游返回的实际用量 (含输出) 修正 TPM 令牌桶
+                chat_admission.settle(prompt_tokens, usage_tokens(message))
+
+                with track_stage(Stage.OUTPUT_PARSE):
+                    return await self.parser.ainvoke(message)
+
+            output = await self.cascade.run(attempt)
+            result = output.to_response()
 
+            self._remember(key, result)
             return result
 
+        except (asyncio.TimeoutError, deadline.DeadlineExceeded):
+            logger.warning(f"RAG Diagnosis ran out of deadline for KP={kp_code}")
+            return self._recall_or_fallback(key, kp_code, "deadline")
+
+        except CircuitOpenError:
+            # 上游熔断：立即降级，不打印堆栈
+            return self._recall_or_fallback(key, kp_code, "circuit_open")
+
+        except AdmissionTimeout as e:
+            # 排队超时：上游已饱和，不打印堆栈
+            logger.warning(f"RAG Diagnosis queued too long for KP={kp_code}: {e}")
+            return self._fallback_response("admission_timeout")
+
+        except OutputParserException as e:
+            logger.error(f"RAG Diagnosis output unparsable for KP={kp_code}: {str(e)}")
+            return self._fallback_response("parse_error")
+
         except Exception as e:
             logger.error(f"RAG Diagnosis failed for KP={kp_code}: {str(e)}", exc_info=True)
+            return self._fallback_response("error")
 
-            # --- 兜底逻辑 ---
-            # 如果 AI 挂了或者解析失败，返回一个合法的默认对象，防止前端崩溃
-            return DiagnosisResponse(
-                is_correct=False,
-                error_type="SystemError",
-                analysis="系统繁忙，AI 助教暂时无法连接。请稍后重试或联系管理员。",
-                suggested_actions=["请检查网络连接", "尝试重新提交"]
-            )
+    def _lookup_knowledge(self, kp_code: str) -> Optional[Tuple[str, Dict]]:
+        """检索知识点背景；剩余时间不足或查询失败 (含语句超时) 时返回 None，按通用背景继续诊断"""
+        if deadline.below(settings.DEADLINE_MIN_RAG_SECONDS):
+            DEADLINE_DEGRADATIONS.labels(stage=Stage.DB_LOOKUP, action="skip").inc()
+            logger.info(f"Skipping knowledge lookup for {kp_code}: {deadline.remaining():.2f}s left")
+            return None
+        try:
+            with track_stage(Stage.DB_LOOKUP):
+                knowledge_data = self.knowledge_repo.get_content_with_metadata(kp_code)
+        except Exception as e:
+            DEADLINE_DEGRADATIONS.labels(stage=Stage.DB_LOOKUP, action="error").inc()
+            logger.warning(f"Knowledge lookup failed for {kp_code}, using generic logic: {e}")
+            return None
+        if not knowledge_data:
+            logger.warning(f"Knowledge point {kp_code} not found, using generic logic.")
+        return knowledge_data
+
+    def _remember(self, key: Tuple, result: DiagnosisResponse):
+        if settings.DEADLINE_RECENT_CACHE_SIZE <= 0:
+            return
+        self._recent[key] = (time.monotonic(), result)
+        self._recent.move_to_end(key)
+        while len(self._recent) > settings.DEADLINE_RECENT_CACHE_SIZE:
+            self._recent.popitem(last=False)
+
+    def _recall_or_fallback(self, key: Tuple, kp_code: str, reason: str) -> DiagnosisResponse:
+        """无法调用 LLM (截止时间不足 / 上游熔断) 时的降级：近期相同请求的诊断结果 > 兜底结果"""
+        cached = self._recent.get(key)
+        if cached is not None and time.monotonic() - cached[0] <= settings.DEADLINE_RECENT_CACHE_TTL:
+            CACHE_HITS.labels(cache="diagnosis_recent").inc()
+            return cached[1]
+        CACHE_MISSES.labels(cache="diagnosis_recent").inc()
+        logger.warning(f"LLM unavailable ({reason}) for KP={kp_code}, returning fallback")
+        return self._fallback_response(reason)
+
+    def _bind_json(self, model):
+        # 优先使用模型原生 JSON 模式，保证输出可解析
+        return model.bind(response_format={"type": "json_object"}) if settings.LLM_JSON_MODE else model
+
+    def _get_chain(self, entry: PromptEntry, config: SubjectConfig, tier: Tier, hedge: bool = False) -> Runnable:
+        """按 (模板版本, 学科配置, 层级, 是否对冲) 取已编译的链，首次使用时编译并缓存 (LRU)；模板热更新后版本变化自动重新编译"""
+        key = (
+            entry.name, entry.version, config.subject_name, config.role_name, config.style_desc, config.focus_points,
+            tier.name, hedge and tier.hedge_model is not tier.model,
+        )
+        chain = self._chains.get(key)
+        if chain is not None:
+            CACHE_HITS.labels(cache="diagnosis_chain").inc()
+            self._chains.move_to_end(key)
+            return chain
+
+        CACHE_MISSES.labels(cache="diagnosis_chain").inc()
+        chain = self._compile_prompt(entry.template, config) | self.llm_json[(tier.name, hedge)]
+        self._chains[key] = chain
+        if len(self._chains) > _CHAIN_CACHE_SIZE:
+            self._chains.popitem(last=False)
+        return chain
+
+    def _compile_prompt(self, template: ChatPromptTemplate, config: SubjectConfig) -> ChatPromptTemplate:
+        """
+        预渲染 Prompt 中与请求无关的部分
+        只依赖学科配置 / 格式说明的消息 (system) 直接渲染成字面量消息，每次请求只格式化 user 消息
+        """
+        invariants = {
+            "role_name": config.role_name,
+            "style_desc": config.style_desc,
+            "focus_points": config.focus_points,
+            "format_instructions": self.format_instructions,
+        }
+        messages = []
+        for message in template.messages:
+            if isinstance(message, BaseMessage):
+                messages.append(message)
+                continue
+            variables = set(message.input_variables)
+            if variables <= invariants.keys():
+                messages.extend(message.format_messages(**{k: invariants[k] for k in variables}))
+            else:
+                messages.append(message)
+
+        prompt = ChatPromptTemplate.from_messages(messages)
+        remaining = {k: v for k, v in invariants.items() if k in prompt.input_variables}
+        return prompt.partial(**remaining) if remaining else prompt
+
+    @staticmethod
+    def _fallback_response(reason: str) -> DiagnosisResponse:
+        """
+        兜底逻辑
+        如果 AI 挂了或者解析失败，返回一个合法的默认对象，防止前端崩溃
+        """
+        FALLBACKS.labels(reason=reason).inc()
+        return DiagnosisResponse(
+            is_correct=False,
+            error_type="SystemError",
+            analysis="系统繁忙，AI 助教暂时无法连接。请稍后重试或联系管理员。",
+            suggested_actions=["请检查网络连接", "尝试重新提交"]
+        )
 
 
 # 导出单例实例 (供 Controller 使用)
@@ -0,0 +1,122 @@
+# app/services/job_handlers.py
+"""
+异步任务处理函数 (在 services/__init__ 中导入以完成注册)
+"""
+import asyncio
+import concurrent.futures
+import logging
+from datetime import datetime
+
+from app.core.config import settings
+from app.infra.ocr.utils import read_file_bytes
+from app.repositories import knowledge_snapshot
+from app.repositories.knowledge_replica import knowledge_replica
+from app.schemas.job import (
+    KnowledgeSnapshotExportPayload,
+    KnowledgeSnapshotImportPayload,
+    KnowledgeSyncBatchPayload,
+    OCRPagesPayload,
+)
+from .job_service import JobContext, job_service
+from .knowledge_service import knowledge_service
+from .ocr_service import ocr_service
+
+logger = logging.getLogger(__name__)
+
+
+def _thread_progress(ctx: JobContext, unit: str):
+    """
+    在线程池中执行的任务通过它上报进度 (投递回事件循环并等待结果)
+    续约失败 (JobLeaseLost) 会在工作线程中抛出，中止 COPY 等长时间操作，避免与重新领取该任务的 worker 并行执行
+    """
+    loop = asyncio.get_running_loop()
+
+    def report(done: int, total: int):
+        future = asyncio.run_coroutine_threadsafe(ctx.progress(done, total, f"{done}/{total} {unit}"), loop)
+        try:
+            future.result(timeout=settings.JOB_LEASE_SECONDS)
+        except concurrent.futures.TimeoutError:
+            # 事件循环迟迟没有完成续约：不阻塞导入 / 导出，下一次上报再续约
+            future.cancel()
+            logger.warning(f"[Job] Progress report for {ctx.job.id} timed out")
+
+    return report
+
+
+@job_service.register("knowledge.sync_batch", pool="bulk", payload_model=KnowledgeSyncBatchPayload)
+async def sync_knowledge_batch(ctx: JobContext, payload: KnowledgeSyncBatchPayload):
+    """
+    批量同步知识点 (向量化走 BULK 低优先级通道)
+    单条失败不中断整批，结果中列出失败的知识点；全部失败时抛出异常触发重试
+    """
+    total = len(payload.items)
+    failed = []
+    for i, item in enumerate(payload.items, 1):
+        try:
+            await knowledge_service.upsert_knowledge(item)
+        except Exception as e:
+            failed.append({"kpCode": item.kp_code, "error": str(e)})
+        await ctx.progress(i, total, f"{i}/{total} synced")
+
+    if failed and len(failed) == total:
+        raise RuntimeError(f"all {total} knowledge items failed, first error: {failed[0]['error']}")
+    return {"total": total, "succeeded": total - len(failed), "failed": failed}
+
+
+@job_service.register("ocr.recognize_pages", pool="ocr", payload_model=OCRPagesPayload)
+async def recognize_pages(ctx: JobContext, payload: OCRPagesPayload):
+    """
+    多页 OCR：逐页识别，推理放到线程池执行，不阻塞事件循环上的在线请求
+    """
+    total = len(payload.pages)
+    pages = []
+    for i, page in enumerate(payload.pages):
+        try:
+            image_bytes = await read_file_bytes(
+                image_base64=page.image_base64,
+                file_url=page.file_url,
+                file_path=page.file_path,
+            )
+            response = await asyncio.to_thread(ocr_service.recognize_bytes, image_bytes)
+            pages.append({"index": i, **response.model_dump(by_alias=True)})
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.warning(f"[Job] OCR page {i} of job {ctx.job.id} failed: {detail}")
+            pages.append({"index": i, "error": detail})
+        await ctx.progress(i + 1, total, f"{i + 1}/{total} pages")
+
+    if all("error" in p for p in pages):
+        raise RuntimeError(f"all {total} pages failed, first error: {pages[0]['error']}")
+    return {"pages": pages}
+
+
+@job_service.register("knowledge.export_snapshot", pool="bulk", payload_model=KnowledgeSnapshotExportPayload)
+async def export_knowledge_snapshot(ctx: JobContext, payload: KnowledgeSnapshotExportPayload):
+    """
+    导出知识库快照 (向量 + 元数据) 到 KNOWLEDGE_SNAPSHOT_DIR，新环境可直接导入而无需重新向量化
+    """
+    name = payload.name or f"knowledge-{datetime.now():%Y%m%d-%H%M%S}"
+    manifest = await asyncio.to_thread(
+        knowledge_snapshot.export_snapshot,
+        knowledge_snapshot.snapshot_path(name),
+        subject_codes=payload.subject_codes,
+        progress=_thread_progress(ctx, "rows"),
+    )
+    return {"name": name, **manifest}
+
+
+@job_service.register("knowledge.import_snapshot", pool="bulk", payload_model=KnowledgeSnapshotImportPayload)
+async def import_knowledge_snapshot(ctx: JobContext, payload: KnowledgeSnapshotImportPayload):
+    """
+    从 KNOWLEDGE_SNAPSHOT_DIR 下的快照导入知识库 (COPY BINARY，不调用 embedding 接口)
+    """
+    result = await asyncio.to_thread(
+        knowledge_snapshot.import_snapshot,
+        knowledge_snapshot.snapshot_path(payload.name),
+        mode=payload.mode,
+        progress=_thread_progress(ctx, "rows"),
+    )
+    # 导入已写入新的数据代次：本进程立即重载，其它进程在下一次轮询时重载
+    if knowledge_replica.ready:
+        await asyncio.to_thread(knowledge_replica.refresh)
+    return {"name": payload.name, **result}
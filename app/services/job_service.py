@@ -0,0 +1,225 @@
+# app/services/job_service.py
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+import httpx
+from pydantic import BaseModel
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+from app.core.config import settings
+from app.infra.jobs import JobLeaseLost, JobQueue, MemoryJobQueue, PostgresJobQueue
+from app.models.job import Job, JobStatus
+from app.schemas.job import JobResponse, JobSubmitRequest
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownJobKind(ValueError):
+    """未注册的任务类型"""
+
+
+class JobContext:
+    """传给任务处理函数：上报进度 (自动节流并续约)；租约已被其他 worker 接手时抛出 JobLeaseLost 中止处理"""
+
+    def __init__(self, queue: JobQueue, job: Job, min_interval: float):
+        self.job = job
+        self._queue = queue
+        self._min_interval = min_interval
+        self._last_report = 0.0
+
+    async def progress(self, done: int, total: int, message: Optional[str] = None):
+        now = time.monotonic()
+        if done < total and now - self._last_report < self._min_interval:
+            return
+        self._last_report = now
+        await self._queue.progress(self.job.id, self.job.locked_by, round(done / total, 4) if total else 0.0, message)
+
+
+JobFn = Callable[[JobContext, Any], Awaitable[Any]]
+
+
+@dataclass
+class JobHandler:
+    kind: str
+    pool: str
+    fn: JobFn
+    payload_model: Type[BaseModel]
+
+
+class JobService:
+    """
+    异步任务服务 (提交 / 查询 / 执行)
+    - 每个任务类型绑定一个 worker 池 (如 bulk / ocr)，池之间并发数独立配置，互不抢占
+    - 失败按指数退避重试，超过 max_attempts 后标记失败
+    - 完成或最终失败时按 callback_url 回调 (带 HMAC 签名)
+    """
+
+    def __init__(self, queue: JobQueue, pools: Dict[str, int]):
+        self.queue = queue
+        self.pools = pools
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+
+    def register(self, kind: str, pool: str, payload_model: Type[BaseModel]):
+        """装饰器：注册任务处理函数 fn(ctx, payload) -> 可 JSON 序列化的结果"""
+
+        def decorator(fn: JobFn) -> JobFn:
+            self._handlers[kind] = JobHandler(kind=kind, pool=pool, fn=fn, payload_model=payload_model)
+            return fn
+
+        return decorator
+
+    # ---------------------------------------------------
+    # 提交 / 查询
+    # ---------------------------------------------------
+    async def submit(self, req: JobSubmitRequest) -> JobResponse:
+        handler = self._handlers.get(req.kind)
+        if handler is None:
+            raise UnknownJobKind(f"unknown job kind: {req.kind}")
+        # 提交时就校验参数，格式错误直接返回给调用方而不是进入队列后失败
+        handler.payload_model.model_validate(req.payload)
+
+        job = await self.queue.enqueue(Job(
+            id=uuid.uuid4().hex,
+            kind=req.kind,
+            pool=handler.pool,
+            payload=req.payload,
+            max_attempts=req.max_attempts or settings.JOB_MAX_ATTEMPTS,
+            callback_url=req.callback_url,
+        ))
+        logger.info(f"[Job] Submitted {job.kind} id={job.id} pool={job.pool}")
+        return JobResponse.model_validate(job)
+
+    async def get(self, job_id: str) -> Optional[JobResponse]:
+        job = await self.queue.get(job_id)
+        return JobResponse.model_validate(job) if job else None
+
+    # ---------------------------------------------------
+    # Worker 池
+    # ---------------------------------------------------
+    async def start(self):
+        used_pools = {h.pool for h in self._handlers.values()}
+        for pool, size in self.pools.items():
+            if pool not in used_pools:
+                continue
+            for n in range(size):
+                worker_id = f"{os.getpid()}-{pool}-{n}"
+                self._workers.append(asyncio.create_task(self._worker_loop(pool, worker_id), name=worker_id))
+        if self._workers:
+            logger.info(f"[Job] Started workers: { {p: s for p, s in self.pools.items() if p in used_pools} }")
+
+    async def stop(self):
+        """停止领取新任务，等待进行中的任务结束 (最多 SERVER_GRACEFUL_TIMEOUT 秒)"""
+        self._stopping.set()
+        if self._workers:
+            _, pending = await asyncio.wait(self._workers, timeout=settings.SERVER_GRACEFUL_TIMEOUT)
+            for task in pending:
+                # 内存后端任务随进程丢失；postgres 后端的任务会在租约过期后被其他 worker 重新领取
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._workers.clear()
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+        await self.queue.close()
+
+    async def _worker_loop(self, pool: str, worker_id: str):
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(pool, worker_id)
+            except Exception as e:
+                logger.error(f"[Job] Claim failed in pool {pool}: {e}")
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            if job is None:
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # 兜底：任何漏出的异常都不能让 worker 协程退出，否则池子会越跑越少
+                logger.error(f"[Job] Worker {worker_id} failed to run job {job.id}: {e}", exc_info=True)
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    async def _run(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            await self._finish(job, self.queue.fail(job.id, job.locked_by, f"unknown job kind: {job.kind}"))
+            return
+
+        start = time.perf_counter()
+        try:
+            payload = handler.payload_model.model_validate(job.payload)
+            result = await handler.fn(JobContext(self.queue, job, settings.JOB_PROGRESS_INTERVAL), payload)
+            finished = await self._finish(job, self.queue.complete(job.id, job.locked_by, result))
+            if finished is not None:
+                logger.info(f"[Job] {job.kind} id={job.id} succeeded in {time.perf_counter() - start:.1f}s")
+        except JobLeaseLost as e:
+            # 租约过期后任务已被其他 worker 重新领取，由新的持有者负责结果，这里直接放弃
+            logger.warning(f"[Job] {job.kind} id={job.id} abandoned: {e}")
+            return
+        except Exception as e:
+            retry_in = None
+            if job.attempts < job.max_attempts:
+                retry_in = min(settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+            logger.error(
+                f"[Job] {job.kind} id={job.id} attempt {job.attempts}/{job.max_attempts} failed: {e}",
+                exc_info=True
+            )
+            finished = await self._finish(
+                job, self.queue.fail(job.id, job.locked_by, str(e) or type(e).__name__, retry_in=retry_in)
+            )
+
+        if finished is not None and finished.status in JobStatus.FINISHED and finished.callback_url:
+            await self._notify(finished)
+
+    async def _finish(self, job: Job, update: Awaitable[Optional[Job]]) -> Optional[Job]:
+        """写入最终状态；写库失败时不再重试，租约过期后任务会被重新领取"""
+        try:
+            return await update
+        except Exception as e:
+            logger.error(
+                f"[Job] {job.kind} id={job.id} failed to record result, left for lease expiry: {e}",
+                exc_info=True
+            )
+            return None
+
+    # ---------------------------------------------------
+    # 回调
+    # ---------------------------------------------------
+    async def _notify(self, job: Job):
+        body = JobResponse.model_validate(job).model_dump_json(by_alias=True).encode("utf-8")
+        signature = hmac.new(settings.API_SECRET_KEY.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers = {"Content-Type": "application/json", "X-Zentrio-Signature": f"sha256={signature}"}
+
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(timeout=settings.JOB_WEBHOOK_TIMEOUT)
+        try:
+            async for attempt in AsyncRetrying(
+                    stop=stop_after_attempt(3),
+                    wait=wait_random_exponential(multiplier=1, max=10),
+                    reraise=True,
+            ):
+                with attempt:
+                    response = await self._webhook_client.post(job.callback_url, content=body, headers=headers)
+                    response.raise_for_status()
+        except Exception as e:
+            # 回调失败不影响任务结果，调用方仍可轮询 /jobs/{id}
+            logger.warning(f"[Job] Callback for {job.id} to {job.callback_url} failed: {e}")
+
+
+def _build_queue() -> JobQueue:
+    if settings.JOB_BACKEND == "postgres":
+        return PostgresJobQueue(poll_interval=settings.JOB_POLL_INTERVAL, lease_seconds=settings.JOB_LEASE_SECONDS)
+    return MemoryJobQueue(poll_interval=settings.JOB_POLL_INTERVAL)
+
+
+job_service = JobService(_build_queue(), pools=settings.JOB_POOLS)
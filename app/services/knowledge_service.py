@@ -1,12 +1,16 @@
+import asyncio
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence
 
-from app.infra.llm import get_embedding_vector
+from app.core.config import settings
+from app.infra.llm import get_embedding_vector, get_embedding_vectors, Lane
 from app.repositories.knowledge_repo import knowledge_repo
 from app.schemas.knowledge import (
     KnowledgeSyncRequest,
     KnowledgeResponse,
-    KnowledgeSearchResult
+    KnowledgeSearchResult,
+    KnowledgeBatchSearchRequest,
+    KnowledgeBatchSearchResult,
 )
 
 logger = logging.getLogger(__name__)
@@ -36,26 +40,35 @@ class KnowledgeService:
             text_to_embed = f"知识点名称: {req.name}\n详细内容: {req.content}"
 
             # --- 步骤 2: 获取向量 (耗时 I/O) ---
-            embedding_vector = await get_embedding_vector(text_to_embed)
+            # 同步属于批量写入，走低优先级通道，不与在线诊断抢名额
+            embedding_vector = await get_embedding_vector(text_to_embed, lane=Lane.BULK)
 
             if not embedding_vector:
                 raise ValueError("Failed to generate embedding vector")
 
             # --- 步骤 3: 数据库持久化 ---
             # 【关键修改】使用 self.repo 调用，而不是全局变量
-            saved_record = await self.repo.upsert(
+            # repo.upsert 是同步方法，放到线程池执行避免阻塞事件循环
+            await asyncio.to_thread(
+                self.repo.upsert,
                 kp_code=req.kp_code,
                 name=req.name,
                 subject_code=req.subject_code,
                 content=req.content,
                 embedding=embedding_vector,
-                metadata={"remark": req.sync_remark}
+                metadata={**req.metadata, "remark": req.sync_remark}
             )
 
             logger.info(f"[Sync] Successfully saved knowledge: {req.kp_code}")
 
             # --- 步骤 4: 转换为响应模型 ---
-            return KnowledgeResponse.model_validate(saved_record)
+            return KnowledgeResponse(
+                kp_code=req.kp_code,
+                name=req.name,
+                subject_code=req.subject_code,
+                content=req.content,
+                vector_dim=len(embedding_vector),
+            )
 
         except Exception as e:
             logger.error(f"[Sync] Error processing {req.kp_code}: {str(e)}", exc_info=True)
@@ -65,47 +78,102 @@ class KnowledgeService:
             self,
             query: str,
             subject_code: str = None,
-            top_k: int = 3
+            top_k: int = 3,
+            metadata_filter: Optional[Dict[str, Any]] = None,
     ) -> List[KnowledgeSearchResult]:
         """
         RAG 专用：根据问题搜索相关知识点
+        向量服务不可用 (熔断 / 超时 / 报错) 时退化为纯关键词检索
+        :param metadata_filter: 元数据过滤 (如年级 / 教材版本)，在数据库中与向量检索一起执行，不会丢失 top_k
         """
         try:
             # 1. 将用户的问题转化为向量
             query_vector = await get_embedding_vector(query)
-            if not query_vector:
-                return []
-
-            # 2. 向量搜索
-            # 【关键修改】使用 self.repo 调用
-            results = self.repo.search_similar(
-                embedding=query_vector,
-                subject_code=subject_code,
-                limit=top_k
-            )
 
-            final_results = []
+            if query_vector:
+                # 2. 向量搜索
+                # 【关键修改】使用 self.repo 调用
+                results = self.repo.search_similar(
+                    embedding=query_vector,
+                    subject_code=subject_code,
+                    limit=top_k,
+                    metadata_filter=metadata_filter,
+                )
+            else:
+                # 2'. 降级：关键词检索 (分数同样是越小越相关)
+                logger.warning(f"[Search] Embedding unavailable, falling back to lexical search for '{query}'")
+                results = self.repo.search_lexical(
+                    query=query,
+                    subject_code=subject_code,
+                    limit=top_k,
+                    metadata_filter=metadata_filter,
+                )
 
             # 3. 遍历、过滤并转换为响应模型
-            for row in results:
-                kp_obj = row.KnowledgeVector
-                score = row.score
-
-                # 阈值过滤 (L2距离越小越好)
-                if score < 0.5:
-                    item = KnowledgeSearchResult(
-                        kp_code=kp_obj.kp_code,
-                        content=kp_obj.content,
-                        score=score
-                    )
-                    final_results.append(item)
-
-            return final_results
+            return self._to_results(results)
 
         except Exception as e:
             logger.error(f"[Search] Error searching for '{query}': {str(e)}", exc_info=True)
             return []
 
+    async def search_related_knowledge_many(self, req: KnowledgeBatchSearchRequest) -> List[KnowledgeBatchSearchResult]:
+        """
+        批量 RAG 检索 (如多步作答的每一步各查一次)
+        所有问题一次 embedding 调用向量化，再用一条 SQL 完成全部向量检索
+        向量服务不可用时逐个退化为关键词检索
+        """
+        if len(req.queries) > settings.KNOWLEDGE_SEARCH_MAX_QUERIES:
+            raise ValueError(f"too many queries: {len(req.queries)} > {settings.KNOWLEDGE_SEARCH_MAX_QUERIES}")
+
+        # 空白问题不参与向量化，结果为空
+        positions = [i for i, query in enumerate(req.queries) if query and query.strip()]
+        per_query: List[Sequence] = [[] for _ in req.queries]
+
+        vectors = await get_embedding_vectors([req.queries[i] for i in positions])
+        if vectors:
+            embeddings: List[List[float]] = [[] for _ in req.queries]
+            for i, vector in zip(positions, vectors):
+                embeddings[i] = vector
+            per_query = await asyncio.to_thread(
+                self.repo.search_similar_many,
+                embeddings,
+                req.top_k,
+                subject_code=req.subject_code,
+                metadata_filter=req.metadata_filter,
+            )
+        elif positions:
+            logger.warning(f"[Search] Embedding unavailable, falling back to lexical search for {len(positions)} queries")
+            for i in positions:
+                per_query[i] = await asyncio.to_thread(
+                    self.repo.search_lexical,
+                    query=req.queries[i],
+                    subject_code=req.subject_code,
+                    limit=req.top_k,
+                    metadata_filter=req.metadata_filter,
+                )
+
+        return [
+            KnowledgeBatchSearchResult(query=query, results=self._to_results(rows))
+            for query, rows in zip(req.queries, per_query)
+        ]
+
+    @staticmethod
+    def _to_results(rows: Sequence) -> List[KnowledgeSearchResult]:
+        final_results = []
+        for row in rows:
+            kp_obj = row.KnowledgeVector
+            score = row.score
+
+            # 阈值过滤 (L2距离越小越好)
+            if score < 0.5:
+                item = KnowledgeSearchResult(
+                    kp_code=kp_obj.kp_code,
+                    content=kp_obj.content,
+                    score=score
+                )
+                final_results.append(item)
+        return final_results
+
 
 # 4. 实例化单例对象 (供 Controller 导入使用)
 knowledge_service = KnowledgeService()
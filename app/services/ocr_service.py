@@ -1,14 +1,26 @@
+import logging
+
 from fastapi import UploadFile
 
+from app.core import deadline
+from app.core.config import settings
+from app.core.metrics import DEADLINE_DEGRADATIONS, Stage, track_stage
+from app.core.tracing import tracer, traced
 from app.infra.ocr.provider import get_ocr_client
 from app.infra.ocr.utils import preprocess_image_bytes, read_file_bytes
 from app.schemas.ocr import OCRResponse, OCRRequest
 
+logger = logging.getLogger(__name__)
+
 
 class OCRService:
-    def __init__(self):
-        self.ocr_client = get_ocr_client()
+    @property
+    def ocr_client(self):
+        # 延迟到首次使用 (或 worker 启动预热) 时再加载模型：
+        # ONNX Runtime 的线程池不能跨 fork，不能在 gunicorn master 中预加载
+        return get_ocr_client()
 
+    @traced("ocr.recognize")
     async def recognize(
             self,
             file: UploadFile | None = None,
@@ -25,18 +37,34 @@ class OCRService:
         file_path = request.file_path if request else None
 
         # 2. 读取图片字节流 (调用 utils 中的通用读取逻辑)
-        image_bytes = await read_file_bytes(
-            file=file,
-            image_base64=img_base64,
-            file_url=file_url,
-            file_path=file_path
-        )
+        with track_stage(Stage.IMAGE_READ):
+            image_bytes = await read_file_bytes(
+                file=file,
+                image_base64=img_base64,
+                file_url=file_url,
+                file_path=file_path
+            )
+
+        return self.recognize_bytes(image_bytes)
 
+    def recognize_bytes(self, image_bytes: bytes) -> OCRResponse:
+        """
+        识别已读取的图片字节 (CPU 密集的同步部分)
+        异步任务中通过 asyncio.to_thread 调用，避免阻塞事件循环
+        """
         # 3. 预处理 (转 BGR + 放大 + 加白边)
-        img = preprocess_image_bytes(image_bytes)
+        # 剩余时间不足时跳过小图放大：识别质量略降，但检测 / 识别耗时明显减少
+        deadline.check(Stage.PREPROCESS)
+        upscale = not deadline.below(settings.DEADLINE_OCR_MIN_UPSCALE_SECONDS)
+        if not upscale:
+            DEADLINE_DEGRADATIONS.labels(stage=Stage.PREPROCESS, action="skip_upscale").inc()
+            logger.info(f"Skipping OCR upscale: {deadline.remaining():.2f}s left")
+        img = preprocess_image_bytes(image_bytes, upscale=upscale)
 
         # 4. 执行识别 (返回已排序的文字列表)
-        text_list = self.ocr_client.recognize(img)
+        deadline.check("ocr.engine")
+        with tracer.start_span("ocr.engine"):
+            text_list = self.ocr_client.recognize(img)
 
         # 5. 拼接完整文本
         # 建议使用换行符 "\n" 而不是空格，保留题目和答案的段落结构
@@ -0,0 +1,22 @@
+"""
+诊断前置规则预检
+能被规则确定判对的作答直接返回，不再调用 LLM
+"""
+
+from app.core.config import settings
+from .base import PreChecker, PreCheckContext, PreCheckStage
+from .math_equation import MathEquationChecker
+
+# 默认预检流水线 (按顺序执行，新增学科规则在此注册)
+precheck_stage = PreCheckStage(
+    checkers=[MathEquationChecker()],
+    enabled=settings.PRECHECK_ENABLED,
+)
+
+__all__ = [
+    "PreChecker",
+    "PreCheckContext",
+    "PreCheckStage",
+    "MathEquationChecker",
+    "precheck_stage",
+]
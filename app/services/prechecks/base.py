@@ -0,0 +1,77 @@
+# app/services/prechecks/base.py
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.schemas.diagnosis import DiagnosisResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreCheckContext:
+    """预检所需的上下文 (一次诊断请求)"""
+    kp_code: str
+    question: str
+    student_answer: str
+    subject_code: str = "default"
+    reference_answer: Optional[str] = None
+    metadata: Dict = field(default_factory=dict)
+
+
+class PreChecker:
+    """
+    规则预检器基类
+    - applies: 是否适用于当前请求 (按学科 / 知识点判断)
+    - check: 能确定判定时返回 DiagnosisResponse，不确定时返回 None 交给 LLM
+    约定：只在“确定正确”时短路，任何拿不准的情况都必须返回 None
+    """
+    name: str = "base"
+
+    def applies(self, ctx: PreCheckContext) -> bool:
+        raise NotImplementedError
+
+    def check(self, ctx: PreCheckContext) -> Optional[DiagnosisResponse]:
+        raise NotImplementedError
+
+
+class PreCheckStage:
+    """按注册顺序依次执行预检器，第一个给出确定结论的预检器胜出"""
+
+    def __init__(self, checkers: Optional[List[PreChecker]] = None, enabled: bool = True):
+        self.checkers: List[PreChecker] = list(checkers or [])
+        self.enabled = enabled
+        self._total = 0
+        self._short_circuited: Dict[str, int] = {}
+
+    def register(self, checker: PreChecker):
+        self.checkers.append(checker)
+
+    def run(self, ctx: PreCheckContext) -> Optional[DiagnosisResponse]:
+        if not self.enabled:
+            return None
+
+        self._total += 1
+        for checker in self.checkers:
+            try:
+                if not checker.applies(ctx):
+                    continue
+                result = checker.check(ctx)
+            except Exception as e:
+                # 预检器异常不能影响主流程，退回 LLM
+                logger.warning(f"Pre-checker {checker.name} failed for KP={ctx.kp_code}: {e}")
+                continue
+            if result is not None:
+                self._short_circuited[checker.name] = self._short_circuited.get(checker.name, 0) + 1
+                return result
+        return None
+
+    def stats(self) -> Dict:
+        hits = sum(self._short_circuited.values())
+        return {
+            "enabled": self.enabled,
+            "total": self._total,
+            "short_circuited": hits,
+            "short_circuit_ratio": round(hits / self._total, 4) if self._total else 0.0,
+            "by_checker": dict(self._short_circuited),
+        }
@@ -0,0 +1,259 @@
+# app/services/prechecks/math_equation.py
+import ast
+import re
+import unicodedata
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+from app.schemas.diagnosis import DiagnosisResponse
+from .base import PreChecker, PreCheckContext
+
+MATH_SUBJECTS = {"数学", "math", "MATH"}
+
+# 常见书写符号 -> Python 运算符
+_SYMBOL_MAP = {
+    "×": "*", "·": "*", "÷": "/", "−": "-", "—": "-", "^": "**",
+}
+# 数字/右括号/字母 与 字母/左括号/数字 之间的隐式乘法: 3x, 3(x+1), (x+1)(x-1), 2x(x)
+_IMPLICIT_MUL = [
+    (re.compile(r"(\d)\s*([a-zA-Z(])"), r"\1*\2"),
+    (re.compile(r"\)\s*([a-zA-Z\d(])"), r")*\1"),
+    (re.compile(r"([a-zA-Z])\s*\("), r"\1*("),
+    (re.compile(r"([a-zA-Z])\s*([a-zA-Z])"), r"\1*\2"),
+]
+# 只含数学字符的片段 (用于从中文句子里截取方程)
+_EQUATION_RE = re.compile(r"[0-9a-zA-Z\s.+\-*/()=^×÷·−]+")
+# 题干中 “求 …” 的目标表达式 (如 “求 x 的值” / “求 x+3 的值”)；“求解” 不算
+_TARGET_RE = re.compile(r"求(?!解)\s*([0-9a-zA-Z\s.+\-*/()^×÷·−]+)")
+# 没有 “求 …” 时，题干要求的就是方程的解
+_SOLVE_KEYWORDS = ("解方程", "的解", "求解")
+_MAX_EXPONENT = 8
+# 幂运算结果的分子 / 分母位数上限，避免 ((2^8)^8)^8... 这类输入算出超大整数
+_MAX_POWER_BITS = 256
+# 单个表达式的长度上限，过长 / 嵌套过深的输入直接交给 LLM
+_MAX_EXPR_LEN = 200
+
+
+class _Unsupported(Exception):
+    """表达式超出支持范围"""
+
+
+# 解析 / 求值过程中视为 “无法判断” 的异常
+_EVAL_ERRORS = (_Unsupported, ValueError, OverflowError, ZeroDivisionError, RecursionError)
+
+
+def _normalize(expr: str) -> str:
+    expr = unicodedata.normalize("NFKC", expr)
+    for src, dst in _SYMBOL_MAP.items():
+        expr = expr.replace(src, dst)
+    for pattern, repl in _IMPLICIT_MUL:
+        # 连续字母 (xy) 需要多次替换才能全部补上乘号
+        prev = None
+        while prev != expr:
+            prev, expr = expr, pattern.sub(repl, expr)
+    return expr.strip()
+
+
+def _compile(expr: str) -> ast.AST:
+    if len(expr) > _MAX_EXPR_LEN:
+        raise _Unsupported("expression too long")
+    try:
+        return ast.parse(_normalize(expr), mode="eval").body
+    except (SyntaxError, RecursionError, MemoryError):
+        raise _Unsupported(expr)
+
+
+def _variables(node: ast.AST) -> set:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def _evaluate(node: ast.AST, env: Dict[str, Fraction]) -> Fraction:
+    """只支持四则运算与小整数次幂的安全求值，使用 Fraction 避免浮点误差"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return Fraction(str(node.value))
+    if isinstance(node, ast.Name):
+        if node.id not in env:
+            raise _Unsupported(node.id)
+        return env[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _evaluate(node.operand, env)
+        return value if isinstance(node.op, ast.UAdd) else -value
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(node.left, env)
+        right = _evaluate(node.right, env)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        if isinstance(node.op, ast.Div):
+            if right == 0:
+                raise _Unsupported("division by zero")
+            return left / right
+        if isinstance(node.op, ast.Pow):
+            if right.denominator != 1 or abs(right) > _MAX_EXPONENT:
+                raise _Unsupported("exponent")
+            if left == 0 and right < 0:
+                raise _Unsupported("division by zero")
+            bits = max(left.numerator.bit_length(), left.denominator.bit_length())
+            if bits * abs(int(right)) > _MAX_POWER_BITS:
+                raise _Unsupported("power too large")
+            return left ** int(right)
+    raise _Unsupported(ast.dump(node))
+
+
+class Equation:
+    """单个等式 lhs = rhs"""
+
+    def __init__(self, text: str):
+        parts = text.split("=")
+        if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+            raise _Unsupported(text)
+        self.text = text.strip()
+        self.lhs = _compile(parts[0])
+        self.rhs = _compile(parts[1])
+        self.variables = _variables(self.lhs) | _variables(self.rhs)
+
+    def residual(self, env: Dict[str, Fraction]) -> Fraction:
+        return _evaluate(self.lhs, env) - _evaluate(self.rhs, env)
+
+    def holds(self, env: Dict[str, Fraction]) -> bool:
+        return self.residual(env) == 0
+
+    def unique_linear_root(self, var: str) -> Optional[Fraction]:
+        """一元一次方程返回唯一解；非线性或无唯一解返回 None"""
+        if self.variables != {var}:
+            return None
+        f0, f1, f2, f3 = (self.residual({var: Fraction(v)}) for v in (0, 1, 2, 3))
+        slope = f1 - f0
+        # 线性函数的二阶差分为 0 (多取一个点排除巧合)
+        if slope == 0 or f2 - f1 != slope or f3 - f2 != slope:
+            return None
+        return -f0 / slope
+
+    def as_assignment(self) -> Optional[Tuple[str, Fraction]]:
+        """形如 x = 6 / 6 = x 的最终结果"""
+        for name_side, value_side in ((self.lhs, self.rhs), (self.rhs, self.lhs)):
+            if isinstance(name_side, ast.Name) and not _variables(value_side):
+                return name_side.id, _evaluate(value_side, {})
+        return None
+
+
+def _split_steps(text: str) -> List[str]:
+    text = text.replace("FORMULA:", "")
+    return [s.strip() for s in re.split(r"[\n;；,，。]", text) if s.strip()]
+
+
+def _equation_text(text: str) -> Optional[str]:
+    """从中文句子 (如 “解方程：3(x+2) = 12” / “解得 x = 6”) 中截取唯一的等式片段"""
+    candidates = [m.group(0) for m in _EQUATION_RE.finditer(unicodedata.normalize("NFKC", text)) if "=" in m.group(0)]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def _extract_equation(text: str) -> Optional[Equation]:
+    """题干中的一元方程"""
+    fragment = _equation_text(text)
+    if fragment is None:
+        return None
+    try:
+        equation = Equation(fragment)
+    except _EVAL_ERRORS:
+        return None
+    return equation if len(equation.variables) == 1 else None
+
+
+def _asks_for(question: str, var: str) -> bool:
+    """题干要求的是否就是变量 var 本身 (而不是 x+3 之类的其他表达式)"""
+    text = unicodedata.normalize("NFKC", question)
+    targets = [t.strip() for t in _TARGET_RE.findall(text) if t.strip()]
+    if targets:
+        return all(_normalize(t) == var for t in targets)
+    return any(keyword in text for keyword in _SOLVE_KEYWORDS)
+
+
+def _format(value: Fraction) -> str:
+    return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+class MathEquationChecker(PreChecker):
+    """
+    一元方程规则预检
+    1. 从作答中解析出解题步骤 (含 “=” 的行) 与最终结果 (x = 值)
+    2. 有参考答案时与参考答案比对；否则代入题干方程验证，且题干必须是有唯一解的一元一次方程
+       参考答案只是数值、或没有参考答案时，题干还必须是求该变量本身 (“求 x+3 的值” 不能只看 x)
+    3. 所有中间步骤在该解下都必须成立 (步骤与结果自洽)
+    任一环节无法解析 / 不成立都返回 None，交给 LLM 做细致诊断
+    """
+    name = "math_equation"
+
+    def applies(self, ctx: PreCheckContext) -> bool:
+        return ctx.subject_code in MATH_SUBJECTS or ctx.kp_code.upper().startswith("KP_MATH")
+
+    def check(self, ctx: PreCheckContext) -> Optional[DiagnosisResponse]:
+        steps = []
+        for line in _split_steps(ctx.student_answer):
+            if "=" not in line:
+                # 文字说明 (如 “设购买铅笔 x 支”) 不参与校验
+                continue
+            fragment = _equation_text(line)
+            if fragment is None:
+                # 一行里有多个等式或无法截取，说明写法超出规则范围
+                return None
+            try:
+                steps.append(Equation(fragment))
+            except _EVAL_ERRORS:
+                return None
+        if not steps:
+            return None
+
+        try:
+            final = steps[-1].as_assignment()
+        except _EVAL_ERRORS:
+            return None
+        if final is None:
+            return None
+        var, value = final
+
+        if not self._verify_answer(ctx, var, value):
+            return None
+
+        env = {var: value}
+        try:
+            if not all(step.variables <= {var} and step.holds(env) for step in steps):
+                return None
+        except _EVAL_ERRORS:
+            return None
+
+        return DiagnosisResponse(
+            is_correct=True,
+            error_type=None,
+            analysis=(
+                f"回答正确。最终结果 {var} = {_format(value)}，经代入检验成立，"
+                f"共 {len(steps)} 步演算与结果前后一致。"
+            ),
+            suggested_actions=["养成解完方程后代入原方程检验的习惯", "尝试用另一种方法求解并比较步骤"],
+        )
+
+    @staticmethod
+    def _verify_answer(ctx: PreCheckContext, var: str, value: Fraction) -> bool:
+        if ctx.reference_answer:
+            ref = ctx.reference_answer.strip()
+            try:
+                if "=" in ref:
+                    assignment = Equation(ref).as_assignment()
+                    return assignment is not None and assignment == (var, value)
+                return _asks_for(ctx.question, var) and _evaluate(_compile(ref), {}) == value
+            except _EVAL_ERRORS:
+                return False
+
+        if not _asks_for(ctx.question, var):
+            return False
+        equation = _extract_equation(ctx.question)
+        if equation is None or equation.variables != {var}:
+            return False
+        try:
+            root = equation.unique_linear_root(var)
+        except _EVAL_ERRORS:
+            return False
+        return root is not None and root == value
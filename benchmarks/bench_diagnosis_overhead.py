@@ -0,0 +1,102 @@
+# benchmarks/bench_diagnosis_overhead.py
+"""
+诊断链路单请求 CPU 开销 (不含网络)
+
+    python -m benchmarks.bench_diagnosis_overhead --iterations 2000
+
+对比:
+- legacy  : 每次请求重新拼链 + 调用 get_format_instructions() 序列化完整 JSON Schema
+- compiled: 按学科缓存的已编译链，system 消息预渲染，精简格式说明
+LLM 用本地 Fake 模型替代，只衡量 Prompt 构造 / 链调度 / 输出解析的开销；同时输出两种 prompt 的 token 估算
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+for key, value in {
+    "ZHIPU_API_KEY": "mock",
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from app.infra.llm import estimate_tokens  # noqa: E402
+from app.models import SubjectConfig  # noqa: E402
+from app.services.diagnosis_service import diagnosis_service  # noqa: E402
+
+RESPONSE = json.dumps({
+    "is_correct": False,
+    "error_type": "移项不变号",
+    "analysis": "第二步移项时 +5 没有变号。",
+    "suggested_actions": ["复习移项法则"],
+}, ensure_ascii=False)
+
+CONFIG = SubjectConfig(
+    subject_name="数学",
+    role_name="资深数学特级教师",
+    style_desc="严谨、逻辑清晰、步骤导向",
+    focus_points="公式应用、运算过程、逻辑推导",
+)
+
+REQUEST = {
+    "content": "规范：将含未知数的项移到左边，常数项移到右边，跨越等号必须变号。",
+    "question": "解方程 3x + 5 = 23",
+    "student_answer": "3x = 23 + 5\n3x = 28\nx = 28/3",
+}
+
+
+async def bench(label: str, make_chain, variables, iterations: int):
+    # 预热
+    for _ in range(20):
+        await make_chain().ainvoke(variables())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await make_chain().ainvoke(variables())
+    per_request = (time.perf_counter() - start) / iterations
+    print(f"[{label:8}] {per_request * 1e6:8.1f} µs/request")
+    return per_request
+
+
+def prompt_tokens(prompt, variables) -> int:
+    return sum(estimate_tokens(str(m.content)) for m in prompt.format_messages(**variables))
+
+
+async def main(iterations: int):
+    service = diagnosis_service
+    template = service.prompts.select().template
+    fake_llm = FakeListChatModel(responses=[RESPONSE])
+
+    legacy_vars = lambda: {  # noqa: E731
+        "role_name": CONFIG.role_name,
+        "style_desc": CONFIG.style_desc,
+        "focus_points": CONFIG.focus_points,
+        **REQUEST,
+        "format_instructions": service.parser.get_format_instructions(),
+    }
+    legacy = await bench(
+        "legacy",
+        lambda: template | fake_llm | service.parser,
+        legacy_vars,
+        iterations,
+    )
+
+    compiled_prompt = service._compile_prompt(template, CONFIG)
+    compiled_chain = compiled_prompt | fake_llm | service.parser
+    compiled = await bench("compiled", lambda: compiled_chain, lambda: dict(REQUEST), iterations)
+
+    print(f"speedup: {legacy / compiled:.2f}x")
+    print(
+        f"prompt tokens (est.): legacy={prompt_tokens(template, legacy_vars())} "
+        f"compiled={prompt_tokens(compiled_prompt, REQUEST)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnosis per-request overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,153 @@
+# benchmarks/bench_knowledge_partitions.py
+"""
+按学科分区 vs 单表的学科过滤向量检索对比 (需要可用的 PostgreSQL + pgvector >= 0.8)
+
+    python -m benchmarks.bench_knowledge_partitions --subjects 8 --rows-per-subject 5000 --queries 200
+
+生成多学科合成数据，分别写入两张临时表：
+- bench_kv_flat: 单表 + 全量 HNSW 索引，学科过滤依赖 hnsw.iterative_scan 补足 k 条
+- bench_kv_part: 按 subject_code LIST 分区，每个分区一个 HNSW 索引 (与 edu_knowledge_vector 相同的结构)
+对比学科过滤检索的 QPS / recall@k，并打印执行计划确认只扫描了一个分区。结束后删除临时表，不触碰业务表。
+"""
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from benchmarks.bench_vector_index import make_data, recall_at_k
+
+
+def subject_of(i: int, subjects: int) -> str:
+    return f"subject_{i % subjects:02d}"
+
+
+def exact_truth(data, queries, query_subjects, subjects: int, k: int):
+    """numpy 精确检索 (同学科内) 作为召回率基准"""
+    labels = np.array([i % subjects for i in range(len(data))])
+    truth = []
+    for q, subject in zip(queries, query_subjects):
+        idx = np.flatnonzero(labels == int(subject.rsplit("_", 1)[1]))
+        dist = np.linalg.norm(data[idx] - q, axis=1)
+        top = idx[np.argsort(dist)[:k]]
+        truth.append([(f"KP_{i}", 0.0) for i in top])
+    return truth
+
+
+def create_tables(conn, dim: int, subjects: int):
+    conn.execute(text("DROP TABLE IF EXISTS bench_kv_flat, bench_kv_part"))
+    conn.execute(text(
+        f"CREATE TABLE bench_kv_flat (kp_code text, subject_code text NOT NULL, embedding vector({dim}), "
+        f"PRIMARY KEY (kp_code, subject_code))"
+    ))
+    conn.execute(text(
+        f"CREATE TABLE bench_kv_part (kp_code text, subject_code text NOT NULL, embedding vector({dim}), "
+        f"PRIMARY KEY (kp_code, subject_code)) PARTITION BY LIST (subject_code)"
+    ))
+    for s in range(subjects):
+        subject = subject_of(s, subjects)
+        conn.execute(text(
+            f"CREATE TABLE bench_kv_part_{s:02d} PARTITION OF bench_kv_part FOR VALUES IN ('{subject}')"
+        ))
+
+
+def load(conn, table: str, data, subjects: int, batch: int = 1000) -> float:
+    t0 = time.perf_counter()
+    stmt = text(f"INSERT INTO {table} VALUES (:kp_code, :subject_code, CAST(:embedding AS vector))")
+    for start in range(0, len(data), batch):
+        conn.execute(stmt, [
+            {"kp_code": f"KP_{i}", "subject_code": subject_of(i, subjects), "embedding": str(data[i].tolist())}
+            for i in range(start, min(start + batch, len(data)))
+        ])
+    return time.perf_counter() - t0
+
+
+def build_index(conn, table: str) -> float:
+    t0 = time.perf_counter()
+    # 分区表上建索引会在每个分区各建一份
+    conn.execute(text(f"CREATE INDEX ON {table} USING hnsw (embedding vector_l2_ops)"))
+    conn.execute(text(f"ANALYZE {table}"))
+    return time.perf_counter() - t0
+
+
+def bench_table(engine, table: str, queries, query_subjects, k: int, ef_search: int, iterative: bool):
+    stmt = text(
+        f"SELECT kp_code, embedding <-> CAST(:q AS vector) AS score FROM {table} "
+        f"WHERE subject_code = :subject ORDER BY score LIMIT :k"
+    )
+    results = []
+    with engine.connect() as conn:
+        conn.execute(text(f"SET hnsw.ef_search = {ef_search}"))
+        conn.execute(text(f"SET hnsw.iterative_scan = {'relaxed_order' if iterative else 'off'}"))
+
+        plan = conn.execute(
+            text(f"EXPLAIN {stmt.text}"),
+            {"q": str(queries[0].tolist()), "subject": query_subjects[0], "k": k},
+        ).scalars().all()
+
+        start = time.perf_counter()
+        for q, subject in zip(queries, query_subjects):
+            rows = conn.execute(stmt, {"q": str(q.tolist()), "subject": subject, "k": k}).all()
+            results.append([(row.kp_code, float(row.score)) for row in rows])
+        qps = len(queries) / (time.perf_counter() - start)
+    return results, qps, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitioned vs flat knowledge table benchmark")
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--rows-per-subject", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--dsn", default=None, help="PostgreSQL DSN，默认读取 Settings.DATABASE_URL")
+    parser.add_argument("--keep", action="store_true", help="结束后保留临时表 (便于手动 EXPLAIN)")
+    args = parser.parse_args()
+
+    dsn = args.dsn
+    if dsn is None:
+        from app.core.config import settings
+        dsn = settings.DATABASE_URL
+
+    rows = args.subjects * args.rows_per_subject
+    data = make_data(rows, args.dim)
+    queries = make_data(args.queries, args.dim, seed=7)
+    query_subjects = [subject_of(i, args.subjects) for i in range(args.queries)]
+    truth = exact_truth(data, queries, query_subjects, args.subjects, args.k)
+    print(f"subjects={args.subjects} rows={rows} dim={args.dim} queries={args.queries} k={args.k}")
+
+    engine = create_engine(dsn)
+    try:
+        with engine.begin() as conn:
+            create_tables(conn, args.dim, args.subjects)
+            for table in ("bench_kv_flat", "bench_kv_part"):
+                print(f"[{table}] insert {load(conn, table, data, args.subjects):.2f}s")
+        for table in ("bench_kv_flat", "bench_kv_part"):
+            with engine.begin() as conn:
+                print(f"[{table}] hnsw build {build_index(conn, table):.2f}s")
+
+        cases = [
+            ("flat, iterative off", "bench_kv_flat", False),
+            ("flat, iterative on ", "bench_kv_flat", True),
+            ("partitioned        ", "bench_kv_part", False),
+        ]
+        for label, table, iterative in cases:
+            approx, qps, plan = bench_table(engine, table, queries, query_subjects, args.k, args.ef_search, iterative)
+            full = sum(len(r) == args.k for r in approx) / len(approx)
+            print(
+                f"[{label}] QPS={qps:8,.0f}  recall@{args.k}={recall_at_k(truth, approx):.3f}  "
+                f"full-k={full:.0%}"
+            )
+            if table == "bench_kv_part":
+                scanned = [line.strip() for line in plan if "Scan" in line]
+                print("    plan: " + " | ".join(scanned))
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text("DROP TABLE IF EXISTS bench_kv_flat, bench_kv_part"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# benchmarks/bench_ocr_utils.py
+"""
+OCR 前后处理热点函数微基准 (不含模型推理)
+
+    python -m benchmarks.bench_ocr_utils                       # 运行并与基线比较
+    python -m benchmarks.bench_ocr_utils --save-baseline       # 记录 / 更新基线
+    python -m benchmarks.bench_ocr_utils --max-regression 0.15 --filter sort
+
+覆盖:
+- preprocess_image_bytes : 小截图 / 手机照片 / A4 300dpi 扫描件
+- sort_ocr_results / extract_text_from_ocr_results : 50 / 500 / 2000 个文本框的整页结果
+
+每个用例取多轮中位数；与 benchmarks/baselines/ocr_utils.json 比较，任一用例慢于基线超过阈值时以非 0 退出，
+可直接放进 CI。基线与机器相关，换机器后需要重新 --save-baseline。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+for key, value in {
+    "ZHIPU_API_KEY": "mock",
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.infra.ocr.utils import (  # noqa: E402
+    extract_text_from_ocr_results,
+    preprocess_image_bytes,
+    sort_ocr_results,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "ocr_utils.json")
+
+
+# ---------------------------------------------------
+# 合成输入
+# ---------------------------------------------------
+def synthetic_image(width: int, height: int, fmt: str, seed: int = 0) -> bytes:
+    """白底 + 若干深色文字行色块 + 轻微噪声，近似真实答题卡的压缩率"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(235, 256, size=(height, width, 3), dtype=np.uint8)
+    img = Image.fromarray(noise, "RGB")
+    draw = ImageDraw.Draw(img)
+    line_height = max(12, height // 40)
+    for y in range(line_height, height - line_height, line_height * 2):
+        x = line_height
+        while x < width - line_height * 4:
+            w = int(rng.integers(line_height, line_height * 4))
+            draw.rectangle([x, y, x + w, y + line_height], fill=(30, 30, 30))
+            x += w + line_height // 2
+    buf = BytesIO()
+    img.save(buf, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def synthetic_ocr_results(boxes: int, seed: int = 0) -> List:
+    """按行排布的 RapidOCR 结果 [[box, text, score], ...]，y 坐标带抖动且整体打乱顺序"""
+    rng = random.Random(seed)
+    per_line = 8
+    results = []
+    for i in range(boxes):
+        row, col = divmod(i, per_line)
+        x1 = 40 + col * 150 + rng.randint(-5, 5)
+        y1 = 60 + row * 45 + rng.randint(-4, 4)
+        x2, y2 = x1 + 120, y1 + 32
+        box = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        results.append([box, f"文本{i}", 0.9])
+    rng.shuffle(results)
+    return results
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    images = {
+        # 小截图 (需要放大到短边 960)
+        "small_crop_320x96_png": synthetic_image(320, 96, "PNG", seed=1),
+        # 手机拍照
+        "photo_1280x960_jpeg": synthetic_image(1280, 960, "JPEG", seed=2),
+        # A4 300dpi 扫描件
+        "a4_300dpi_2480x3508_jpeg": synthetic_image(2480, 3508, "JPEG", seed=3),
+        "a4_300dpi_2480x3508_png": synthetic_image(2480, 3508, "PNG", seed=4),
+    }
+    cases = [(f"preprocess[{name}]", (lambda data=data: preprocess_image_bytes(data))) for name, data in images.items()]
+
+    for n in (50, 500, 2000):
+        results = synthetic_ocr_results(n, seed=n)
+        cases.append((f"sort[{n}_boxes]", lambda results=results: sort_ocr_results(results)))
+        cases.append((f"extract[{n}_boxes]", lambda results=results: extract_text_from_ocr_results(results)))
+    return cases
+
+
+# ---------------------------------------------------
+# 计时
+# ---------------------------------------------------
+def measure(fn: Callable[[], object], rounds: int, min_round_time: float) -> Dict:
+    # 预热并估算每轮需要的调用次数，使单轮耗时不低于 min_round_time
+    start = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - start, 1e-7)
+    loops = max(1, int(min_round_time / single))
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "stdev_ms": (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1000,
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "cases": {name: round(r["median_ms"], 4) for name, r in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"📄 基线已写入 {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR utils micro-benchmarks")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--filter", default="", help="only run cases containing this substring")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail when median is slower than baseline by more than this ratio")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline).get("cases", {})
+    results: Dict[str, Dict] = {}
+    regressions = []
+
+    print(f"{'case':40} {'median':>10} {'min':>10} {'stdev':>9} {'baseline':>10} {'delta':>8}")
+    for name, fn in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        r = measure(fn, args.rounds, args.min_round_time)
+        results[name] = r
+
+        base = baseline.get(name)
+        delta = (r["median_ms"] / base - 1) if base else None
+        if delta is not None and delta > args.max_regression:
+            regressions.append((name, delta))
+        print(
+            f"{name:40} {r['median_ms']:8.3f}ms {r['min_ms']:8.3f}ms {r['stdev_ms']:7.3f}ms "
+            f"{(f'{base:8.3f}ms' if base else '         -'):>10} "
+            f"{(f'{delta:+.1%}' if delta is not None else '-'):>8}"
+        )
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        return
+
+    if regressions:
+        for name, delta in regressions:
+            print(f"❌ {name} regressed {delta:+.1%} (threshold {args.max_regression:.0%})")
+        sys.exit(1)
+    if baseline:
+        print(f"✅ no regression beyond {args.max_regression:.0%}")
+    else:
+        print("ℹ️ no baseline found, run with --save-baseline to record one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_singleflight.py
+"""
+请求合并验证：N 个相同的并发诊断 / 向量化请求只产生 1 次上游调用
+
+    python -m benchmarks.bench_singleflight --concurrency 50
+
+对着本地 Mock 服务运行 (不需要网络)；诊断链路中的数据库访问用内存替身代替。
+"""
+import argparse
+import asyncio
+import os
+import time
+
+PORT = int(os.environ.get("MOCK_OPENAI_PORT", "18082"))
+os.environ["ZHIPU_API_BASE"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ.setdefault("ZHIPU_API_KEY", "mock")
+# 关闭规则预检：否则 “3x = 18, x = 6” 会被 MathEquationChecker 直接判对，不会走到上游调用
+os.environ["PRECHECK_ENABLED"] = "false"
+
+from benchmarks.mock_openai_server import MockConfig, serve_in_thread  # noqa: E402
+from app.infra.llm import get_embedding_vector, shutdown_http_client  # noqa: E402
+from app.models import SubjectConfig  # noqa: E402
+from app.services import diagnosis_service  # noqa: E402
+
+
+class _FakeKnowledgeRepo:
+    def get_content_with_metadata(self, kp_code):
+        return "规范：移项必须变号。", {"subject_code": "数学"}
+
+
+class _FakeSubjectRepo:
+    def get_config(self, subject_name):
+        return SubjectConfig(subject_name=subject_name, role_name="数学老师", style_desc="严谨", focus_points="运算")
+
+
+async def run(config: MockConfig, concurrency: int):
+    diagnosis_service.knowledge_repo = _FakeKnowledgeRepo()
+    diagnosis_service.subject_repo = _FakeSubjectRepo()
+
+    try:
+        start = time.perf_counter()
+        # 空白差异也应归一化为同一个键
+        answers = ["3x = 18\nx = 6", "3x = 18  x = 6", " 3x = 18\tx = 6 "]
+        results = await asyncio.gather(*(
+            diagnosis_service.diagnose("KP_MATH_EQUATION_TRANSFER", "解方程 3x + 5 = 23", answers[i % len(answers)])
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        assert all(r is results[0] for r in results)
+        assert config.counters["chat"] == 1, config.counters
+        print(f"✅ diagnosis: {concurrency} requests -> {config.counters['chat']} upstream call ({elapsed * 1000:.0f}ms)")
+
+        vectors = await asyncio.gather(*(get_embedding_vector("解方程-移项") for _ in range(concurrency)))
+        assert all(v == vectors[0] for v in vectors)
+        assert config.counters["embeddings"] == 1, config.counters
+        print(f"✅ embedding: {concurrency} requests -> {config.counters['embeddings']} upstream call")
+    finally:
+        await shutdown_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight coalescing check")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    config = MockConfig(latency_ms=args.latency_ms)
+    server = serve_in_thread(config, port=PORT)
+    try:
+        asyncio.run(run(config, args.concurrency))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_vector_index.py
+"""
+本地向量副本 vs PostgreSQL(pgvector) 检索 QPS 对比
+
+用法:
+    python -m benchmarks.bench_vector_index --rows 5000 --queries 500
+    python -m benchmarks.bench_vector_index --rows 50000 --pg   # 额外测 pgvector (需要可用的数据库)
+
+PG 模式会创建临时表 bench_knowledge_vector，结束后自动删除，不触碰业务表。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.infra.vector_index import LocalVectorIndex
+from app.infra.vector_index import local_index
+
+
+def make_data(rows: int, dim: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((rows, dim)).astype(np.float32)
+    # embedding-2 输出为单位向量，这里同样归一化
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def run_queries(search, queries, k: int):
+    start = time.perf_counter()
+    results = [search(q, k) for q in queries]
+    elapsed = time.perf_counter() - start
+    return results, len(queries) / elapsed
+
+
+def recall_at_k(truth, approx) -> float:
+    hit = 0
+    total = 0
+    for t, a in zip(truth, approx):
+        t_keys = {key for key, _ in t}
+        hit += len(t_keys & {key for key, _ in a})
+        total += len(t_keys)
+    return hit / total if total else 0.0
+
+
+def bench_local(data, queries, k: int):
+    keys = [f"KP_{i}" for i in range(len(data))]
+
+    exact = LocalVectorIndex(dim=data.shape[1], hnsw_threshold=len(data) + 1)
+    t0 = time.perf_counter()
+    exact.upsert_many(keys, data)
+    print(f"[exact] build {time.perf_counter() - t0:.2f}s")
+    truth, qps = run_queries(exact.search, queries, k)
+    print(f"[exact] QPS={qps:,.0f}")
+
+    if local_index.hnswlib is None:
+        print("[hnsw ] skipped: hnswlib not installed")
+        return truth
+
+    hnsw = LocalVectorIndex(dim=data.shape[1], hnsw_threshold=1)
+    t0 = time.perf_counter()
+    hnsw.upsert_many(keys, data)
+    print(f"[hnsw ] build {time.perf_counter() - t0:.2f}s")
+    approx, qps = run_queries(hnsw.search, queries, k)
+    print(f"[hnsw ] QPS={qps:,.0f}  recall@{k}={recall_at_k(truth, approx):.3f}")
+    return truth
+
+
+def bench_pg(data, queries, k: int, dsn: str, truth):
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(dsn)
+    dim = data.shape[1]
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_knowledge_vector"))
+        conn.execute(text(f"CREATE TABLE bench_knowledge_vector (kp_code text PRIMARY KEY, embedding vector({dim}))"))
+        t0 = time.perf_counter()
+        conn.execute(
+            text("INSERT INTO bench_knowledge_vector VALUES (:kp_code, CAST(:embedding AS vector))"),
+            [{"kp_code": f"KP_{i}", "embedding": str(vec.tolist())} for i, vec in enumerate(data)],
+        )
+        print(f"[pg   ] insert {time.perf_counter() - t0:.2f}s")
+
+    stmt = text(
+        "SELECT kp_code, embedding <-> CAST(:q AS vector) AS score "
+        "FROM bench_knowledge_vector ORDER BY score LIMIT :k"
+    )
+
+    try:
+        with engine.connect() as conn:
+            def search(q, limit):
+                rows = conn.execute(stmt, {"q": str(q.tolist()), "k": limit}).all()
+                return [(row.kp_code, float(row.score)) for row in rows]
+
+            approx, qps = run_queries(search, queries, k)
+            print(f"[pg   ] QPS={qps:,.0f}  recall@{k}={recall_at_k(truth, approx):.3f}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS bench_knowledge_vector"))
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vector replica QPS benchmark")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--pg", action="store_true", help="同时测试 pgvector 顺序扫描")
+    parser.add_argument("--dsn", default=None, help="PostgreSQL DSN，默认读取 Settings.DATABASE_URL")
+    args = parser.parse_args()
+
+    data = make_data(args.rows, args.dim)
+    queries = make_data(args.queries, args.dim, seed=7)
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+
+    truth = bench_local(data, queries, args.k)
+
+    if args.pg:
+        dsn = args.dsn
+        if dsn is None:
+            from app.core.config import settings
+            dsn = settings.DATABASE_URL
+        bench_pg(data, queries, args.k, dsn, truth)
+
+
+if __name__ == "__main__":
+    main()
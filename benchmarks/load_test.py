@@ -0,0 +1,315 @@
+# benchmarks/load_test.py
+"""
+全接口压测 (不需要网络)
+
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --latency-ms 300
+    python -m benchmarks.load_test --endpoints diagnosis,ocr --db postgres --json-out result.json
+
+- 智谱 API 用本地 Mock 服务替代 (mock_openai_server，可配置延迟 / 抖动)
+- 数据库默认用内存替身 (--db fake)；--db postgres 时连接 .env 中配置的 pgvector (如 docker-compose 启动的容器)
+- OCR 请求使用 StudentAnswerSheetGenerator 生成的答题卡图片
+- 输出每个接口的吞吐、p50/p95/p99 延迟、错误数与进程内存变化；--json-out 保存结果用于回归对比
+
+注意：压测客户端与被测服务在同一进程 (服务跑在后台线程)，内存数字包含客户端本身，适合做前后对比而不是绝对值。
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+MOCK_PORT = int(os.environ.get("MOCK_OPENAI_PORT", "18083"))
+os.environ["ZHIPU_API_BASE"] = f"http://127.0.0.1:{MOCK_PORT}/v1"
+for key, value in {
+    "ZHIPU_API_KEY": "mock",
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.mock_openai_server import MockConfig, serve_in_thread  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.models import SubjectConfig  # noqa: E402
+
+ENDPOINTS = ("diagnosis", "knowledge", "ocr")
+
+
+# ---------------------------------------------------
+# 数据库替身
+# ---------------------------------------------------
+class _FakeKnowledgeRepo:
+    def __init__(self):
+        self.rows: Dict[str, Dict] = {}
+
+    def get_content_with_metadata(self, kp_code):
+        row = self.rows.get(kp_code)
+        if row:
+            return row["content"], {"subject_code": row["subject_code"]}
+        return "规范：将含未知数的项移到左边，常数项移到右边，跨越等号必须变号。", {"subject_code": "数学"}
+
+    def upsert(self, kp_code, name, subject_code, content, embedding, metadata):
+        self.rows[kp_code] = {"content": content, "subject_code": subject_code}
+        return True
+
+
+class _FakeSubjectRepo:
+    def get_config(self, subject_name):
+        return SubjectConfig(
+            subject_name=subject_name,
+            role_name="资深数学特级教师",
+            style_desc="严谨、逻辑清晰、步骤导向",
+            focus_points="公式应用、运算过程、逻辑推导",
+        )
+
+
+def install_fake_db():
+    from app.services import diagnosis_service, knowledge_service
+
+    knowledge = _FakeKnowledgeRepo()
+    diagnosis_service.knowledge_repo = knowledge
+    diagnosis_service.subject_repo = _FakeSubjectRepo()
+    knowledge_service.repo = knowledge
+
+
+# ---------------------------------------------------
+# 请求构造
+# ---------------------------------------------------
+def diagnosis_request(i: int) -> Dict:
+    # 每个请求作答不同 (且都是错解)，避免被请求合并 / 规则预检吸收
+    wrong = i + 7 if i + 7 != 6 else 0
+    return {
+        "json": {
+            "kpCode": "KP_MATH_EQUATION_TRANSFER",
+            "question": "解方程 3x + 5 = 23",
+            "studentAnswer": f"3x = 23 + 5\n3x = {3 * wrong}\nx = {wrong}",
+        }
+    }
+
+
+def knowledge_request(i: int) -> Dict:
+    return {
+        "json": {
+            "kpCode": f"KP_BENCH_{i:06d}",
+            "name": f"压测知识点 {i}",
+            "subjectCode": "数学",
+            "content": f"压测内容 {i}：将含未知数的项移到左边，常数项移到右边。",
+        }
+    }
+
+
+def build_answer_sheets(count: int) -> List[bytes]:
+    from scripts.answer_sheet.generator import StudentAnswerSheetGenerator
+
+    output_dir = tempfile.mkdtemp(prefix="bench_sheets_")
+    generator = StudentAnswerSheetGenerator(output_dir=output_dir)
+    sheets = []
+    for n in range(count):
+        root = n + 2
+        path = generator.generate_answer_sheet(
+            question_no=n + 1,
+            score=5,
+            question_text=f"解方程 3x + {n + 1} = {3 * root + n + 1}",
+            student_steps=[
+                f"FORMULA:3x = {3 * root + n + 1} - {n + 1}",
+                f"FORMULA:3x = {3 * root}",
+                f"FORMULA:x = {root}",
+            ],
+            answer_text=f"x = {root}",
+            filename=f"sheet_{n}.png",
+        )
+        with open(path, "rb") as f:
+            sheets.append(f.read())
+    return sheets
+
+
+def ocr_request_factory(sheets: List[bytes]) -> Callable[[int], Dict]:
+    def make(i: int) -> Dict:
+        return {"files": {"file": (f"sheet_{i}.png", sheets[i % len(sheets)], "image/png")}}
+
+    return make
+
+
+# ---------------------------------------------------
+# 压测执行与统计
+# ---------------------------------------------------
+@dataclass
+class EndpointResult:
+    name: str
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed_s: float = 0.0
+    rss_before_mb: float = 0.0
+    rss_after_mb: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def summary(self) -> Dict:
+        total = len(self.latencies_ms) + self.errors
+        return {
+            "endpoint": self.name,
+            "requests": total,
+            "errors": self.errors,
+            "throughput_rps": round(total / self.elapsed_s, 2) if self.elapsed_s else 0.0,
+            "p50_ms": round(self.percentile(50), 1),
+            "p95_ms": round(self.percentile(95), 1),
+            "p99_ms": round(self.percentile(99), 1),
+            "rss_before_mb": round(self.rss_before_mb, 1),
+            "rss_after_mb": round(self.rss_after_mb, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def drive(
+        client: httpx.AsyncClient,
+        name: str,
+        path: str,
+        make_request: Callable[[int], Dict],
+        total: int,
+        concurrency: int,
+) -> EndpointResult:
+    result = EndpointResult(name=name, rss_before_mb=rss_mb())
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, **make_request(i))
+                body = response.json()
+                # 业务层错误 (code 非成功且不是“回答错误”) 计为失败
+                ok = response.status_code == 200 and body.get("data") is not None
+                if name == "diagnosis":
+                    ok = ok and body["data"].get("errorType") != "SystemError"
+            except Exception:
+                ok = False
+            if ok:
+                result.latencies_ms.append((time.perf_counter() - start) * 1000)
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_s = time.perf_counter() - start
+    result.rss_after_mb = rss_mb()
+    return result
+
+
+def serve_app(port: int) -> uvicorn.Server:
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(args) -> List[Dict]:
+    base_url = f"http://127.0.0.1:{args.app_port}{settings.API_PREFIX}"
+    headers = {"X-Internal-Token": settings.API_SECRET_KEY}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    plans = {
+        "diagnosis": ("/diagnosis/analyze", diagnosis_request),
+        "knowledge": ("/knowledge/sync", knowledge_request),
+    }
+    if "ocr" in args.endpoints:
+        print(f"🖼️ 生成 {args.sheets} 张答题卡...")
+        plans["ocr"] = ("/ocr/recognize", ocr_request_factory(build_answer_sheets(args.sheets)))
+
+    summaries = []
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=120) as client:
+        for name in args.endpoints:
+            path, make_request = plans[name]
+            # 预热 (建立连接、编译链、加载 OCR 模型)
+            await drive(client, name, path, make_request, min(args.concurrency, 10), args.concurrency)
+            result = await drive(client, name, path, make_request, args.requests, args.concurrency)
+            summary = result.summary()
+            summaries.append(summary)
+            print(
+                f"[{name:9}] {summary['requests']} req, {summary['errors']} err, "
+                f"{summary['throughput_rps']:8.1f} req/s | p50 {summary['p50_ms']:7.1f}ms "
+                f"p95 {summary['p95_ms']:7.1f}ms p99 {summary['p99_ms']:7.1f}ms | "
+                f"rss {summary['rss_before_mb']:.0f} -> {summary['rss_after_mb']:.0f}MB "
+                f"(peak {summary['peak_rss_mb']:.0f}MB)"
+            )
+    return summaries
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end load test against local stand-ins")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        type=lambda s: [e for e in s.split(",") if e])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--db", choices=("fake", "postgres"), default="fake")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mock upstream base latency")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--sheets", type=int, default=5, help="distinct answer sheet images for OCR")
+    parser.add_argument("--app-port", type=int, default=18090)
+    parser.add_argument("--json-out", default=None, help="write results as JSON for regression tracking")
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    args = parse_args()
+    mock = MockConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    mock_server = serve_in_thread(mock, port=MOCK_PORT)
+    if args.db == "fake":
+        install_fake_db()
+    app_server: Optional[uvicorn.Server] = serve_app(args.app_port)
+
+    try:
+        summaries = asyncio.run(run(args))
+    finally:
+        app_server.should_exit = True
+        mock_server.should_exit = True
+
+    print(f"upstream calls: {mock.counters}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "args": {k: v for k, v in vars(args).items() if k != "json_out"},
+                "results": summaries,
+                "upstream": mock.counters,
+                "timestamp": time.time(),
+            }, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入 {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# benchmarks/mock_openai_server.py
+"""
+本地 OpenAI 兼容 Mock 服务 (替身智谱 API，不需要网络)
+
+    python -m benchmarks.mock_openai_server --port 18080 --latency-ms 300 --error-rate 0.1
+
+然后把服务指向它:
+    ZHIPU_API_BASE=http://127.0.0.1:18080/v1 ZHIPU_API_KEY=mock uvicorn app.main:app
+
+支持的故障注入:
+    --latency-ms / --jitter-ms   每个请求的基础延迟与随机抖动
+    --error-rate                 按概率返回 --error-status (默认 429)
+    --fail-first N               前 N 个请求必定失败 (验证重试)
+    --spike-rate / --spike-ms    按概率额外增加一段延迟 (模拟上游长尾，验证对冲请求)
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 429
+    fail_first: int = 0
+    spike_rate: float = 0.0
+    spike_ms: float = 0.0
+    embedding_dim: int = 1024
+    # 运行时统计，便于脚本断言
+    counters: dict = field(default_factory=lambda: {"chat": 0, "embeddings": 0, "errors": 0, "spikes": 0})
+
+
+DIAGNOSIS_JSON = {
+    "is_correct": True,
+    "error_type": None,
+    "analysis": "解题步骤完整，移项与系数化为 1 均正确。",
+    "suggested_actions": ["尝试用代入法检验结果"],
+    "confidence": 0.9,
+}
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI Server")
+    app.state.config = config
+    request_seq = itertools.count(1)
+
+    async def inject_faults():
+        seq = next(request_seq)
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+        if config.spike_rate and random.random() < config.spike_rate:
+            config.counters["spikes"] += 1
+            delay += config.spike_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if seq <= config.fail_first or random.random() < config.error_rate:
+            config.counters["errors"] += 1
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"message": "mock injected error", "code": str(config.error_status)}},
+                headers={"Retry-After": "0"},
+            )
+        return None
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config.counters["chat"] += 1
+        error = await inject_faults()
+        if error is not None:
+            return error
+        content = json.dumps(DIAGNOSIS_JSON, ensure_ascii=False)
+        return {
+            "id": f"chatcmpl-mock-{config.counters['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+
+    @app.post("/v1/embeddings")
+    @app.post("/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        config.counters["embeddings"] += 1
+        error = await inject_faults()
+        if error is not None:
+            return error
+        inputs = body.get("input")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(str(text), config.embedding_dim)}
+            for i, text in enumerate(inputs)
+        ]
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock"),
+            "usage": {"prompt_tokens": 10 * len(data), "total_tokens": 10 * len(data)},
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return config.counters
+
+    return app
+
+
+def fake_embedding(text: str, dim: int):
+    """同一文本得到同一单位向量，便于检索结果可复现"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vec = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(v * v for v in vec) ** 0.5
+    return [v / norm for v in vec]
+
+
+def serve_in_thread(config: MockConfig, host: str = "127.0.0.1", port: int = 18080) -> uvicorn.Server:
+    """在后台线程启动 Mock 服务 (供基准 / 冒烟脚本使用)，调用 server.should_exit = True 结束"""
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--spike-rate", type=float, default=0.0)
+    parser.add_argument("--spike-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fail_first=args.fail_first,
+        spike_rate=args.spike_rate,
+        spike_ms=args.spike_ms,
+        embedding_dim=args.embedding_dim,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+-- docker/migrations/pgsql/V1__knowledge_subject_updated_at.sql
+-- 为已存在的 edu_knowledge_vector 表补齐 subject_code / updated_at 字段
+-- (新库由 SQLModel.metadata.create_all 直接建出，无需执行本脚本)
+
+ALTER TABLE edu_knowledge_vector ADD COLUMN IF NOT EXISTS subject_code VARCHAR(64);
+ALTER TABLE edu_knowledge_vector ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+UPDATE edu_knowledge_vector SET updated_at = now() WHERE updated_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_edu_knowledge_vector_subject_code ON edu_knowledge_vector (subject_code);
+-- 本地向量副本按 updated_at 增量轮询
+CREATE INDEX IF NOT EXISTS ix_edu_knowledge_vector_updated_at ON edu_knowledge_vector (updated_at);
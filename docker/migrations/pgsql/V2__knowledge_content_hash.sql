@@ -0,0 +1,4 @@
+-- docker/migrations/pgsql/V2__knowledge_content_hash.sql
+-- seed_knowledge 增量同步：记录向量化文本的哈希，内容未变化时跳过 embedding 调用
+
+ALTER TABLE edu_knowledge_vector ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
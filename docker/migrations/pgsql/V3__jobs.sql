@@ -0,0 +1,25 @@
+-- docker/migrations/pgsql/V3__jobs.sql
+-- 异步任务队列 (JOB_BACKEND=postgres)：worker 用 FOR UPDATE SKIP LOCKED 领取任务
+
+CREATE TABLE IF NOT EXISTS edu_job (
+    id           VARCHAR(32) PRIMARY KEY,
+    kind         VARCHAR(64) NOT NULL,
+    pool         VARCHAR(32) NOT NULL,
+    status       VARCHAR(16) NOT NULL DEFAULT 'queued',
+    payload      JSON,
+    result       JSON,
+    error        TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    progress     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    message      TEXT,
+    callback_url TEXT,
+    run_after    TIMESTAMPTZ DEFAULT now(),
+    locked_by    VARCHAR(64),
+    locked_at    TIMESTAMPTZ,
+    created_at   TIMESTAMPTZ DEFAULT now(),
+    updated_at   TIMESTAMPTZ DEFAULT now(),
+    finished_at  TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_edu_job_claim ON edu_job (pool, status, run_after);
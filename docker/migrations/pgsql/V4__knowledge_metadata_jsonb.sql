@@ -0,0 +1,14 @@
+-- docker/migrations/pgsql/V4__knowledge_metadata_jsonb.sql
+-- 元数据由 JSON 改为 JSONB 并建 GIN 索引，支持按年级 / 教材版本 / 章节等过滤的向量检索
+-- 向量列建 HNSW 索引；带过滤条件的检索使用 pgvector >= 0.8 的 hnsw.iterative_scan 补足 k 条结果
+-- (低版本扩展可正常使用，只是应用会跳过迭代扫描参数；docker-compose 固定为 0.8.0)
+-- (新库由 SQLModel.metadata.create_all 直接建出，无需执行本脚本)
+
+ALTER TABLE edu_knowledge_vector ALTER COLUMN metadata TYPE JSONB USING metadata::jsonb;
+
+CREATE INDEX IF NOT EXISTS ix_edu_knowledge_vector_metadata
+    ON edu_knowledge_vector USING GIN (metadata jsonb_path_ops);
+
+-- 数据量较大时建议改为 CREATE INDEX CONCURRENTLY 在业务低峰期单独执行
+CREATE INDEX IF NOT EXISTS ix_edu_knowledge_vector_embedding_hnsw
+    ON edu_knowledge_vector USING hnsw (embedding vector_l2_ops);
@@ -0,0 +1,51 @@
+-- docker/migrations/pgsql/V5__knowledge_partition_by_subject.sql
+-- edu_knowledge_vector 改为按 subject_code 列表分区：每个学科一个分区，各自带 HNSW / GIN 索引
+-- 带学科的检索只扫描对应分区；新学科首次同步时由应用自动建分区 (KnowledgeRepo.ensure_partitions)
+-- 分区表的主键必须包含分区键，主键改为 (kp_code, subject_code)；subject_code 为空的旧数据归入 default 学科
+-- 分区命名需与 app/repositories/knowledge_repo.partition_name 保持一致
+-- (新库由 SQLModel.metadata.create_all 直接建出，无需执行本脚本)
+
+BEGIN;
+
+CREATE TABLE edu_knowledge_vector_partitioned (
+    kp_code      VARCHAR(64)  NOT NULL,
+    name         VARCHAR(128) NOT NULL,
+    subject_code VARCHAR(64)  NOT NULL,
+    content      VARCHAR      NOT NULL,
+    embedding    vector(1024),
+    content_hash VARCHAR(64),
+    metadata     JSONB,
+    updated_at   TIMESTAMPTZ DEFAULT now()
+) PARTITION BY LIST (subject_code);
+
+DO $$
+DECLARE
+    subject TEXT;
+BEGIN
+    FOR subject IN SELECT DISTINCT COALESCE(subject_code, 'default') FROM edu_knowledge_vector LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF edu_knowledge_vector_partitioned FOR VALUES IN (%L)',
+            'edu_knowledge_vector_'
+                || left(regexp_replace(lower(subject), '[^a-z0-9]+', '_', 'g'), 32)
+                || '_' || left(md5(subject), 8),
+            subject
+        );
+    END LOOP;
+END $$;
+
+-- 先导入数据再建索引 (按分区批量构建，比逐行维护 HNSW 快得多)
+INSERT INTO edu_knowledge_vector_partitioned
+    (kp_code, name, subject_code, content, embedding, content_hash, metadata, updated_at)
+SELECT kp_code, name, COALESCE(subject_code, 'default'), content, embedding, content_hash, metadata, updated_at
+FROM edu_knowledge_vector;
+
+DROP TABLE edu_knowledge_vector;
+ALTER TABLE edu_knowledge_vector_partitioned RENAME TO edu_knowledge_vector;
+
+-- 父表上的主键与索引会在每个分区上各建一份，之后新建的分区自动继承
+ALTER TABLE edu_knowledge_vector ADD CONSTRAINT edu_knowledge_vector_pkey PRIMARY KEY (kp_code, subject_code);
+CREATE INDEX ix_edu_knowledge_vector_updated_at ON edu_knowledge_vector (updated_at);
+CREATE INDEX ix_edu_knowledge_vector_metadata ON edu_knowledge_vector USING GIN (metadata jsonb_path_ops);
+CREATE INDEX ix_edu_knowledge_vector_embedding_hnsw ON edu_knowledge_vector USING hnsw (embedding vector_l2_ops);
+
+COMMIT;
@@ -0,0 +1,9 @@
+-- docker/migrations/pgsql/V6__knowledge_state.sql
+-- 知识库全局状态 (键值)。key = 'generation' 为数据代次：快照导入时更新，
+-- 删除 / 整体替换无法通过 updated_at 增量轮询感知，各进程的本地向量副本发现代次变化后全量重载
+
+CREATE TABLE IF NOT EXISTS edu_knowledge_state (
+    key        VARCHAR(64) PRIMARY KEY,
+    value      VARCHAR     NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
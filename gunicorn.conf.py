@@ -0,0 +1,119 @@
+# gunicorn.conf.py
+"""
+生产环境入口 (gunicorn + uvicorn worker)
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+按路由组拆分 worker 池 (各自单独部署 / 扩缩容，Java 端或网关按路径转发):
+    SERVER_ROUTE_GROUP=llm APP_PORT=8000 gunicorn -c gunicorn.conf.py app.main:app   # 诊断 / 知识库，I/O 密集
+    SERVER_ROUTE_GROUP=ocr APP_PORT=8001 gunicorn -c gunicorn.conf.py app.main:app   # OCR，CPU 密集
+
+- preload_app: master 中预先 import 应用 (LangChain / numpy / OpenCV、Prompt 模板、格式说明等只读资源)，
+  fork 后各 worker 通过写时复制共享，启动更快、内存更省
+- OCR 模型 (ONNX Runtime 线程池) 与数据库 / HTTP 连接池不能跨 fork，由每个 worker 在 lifespan 中各自创建
+- worker 数默认按 CPU 核数与 OCR_NUM_THREADS 计算，避免 OCR 线程数 × worker 数超过核数
+- 优雅重启：kill -HUP <master pid> 逐个替换 worker (重新读取本文件)；
+  preload 模式下代码更新需 kill -USR2 启动新 master，确认正常后 kill -TERM 旧 master
+- 注意：准入控制 (LLM_MAX_IN_FLIGHT 等) 按进程生效，上游总并发约为 worker 数 × 单进程上限
+"""
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Prometheus 多进程模式：必须在 import 应用 (创建指标) 之前设置
+_metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "zentrio_prometheus")
+)
+
+from app.core.config import settings  # noqa: E402
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+
+def _ocr_threads_per_worker(workers: int) -> int:
+    # OCR_NUM_THREADS=0 (自动) 时把核数平分给各 worker，否则每个 worker 都会按全部核数开线程
+    return settings.OCR_NUM_THREADS or max(1, CPU_COUNT // workers)
+
+
+def _auto_workers(group: str) -> int:
+    if group == "ocr":
+        # CPU 密集：worker 数 × 每个 worker 的推理线程数 ≈ 核数
+        threads = settings.OCR_NUM_THREADS or 2
+        return max(1, CPU_COUNT // threads)
+    if group == "llm":
+        # 以等待上游为主，但仓储层是同步 DB 调用，会阻塞事件循环，适当多开
+        return max(2, min(CPU_COUNT + 1, 8))
+    # 混合部署：按 OCR 口径计算，至少 2 个 worker，避免一个 OCR 请求卡住全部流量
+    threads = settings.OCR_NUM_THREADS or 2
+    return max(2, CPU_COUNT // threads)
+
+
+_group = settings.SERVER_ROUTE_GROUP
+_configured = {
+    "all": settings.SERVER_WORKERS_ALL,
+    "llm": settings.SERVER_WORKERS_LLM,
+    "ocr": settings.SERVER_WORKERS_OCR,
+}.get(_group, 0)
+
+# ===============================
+# gunicorn 配置项
+# ===============================
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{settings.APP_PORT}")
+workers = _configured or _auto_workers(_group)
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+timeout = 120
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = 5
+# 定期回收 worker，缓解长时间运行的内存增长 (加抖动避免同时重启)
+max_requests = 5000
+max_requests_jitter = 500
+
+loglevel = settings.APP_LOG_LEVEL.lower()
+accesslog = None
+proc_name = f"zentrio-ai-{_group}"
+
+if settings.JOB_BACKEND == "memory" and workers > 1:
+    # 内存队列只存在于单个进程：提交与查询会落到不同 worker，各 worker 还各自执行一份任务池
+    raise RuntimeError(
+        f"JOB_BACKEND=memory cannot be used with {workers} workers; set JOB_BACKEND=postgres "
+        f"or run a single worker"
+    )
+
+if _group in ("all", "ocr"):
+    # 在 master 中调整 (尚未加载模型)，fork 后各 worker 按此线程数创建 OCR 引擎
+    settings.OCR_NUM_THREADS = _ocr_threads_per_worker(workers)
+
+
+# ===============================
+# 生命周期钩子
+# ===============================
+def on_starting(server):
+    # 清理上次运行残留的多进程指标文件
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # 预加载完成、fork 之前：冻结当前所有对象，避免 GC 扫描触发写时复制
+    gc.freeze()
+    server.log.info(
+        f"Route group '{_group}': {workers} workers, OCR threads/worker={settings.OCR_NUM_THREADS}, "
+        f"LLM in-flight/worker={settings.LLM_MAX_IN_FLIGHT}"
+    )
+
+
+def post_fork(server, worker):
+    # master 中创建的连接池不能在子进程里复用 (不关闭父进程的连接，只丢弃引用)
+    from app.core.database import engine
+
+    engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
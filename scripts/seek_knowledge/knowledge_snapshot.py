@@ -0,0 +1,85 @@
+"""
+知识库快照导出 / 导入 (新环境冷启动不再重新向量化)
+
+    python -m scripts.seek_knowledge.knowledge_snapshot export [--name NAME | --out DIR] [--subject math ...]
+    python -m scripts.seek_knowledge.knowledge_snapshot import (NAME | DIR) [--mode merge|replace]
+
+快照格式见 app/repositories/knowledge_snapshot.py；NAME 指 KNOWLEDGE_SNAPSHOT_DIR 下的目录名，
+也可以直接传目录路径 (如从其他节点 GET /knowledge/snapshot/{name}/{file} 下载的三个文件所在目录)。
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from sqlmodel import SQLModel
+
+from app.core.database import engine
+from app.models import KnowledgeVector  # noqa: F401  注册表结构，供 create_all 使用
+from app.repositories import knowledge_snapshot
+
+
+class ProgressPrinter:
+    def __init__(self, action: str):
+        self.action = action
+        self.start = time.perf_counter()
+
+    def __call__(self, done: int, total: int):
+        elapsed = time.perf_counter() - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"  {self.action} {done}/{total} rows ({rate:,.0f} rows/s)", end="\r", flush=True)
+
+    def finish(self):
+        print(f"\n✅ {self.action} finished in {time.perf_counter() - self.start:.1f}s")
+
+
+def resolve(target: str) -> str:
+    # 已存在的目录直接使用，否则按快照名解析
+    return target if os.path.isdir(target) else knowledge_snapshot.snapshot_path(target)
+
+
+def run_export(args):
+    path = args.out or knowledge_snapshot.snapshot_path(args.name or f"knowledge-{datetime.now():%Y%m%d-%H%M%S}")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    printer = ProgressPrinter("export")
+    manifest = knowledge_snapshot.export_snapshot(
+        path, subject_codes=args.subject, batch_size=args.batch_size, progress=printer
+    )
+    printer.finish()
+    print(f"📦 {path}: {manifest['rows']} rows, subjects={manifest['subjects']}")
+
+
+def run_import(args):
+    path = resolve(args.snapshot)
+    # 新库先建表结构 (分区表父表)，分区由导入时按学科自动创建
+    SQLModel.metadata.create_all(engine)
+    printer = ProgressPrinter("import")
+    result = knowledge_snapshot.import_snapshot(path, mode=args.mode, batch_size=args.batch_size, progress=printer)
+    printer.finish()
+    print(f"📦 {path}: {result['rows']} rows imported (mode={result['mode']})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export / import knowledge vector snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="导出知识库快照")
+    export.add_argument("--name", help="快照名 (KNOWLEDGE_SNAPSHOT_DIR 下)，默认按时间生成")
+    export.add_argument("--out", help="直接指定输出目录 (优先于 --name)")
+    export.add_argument("--subject", action="append", help="只导出指定学科，可重复")
+    export.add_argument("--batch-size", type=int, default=None, help="服务端游标每批行数")
+    export.set_defaults(func=run_export)
+
+    load = sub.add_parser("import", help="导入知识库快照")
+    load.add_argument("snapshot", help="快照名或快照目录")
+    load.add_argument("--mode", choices=("merge", "replace"), default="merge",
+                      help="merge: 按主键 upsert / replace: 清空后导入并重建 HNSW 索引")
+    load.add_argument("--batch-size", type=int, default=None, help="每个 COPY 数据块的行数")
+    load.set_defaults(func=run_import)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -1,95 +1,387 @@
-import os
+"""
+知识库初始化脚本 (流式 / 增量 / 可断点续跑)
 
-from sqlmodel import Session, create_engine, SQLModel
-from zhipuai import ZhipuAI
+    python -m scripts.seek_knowledge.seed_knowledge [--batch-size 32] [--concurrency 4] [--rps 5] [--reset]
 
+流程: 逐文件惰性读取 -> 按批比对 content_hash 跳过未变化条目 -> 并发批量向量化 (限速 + 重试)
+      -> 分块事务 upsert -> 每批提交后写 checkpoint，失败重跑时从断点继续
+      只有名称 / 元数据 / 学科变化的条目不重新向量化，沿用库中的向量更新其余字段
+"""
+import argparse
+import asyncio
+import hashlib
 import json
-from app.core.config import settings
+import os
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, SQLModel, select
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+from app.core.database import engine
+from app.infra.llm import shutdown_http_client
+from app.infra.llm.embeddings import embedding_client
 from app.models import KnowledgeVector, SubjectConfig
+from app.repositories.knowledge_repo import DEFAULT_SUBJECT_CODE, knowledge_repo
+
+# 获取当前脚本所在目录的绝对路径
+CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_JSON_DIR = os.path.join(CURRENT_SCRIPT_DIR, 'json')
+CHECKPOINT_PATH = os.path.join(CURRENT_SCRIPT_DIR, '.seed_checkpoint.json')
+
+
+# =======================================================
+# 1. 工具：限速器 / 断点 / 统计
+# =======================================================
+class RateLimiter:
+    """简单令牌桶：每秒最多放行 rate 次 embedding 请求"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Checkpoint:
+    """
+    记录每个文件已提交的条目数 (按文件 mtime 校验，文件被修改后该文件重新开始)
+    content_hash 比对保证即使 checkpoint 丢失，重跑也不会重复调用 embedding
+    """
+
+    def __init__(self, path: str, reset: bool = False):
+        self.path = path
+        self.data: Dict[str, Dict] = {}
+        if not reset and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    def done(self, filename: str, mtime: float) -> int:
+        entry = self.data.get(filename)
+        if entry and entry.get("mtime") == mtime:
+            return entry.get("done", 0)
+        return 0
+
+    def save(self, filename: str, mtime: float, done: int):
+        self.data[filename] = {"mtime": mtime, "done": done}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        # 原子替换，避免中途被杀导致 checkpoint 文件损坏
+        os.replace(tmp_path, self.path)
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.skipped = 0
+        self.embedded = 0
+        self.upserted = 0
+
+    def report(self, prefix: str = "📊"):
+        elapsed = time.perf_counter() - self.started
+        rate = self.read / elapsed if elapsed else 0.0
+        print(
+            f"{prefix} read={self.read} skipped={self.skipped} embedded={self.embedded} "
+            f"upserted={self.upserted} elapsed={elapsed:.1f}s throughput={rate:.1f} items/s"
+        )
+
+
+# =======================================================
+# 2. 数据读取
+# =======================================================
+def content_hash(item: Dict) -> str:
+    """向量化输入的哈希，未变化时不重新调用 embedding"""
+    return hashlib.sha256(build_embed_text(item).encode('utf-8')).hexdigest()
+
+
+def build_embed_text(item: Dict) -> str:
+    return item['content']
+
+
+def build_row(item: Dict) -> Dict:
+    """条目 -> 待写入的行 (不含 embedding)"""
+    metadata = item.get('metadata', {})
+    return {
+        "kp_code": item['id'],
+        "name": item['name'],
+        "subject_code": item.get('subject_code') or metadata.get('subject') or DEFAULT_SUBJECT_CODE,
+        "content": item['content'],
+        "content_hash": content_hash(item),
+        "metadata": metadata,
+    }
+
+
+def row_hash(name: str, subject_code: str, metadata: Dict) -> str:
+    """向量化输入之外的持久化字段的哈希 (元数据按规范 JSON 序列化，键顺序不影响结果)"""
+    payload = json.dumps([name, subject_code, metadata or {}], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def iter_knowledge_files(knowledge_dir: str) -> Iterator[Tuple[str, float, Iterator[Dict]]]:
+    """
+    逐文件惰性读取
+    - *.jsonl: 逐行流式读取
+    - *.json : 单文件整体解析 (数组格式无法流式)，但文件之间不会同时驻留内存
+    """
+    for filename in sorted(os.listdir(knowledge_dir)):
+        file_path = os.path.join(knowledge_dir, filename)
+        if filename.endswith('.jsonl'):
+            yield filename, os.path.getmtime(file_path), _iter_jsonl(file_path)
+        elif filename.endswith('.json'):
+            yield filename, os.path.getmtime(file_path), _iter_json(file_path)
+
+
+def _iter_jsonl(file_path: str) -> Iterator[Dict]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_json(file_path: str) -> Iterator[Dict]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from json.load(f)
+
 
-# 初始化智谱客户端
-client = ZhipuAI(api_key=settings.ZHIPU_API_KEY)
+def iter_batches(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-# 创建引擎
-engine = create_engine(settings.DATABASE_URL)
 
+# =======================================================
+# 3. 批处理：比对 -> 向量化 -> upsert
+# =======================================================
+def fetch_hashes(kp_codes: List[str]) -> Dict[str, Tuple[str, str]]:
+    """一次查询拿到整批已有的 (content_hash, row_hash)，替代逐条 session.get"""
+    with Session(engine) as session:
+        statement = select(
+            KnowledgeVector.kp_code,
+            KnowledgeVector.content_hash,
+            KnowledgeVector.name,
+            KnowledgeVector.subject_code,
+            KnowledgeVector.metadata_,
+        ).where(KnowledgeVector.kp_code.in_(kp_codes))
+        return {
+            kp_code: (h, row_hash(name, subject_code, metadata))
+            for kp_code, h, name, subject_code, metadata in session.exec(statement).all()
+        }
+
+
+def fetch_embeddings(kp_codes: List[str]) -> Dict[str, List[float]]:
+    """只有名称 / 元数据 / 学科变化的条目沿用库中已有的向量"""
+    with Session(engine) as session:
+        statement = select(KnowledgeVector.kp_code, KnowledgeVector.embedding).where(
+            KnowledgeVector.kp_code.in_(kp_codes)
+        )
+        return {kp_code: embedding for kp_code, embedding in session.exec(statement).all()}
+
+
+async def embed_texts(texts: List[str], limiter: RateLimiter, embed_batch_size: int, retries: int) -> List[List[float]]:
+    """按 embed_batch_size 切分请求，每个请求限速 + 指数退避重试"""
+    vectors: List[List[float]] = []
+    for i in range(0, len(texts), embed_batch_size):
+        chunk = texts[i:i + embed_batch_size]
+        async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(retries),
+                wait=wait_random_exponential(multiplier=1, max=30),
+                reraise=True,
+        ):
+            with attempt:
+                await limiter.acquire()
+                vectors.extend(await embedding_client.aembed_documents(chunk))
+    return vectors
+
+
+def upsert_batch(rows: List[Dict]):
+    """单个事务内批量 upsert (一个 batch 一次提交)"""
+    if not rows:
+        return
+    # 新学科首次写入前自动建分区
+    knowledge_repo.ensure_partitions(row["subject_code"] for row in rows)
+    with Session(engine) as session:
+        # 主键为 (kp_code, subject_code)：知识点换了学科时先删掉旧学科分区中的记录
+        table = KnowledgeVector.__table__
+        session.execute(delete(table).where(or_(*(
+            and_(table.c.kp_code == row["kp_code"], table.c.subject_code != row["subject_code"])
+            for row in rows
+        ))))
+        insert_stmt = insert(table).values(rows)
+        excluded = insert_stmt.excluded
+        do_update_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=['kp_code', 'subject_code'],
+            set_={
+                "name": excluded["name"],
+                "content": excluded["content"],
+                "embedding": excluded["embedding"],
+                "content_hash": excluded["content_hash"],
+                "metadata": excluded["metadata"],
+                "updated_at": func.now(),
+            }
+        )
+        session.exec(do_update_stmt)
+        session.commit()
+
+
+async def process_batch(batch: List[Dict], args, limiter: RateLimiter, semaphore: asyncio.Semaphore, stats: Stats):
+    async with semaphore:
+        pending = {item['id']: (item, build_row(item)) for item in batch}
+        existing = await asyncio.to_thread(fetch_hashes, list(pending))
+
+        # 向量化输入变化的重新向量化；只有其余字段变化的沿用已有向量，仍然写库
+        changed, updated = [], []
+        for kp_code, (item, row) in pending.items():
+            old = existing.get(kp_code)
+            if old is None or old[0] != row["content_hash"]:
+                changed.append((item, row))
+            elif old[1] != row_hash(row["name"], row["subject_code"], row["metadata"]):
+                updated.append(row)
+        stats.skipped += len(batch) - len(changed) - len(updated)
+        if not changed and not updated:
+            return
+
+        rows = []
+        if changed:
+            vectors = await embed_texts(
+                [build_embed_text(item) for item, _ in changed],
+                limiter,
+                args.embed_batch_size,
+                args.retries,
+            )
+            stats.embedded += len(vectors)
+            rows.extend({**row, "embedding": emb} for (_, row), emb in zip(changed, vectors))
+        if updated:
+            embeddings = await asyncio.to_thread(fetch_embeddings, [row["kp_code"] for row in updated])
+            rows.extend({**row, "embedding": embeddings.get(row["kp_code"])} for row in updated)
+        await asyncio.to_thread(upsert_batch, rows)
+        stats.upserted += len(rows)
+
+
+async def seed_knowledge(args, checkpoint: Checkpoint, stats: Stats):
+    knowledge_dir = os.path.join(BASE_JSON_DIR, 'knowledge')
+    if not os.path.exists(knowledge_dir):
+        return
 
-def get_embedding(text: str):
-    """调用智谱 AI 获取向量"""
-    response = client.embeddings.create(model="embedding-2", input=text)
-    return response.data[0].embedding
+    limiter = RateLimiter(args.rps)
+    semaphore = asyncio.Semaphore(args.concurrency)
 
+    for filename, mtime, items in iter_knowledge_files(knowledge_dir):
+        done = checkpoint.done(filename, mtime)
+        print(f"🧠 向量化并同步: {filename} (从第 {done} 条继续)")
 
-def init_all_data():
+        # 最多 concurrency 个批次在途；按提交顺序推进 checkpoint，保证断点前的数据都已落库
+        in_flight: deque = deque()
+        position = 0
+        for batch in iter_batches(items, args.batch_size):
+            position += len(batch)
+            stats.read += len(batch)
+            if position <= done:
+                stats.skipped += len(batch)
+                continue
+
+            in_flight.append((position, asyncio.create_task(process_batch(batch, args, limiter, semaphore, stats))))
+            if len(in_flight) >= args.concurrency:
+                await _drain_one(in_flight, checkpoint, filename, mtime, stats)
+
+        while in_flight:
+            await _drain_one(in_flight, checkpoint, filename, mtime, stats)
+
+
+async def _drain_one(in_flight: deque, checkpoint: Checkpoint, filename: str, mtime: float, stats: Stats):
+    position, task = in_flight.popleft()
+    try:
+        await task
+    except Exception:
+        # 后续在途批次全部取消，已提交的批次保留，重跑时从 checkpoint 继续
+        for _, pending in in_flight:
+            pending.cancel()
+        await asyncio.gather(*(pending for _, pending in in_flight), return_exceptions=True)
+        in_flight.clear()
+        raise
+    checkpoint.save(filename, mtime, position)
+    stats.report(prefix=f"  ✔ {filename}:{position}")
+
+
+# =======================================================
+# 4. 学科配置 (数据量很小，保持逐条 upsert)
+# =======================================================
+def seed_configs():
+    config_dir = os.path.join(BASE_JSON_DIR, 'configs')
+    if not os.path.exists(config_dir):
+        return
+
+    with Session(engine) as session:
+        for filename in sorted(os.listdir(config_dir)):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(config_dir, filename), 'r', encoding='utf-8') as f:
+                cfg_data = json.load(f)
+            print(f"📦 同步配置: {cfg_data['subject_name']}")
+
+            db_cfg = session.get(SubjectConfig, cfg_data['subject_name'])
+            if db_cfg:
+                db_cfg.role_name = cfg_data['role_name']
+                db_cfg.style_desc = cfg_data['style_desc']
+                db_cfg.focus_points = cfg_data['focus_points']
+            else:
+                db_cfg = SubjectConfig(**cfg_data)
+            session.add(db_cfg)
+        session.commit()
+
+
+async def init_all_data(args):
     # 1. 自动根据模型创建表结构 (DDL)
     print("🚀 正在同步数据库表结构...")
     SQLModel.metadata.create_all(engine)
 
-    # 获取当前脚本所在目录的绝对路径
-    current_script_dir = os.path.dirname(os.path.abspath(__file__))
-    base_json_dir = os.path.join(current_script_dir, 'json')
+    # 2. 初始化学科配置
+    seed_configs()
+
+    # 3. 初始化知识点向量
+    checkpoint = Checkpoint(CHECKPOINT_PATH, reset=args.reset)
+    stats = Stats()
+    try:
+        await seed_knowledge(args, checkpoint, stats)
+    finally:
+        stats.report()
+        await shutdown_http_client()
+
+    print("✅ PostgreSQL 数据初始化完成！")
 
-    with Session(engine) as session:
-        # 2. 初始化学科配置 (Configs)
-        config_dir = os.path.join(base_json_dir, 'configs')
-        if os.path.exists(config_dir):
-            for filename in os.listdir(config_dir):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(config_dir, filename)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        cfg_data = json.load(f)
-                        print(f"📦 同步配置: {cfg_data['subject_name']}")
-
-                        # Upsert 逻辑
-                        db_cfg = session.get(SubjectConfig, cfg_data['subject_name'])
-                        if db_cfg:
-                            # 更新已有记录
-                            db_cfg.role_name = cfg_data['role_name']
-                            db_cfg.style_desc = cfg_data['style_desc']
-                            db_cfg.focus_points = cfg_data['focus_points']
-                        else:
-                            # 插入新记录
-                            db_cfg = SubjectConfig(**cfg_data)
-
-                        session.add(db_cfg)
-
-        # 3. 初始化知识点向量 (Knowledge)
-        knowledge_dir = os.path.join(base_json_dir, 'knowledge')
-        if os.path.exists(knowledge_dir):
-            for filename in os.listdir(knowledge_dir):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(knowledge_dir, filename)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        k_data = json.load(f)
-                        for item in k_data:
-                            print(f"🧠 向量化并同步: {item['name']}")
-
-                            # 获取 Embedding
-                            emb = get_embedding(item['content'])
-
-                            # Upsert 逻辑
-                            db_kv = session.get(KnowledgeVector, item['id'])
-                            if db_kv:
-                                db_kv.name = item['name']
-                                db_kv.content = item['content']
-                                db_kv.embedding = emb
-                                db_kv.metadata_ = item['metadata']  # 注意这里使用 metadata_
-                            else:
-                                db_kv = KnowledgeVector(
-                                    kp_code=item['id'],
-                                    name=item['name'],
-                                    content=item['content'],
-                                    embedding=emb,
-                                    metadata_=item['metadata']
-                                )
-
-                            session.add(db_kv)
-
-        # 4. 提交所有变更
-        session.commit()
 
-    print("✅ PostgreSQL 数据初始化全量完成！")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed subject configs and knowledge vectors")
+    parser.add_argument("--batch-size", type=int, default=32, help="每个事务提交的条目数")
+    parser.add_argument("--embed-batch-size", type=int, default=16, help="单次 embedding 请求的文本数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时在途的批次数")
+    parser.add_argument("--rps", type=float, default=5.0, help="embedding 请求每秒上限，<=0 不限速")
+    parser.add_argument("--retries", type=int, default=5, help="单个 embedding 请求最大尝试次数")
+    parser.add_argument("--reset", action="store_true", help="忽略已有 checkpoint，从头开始 (仍会按哈希跳过)")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    init_all_data()
+    asyncio.run(init_all_data(parse_args()))
@@ -0,0 +1,73 @@
+# tests/conftest.py
+"""
+测试公共设施：上游指向本地 OpenAI 兼容 Mock 服务 (benchmarks/mock_openai_server.py)，不需要网络
+
+环境变量必须在导入 app 之前设置 (Settings 在导入时读取)
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+MOCK_PORT = int(os.environ.get("MOCK_OPENAI_PORT", "18090"))
+os.environ["ZHIPU_API_BASE"] = f"http://127.0.0.1:{MOCK_PORT}/v1"
+os.environ.setdefault("ZHIPU_API_KEY", "mock")
+# 重试退避压到毫秒级，测试不必真的等待
+os.environ["LLM_HTTP_BACKOFF_BASE"] = "0.01"
+os.environ["LLM_HTTP_BACKOFF_MAX"] = "0.05"
+# 关闭规则预检：否则数学题的标准答案会被直接判对，不会走到上游调用
+os.environ["PRECHECK_ENABLED"] = "false"
+os.environ.setdefault("JOB_BACKEND", "memory")
+
+import uvicorn  # noqa: E402
+
+from benchmarks.mock_openai_server import MockConfig, create_app  # noqa: E402
+
+
+@pytest.fixture
+def mock_upstream():
+    """
+    启动 Mock 上游：mock_upstream(fail_first=2, error_status=429, ...) -> MockConfig
+    每个测试独立的服务实例 (请求计数与 fail_first 从零开始)，测试结束后关闭
+    """
+    servers = []
+
+    def start(**kwargs) -> MockConfig:
+        config = MockConfig(**kwargs)
+        server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=MOCK_PORT, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError(f"mock upstream failed to start on port {MOCK_PORT}")
+            time.sleep(0.01)
+        servers.append((server, thread))
+        return config
+
+    yield start
+
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@pytest.fixture
+def run_async():
+    """
+    在新事件循环中运行协程，结束前释放共享的 LLM 连接池
+    (连接绑定在事件循环上，不能跨测试复用)
+    """
+    from app.infra.llm import shutdown_http_client
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await shutdown_http_client()
+
+        return asyncio.run(main())
+
+    return run
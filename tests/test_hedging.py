@@ -0,0 +1,126 @@
+# tests/test_hedging.py
+"""对冲请求：超过延迟才发出、对冲比例受预算约束、落败请求被取消、截止时间不足时不对冲"""
+import asyncio
+import time
+
+from app.core.deadline import deadline_scope
+from app.infra.llm.hedging import Hedger
+
+DELAY = 0.05
+
+
+def make_hedger(max_rate: float = 0.5) -> Hedger:
+    hedger = Hedger("test", quantile=0.9, min_delay=DELAY, max_rate=max_rate, window=50, min_samples=5)
+    # 预先填入耗时样本 (都低于 min_delay)，对冲延迟即为 DELAY
+    for _ in range(5):
+        hedger.latency.add(0.01)
+    return hedger
+
+
+def test_hedge_fires_after_delay_and_wins():
+    hedger = make_hedger()
+    fired_at = []
+
+    async def primary():
+        await asyncio.sleep(1)
+        return "primary"
+
+    async def hedge():
+        fired_at.append(time.perf_counter())
+        return "hedge"
+
+    async def scenario():
+        start = time.perf_counter()
+        result = await hedger.run(primary, hedge)
+        return start, result
+
+    start, result = asyncio.run(scenario())
+
+    assert result == "hedge"
+    assert len(fired_at) == 1 and fired_at[0] - start >= DELAY * 0.9
+    stats = hedger.stats()
+    assert stats["fired"] == 1 and stats["hedge_won"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = make_hedger()
+    hedged = []
+
+    async def primary():
+        return "primary"
+
+    async def hedge():
+        hedged.append(True)
+        return "hedge"
+
+    assert asyncio.run(hedger.run(primary, hedge)) == "primary"
+    assert not hedged
+    assert hedger.stats().get("fired", 0) == 0
+
+
+def test_losing_request_is_cancelled():
+    hedger = make_hedger()
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("primary")
+            raise
+        return "primary"
+
+    async def hedge():
+        return "hedge"
+
+    async def scenario():
+        result = await hedger.run(primary, hedge)
+        # 让取消在事件循环中生效
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "hedge"
+    assert cancelled == ["primary"]
+
+
+def test_hedge_rate_stays_within_budget():
+    max_rate = 0.1
+    hedger = make_hedger(max_rate=max_rate)
+    requests = 200
+
+    async def slow():
+        await asyncio.sleep(DELAY * 2)
+        return "ok"
+
+    async def scenario():
+        await asyncio.gather(*(hedger.run(slow, slow) for _ in range(requests)))
+
+    asyncio.run(scenario())
+
+    stats = hedger.stats()
+    assert stats["requests"] == requests
+    # 每个请求积累 max_rate 个令牌，初始允许 burst 次突发
+    assert 0 < stats["fired"] <= max_rate * requests + hedger.budget.burst, stats
+    assert stats["budget_exhausted"] > 0, stats
+
+
+def test_no_hedge_when_deadline_is_short():
+    hedger = make_hedger()
+    hedged = []
+
+    async def primary():
+        await asyncio.sleep(DELAY * 1.5)
+        return "primary"
+
+    async def hedge():
+        hedged.append(True)
+        return "hedge"
+
+    async def scenario():
+        # 等完对冲延迟后剩余时间不足一个对冲延迟：不再发出对冲
+        with deadline_scope(DELAY * 1.8):
+            return await hedger.run(primary, hedge)
+
+    assert asyncio.run(scenario()) == "primary"
+    assert not hedged
+    assert hedger.stats()["deadline"] == 1
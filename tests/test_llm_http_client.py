@@ -0,0 +1,67 @@
+# tests/test_llm_http_client.py
+"""共享 LLM 连接池：chat / embedding 共用一个客户端，429 / 5xx 由 RetryTransport 重试，其它 4xx 不重试"""
+import openai
+import pytest
+
+from app.core.config import settings
+from app.infra.llm import get_embedding_vectors, http_client, llm, startup_http_client
+from app.infra.llm.embeddings import embedding_client
+from app.infra.llm.http_client import retry_transport
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_status_is_retried_until_success(mock_upstream, run_async, status):
+    config = mock_upstream(fail_first=2, error_status=status)
+
+    message = run_async(llm.ainvoke("ping"))
+
+    assert "is_correct" in message.content
+    # 2 次注入错误 + 1 次成功，全部发生在传输层 (SDK 自身 max_retries=0)
+    assert config.counters["chat"] == 3, config.counters
+    assert config.counters["errors"] == 2
+
+
+def test_retries_give_up_after_max_retries(mock_upstream, run_async):
+    config = mock_upstream(fail_first=settings.LLM_HTTP_MAX_RETRIES + 1, error_status=503)
+
+    with pytest.raises(openai.InternalServerError):
+        run_async(llm.ainvoke("ping"))
+
+    assert config.counters["chat"] == settings.LLM_HTTP_MAX_RETRIES + 1, config.counters
+
+
+@pytest.mark.parametrize("status, error", [
+    (400, openai.BadRequestError),
+    (401, openai.AuthenticationError),
+    (404, openai.NotFoundError),
+])
+def test_client_errors_are_not_retried(mock_upstream, run_async, status, error):
+    config = mock_upstream(fail_first=1, error_status=status)
+
+    with pytest.raises(error):
+        run_async(llm.ainvoke("ping"))
+
+    assert config.counters["chat"] == 1, config.counters
+
+
+def test_chat_and_embeddings_share_one_client(mock_upstream, run_async):
+    config = mock_upstream()
+    assert llm.http_async_client is http_client
+    assert embedding_client.http_async_client is http_client
+
+    async def scenario():
+        await startup_http_client()
+        pool = retry_transport._pool
+        message = await llm.ainvoke("ping")
+        vectors = await get_embedding_vectors(["移项", "合并同类项"])
+        # 两类请求都经过同一个连接池，没有各自新建
+        assert retry_transport._pool is pool
+        return message, vectors
+
+    message, vectors = run_async(scenario())
+
+    assert "is_correct" in message.content
+    assert [len(v) for v in vectors] == [config.embedding_dim] * 2
+    assert config.counters["chat"] == 1 and config.counters["embeddings"] == 1
+    # run_async 结束时调用了 shutdown_http_client：连接池已释放
+    assert retry_transport._pool is None
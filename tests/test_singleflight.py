@@ -0,0 +1,70 @@
+# tests/test_singleflight.py
+"""N 个相同的并发诊断 / 向量化请求只产生 1 次上游调用"""
+import asyncio
+
+import pytest
+
+from app.infra.llm import get_embedding_vector
+from app.models import SubjectConfig
+from app.services import diagnosis_service
+
+CONCURRENCY = 20
+
+
+class _FakeKnowledgeRepo:
+    def get_content_with_metadata(self, kp_code):
+        return "规范：移项必须变号。", {"subject_code": "数学"}
+
+
+class _FakeSubjectRepo:
+    def get_config(self, subject_name):
+        return SubjectConfig(subject_name=subject_name, role_name="数学老师", style_desc="严谨", focus_points="运算")
+
+
+@pytest.fixture
+def fake_repos(monkeypatch):
+    monkeypatch.setattr(diagnosis_service, "knowledge_repo", _FakeKnowledgeRepo())
+    monkeypatch.setattr(diagnosis_service, "subject_repo", _FakeSubjectRepo())
+
+
+def test_identical_diagnoses_share_one_chat_call(mock_upstream, run_async, fake_repos):
+    # 上游足够慢，保证所有请求都在首个调用返回前到达
+    config = mock_upstream(latency_ms=300)
+    # 空白差异也应归一化为同一个键
+    answers = ["3x = 18\nx = 6", "3x = 18  x = 6", " 3x = 18\tx = 6 "]
+
+    async def scenario():
+        return await asyncio.gather(*(
+            diagnosis_service.diagnose("KP_MATH_SINGLEFLIGHT", "解方程 3x + 5 = 23", answers[i % len(answers)])
+            for i in range(CONCURRENCY)
+        ))
+
+    results = run_async(scenario())
+
+    assert config.counters["chat"] == 1, config.counters
+    assert all(result is results[0] for result in results)
+    assert results[0].is_correct is True
+
+
+def test_identical_embeddings_share_one_upstream_call(mock_upstream, run_async):
+    config = mock_upstream(latency_ms=300)
+
+    async def scenario():
+        return await asyncio.gather(*(get_embedding_vector("解方程-移项") for _ in range(CONCURRENCY)))
+
+    vectors = run_async(scenario())
+
+    assert config.counters["embeddings"] == 1, config.counters
+    assert len(vectors[0]) == config.embedding_dim
+    assert all(vector == vectors[0] for vector in vectors)
+
+
+def test_different_texts_are_not_coalesced(mock_upstream, run_async):
+    config = mock_upstream(latency_ms=100)
+
+    async def scenario():
+        return await asyncio.gather(get_embedding_vector("移项"), get_embedding_vector("合并同类项"))
+
+    run_async(scenario())
+
+    assert config.counters["embeddings"] == 2, config.counters